@@ -32,6 +32,29 @@ def create_app(config_class=Config):
     migrate.init_app(app, db)
     CORS(app)
 
+    # orjson-backed jsonify / request.get_json
+    from app.json_provider import init_json_provider
+    init_json_provider(app)
+
+    # gzip / brotli for large JSON bodies. Registered first so it runs last,
+    # on the final body after every other after_request hook.
+    from app.compression import init_compression
+    init_compression(app)
+
+    # Per-request query count / DB time + latency histograms (/api/metrics).
+    # Registered first so queries made by the hooks below are counted too.
+    from app.request_metrics import init_request_metrics
+    init_request_metrics(app)
+
+    # Per-endpoint-class statement timeouts (SET LOCAL on PostgreSQL)
+    from app.db_timeouts import init_statement_timeouts
+    init_statement_timeouts(app)
+
+    # Per-user / per-tenant token buckets and load shedding on the sync and
+    # upload endpoints (before the subscription check, so shed requests skip it)
+    from app.admission import init_admission
+    init_admission(app)
+
     # =======================================================
     # GLOBAL SUBSCRIPTION CHECKER
     # =======================================================
@@ -85,6 +108,11 @@ def create_app(config_class=Config):
 
         return
 
+    # Read replica routing (after the subscription check, which reads the
+    # caller's row from the primary)
+    from app.db_routing import init_read_replica
+    init_read_replica(app, db)
+
     # =======================================================
     # IMPORT ROUTES
     # =======================================================
@@ -106,6 +134,7 @@ def create_app(config_class=Config):
     from app.routes.call_analytics import bp as call_analytics_bp  # NEW
     from app.routes.followup import bp as followup_bp # NEW
     from app.routes.auth_pwd import bp as auth_pwd_bp # NEW
+    from app.routes.metrics import bp as metrics_bp
 
     # =======================================================
     # REGISTER BLUEPRINTS
@@ -129,22 +158,18 @@ def create_app(config_class=Config):
     app.register_blueprint(call_analytics_bp)  # NEW
     app.register_blueprint(followup_bp) # NEW
     app.register_blueprint(auth_pwd_bp) # NEW
+    app.register_blueprint(metrics_bp)
 
 
     # =======================================================
     # DATABASE INIT
     # =======================================================
     with app.app_context():
-        # Always create missing tables (safe - won't drop existing tables)
-        # This ensures new tables like activity_logs are created on deployment
-        db.create_all()
-            
-        # FORCE SCHEMA UPDATE (Fix for missing checkout fields)
-        try:
-            from app.db_patch import run_schema_patch
-            run_schema_patch()
-        except Exception as e:
-            print(f"Auto-patch warning: {e}")
+        # Create missing tables + run the schema patcher, but only when the
+        # recorded schema version differs (one SELECT on a normal boot).
+        # On PostgreSQL an advisory lock lets a single worker do the work.
+        from app.db_patch import bootstrap_schema
+        bootstrap_schema()
 
     # =======================================================
     # FRONTEND ROUTING
@@ -190,17 +215,12 @@ def create_app(config_class=Config):
             return redirect(url_for("super_admin_dashboard_index"))
         return send_from_directory(os.path.join(FRONTEND, "super_admin"), filename)
 
-    # -------- UPLOADS (IMAGES) --------
+    # -------- UPLOADS (IMAGES + RECORDINGS) --------
     @app.route("/uploads/<path:filename>")
     def uploaded_files(filename):
-        # Fix: Helper to serve from valid locations
-        # Try 'static/uploads' first (where recordings are)
-        static_uploads = os.path.join(app.root_path, "static", "uploads")
-        if os.path.exists(os.path.join(static_uploads, filename)):
-             return send_from_directory(static_uploads, filename)
-        
-        # Fallback to root 'uploads' (legacy)
-        root_uploads = os.path.join(os.getcwd(), "uploads")
-        return send_from_directory(root_uploads, filename)
+        # Looks in 'static/uploads' (recordings) then root 'uploads' (legacy),
+        # with a cached index, strong ETags, immutable caching and Range support
+        from app.upload_serving import serve_upload
+        return serve_upload(filename)
 
     return app
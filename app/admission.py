@@ -0,0 +1,221 @@
+import logging
+import math
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+from sqlalchemy.pool import QueuePool
+
+from app.models import db, User
+from app.redis_client import optional_redis
+
+log = logging.getLogger(__name__)
+
+# Endpoints under admission control, by class (rates in ADMISSION_LIMITS)
+ENDPOINT_CLASSES = {
+    "call_history.sync_call_history": "sync",
+    "attendance.sync_attendance": "sync",
+    "users.sync_data": "sync",
+    "call_analytics.sync_analytics": "sync",
+    "followup.create_followup": "sync",
+    "attendance.upload_image": "upload",
+    "call_history.upload_recording": "upload",
+    "call_history.init_recording_upload": "upload",
+    "call_history.append_recording_chunk": "upload",
+    "call_history.complete_recording_upload": "upload",
+}
+
+# Idle buckets are dropped once the table grows past this many keys
+MAX_MEMORY_BUCKETS = 10000
+
+
+class MemoryBuckets:
+    """Token buckets in this process (each gunicorn worker limits on its own)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> (tokens, updated, rate, burst)
+
+    def take(self, key, rate, burst):
+        """0 when a token was taken, else seconds until the next one."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _, _ = self._buckets.get(key, (burst, now, rate, burst))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now, rate, burst)
+            if len(self._buckets) > MAX_MEMORY_BUCKETS:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as no bucket
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * bucket[2] < bucket[3]
+        }
+
+
+class RedisBuckets:
+    """Token buckets shared by every node through Redis (one script call per take)."""
+
+    # KEYS[1] bucket; ARGV rate, burst. Returns milliseconds to wait, 0 = admitted.
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + (now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = math.ceil((1 - tokens) / rate * 1000)
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+    return wait
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._take = client.register_script(self.SCRIPT)
+
+    def take(self, key, rate, burst):
+        try:
+            return self._take(keys=[f"admission:{key}"], args=[rate, burst]) / 1000.0
+        except Exception as e:
+            # Fail open: a Redis outage must not take the sync endpoints down
+            log.warning("Admission Redis unavailable, admitting request: %s", e)
+            return 0.0
+
+
+_buckets = None
+_buckets_lock = threading.Lock()
+_inflight = 0
+_inflight_lock = threading.Lock()
+_tenants = {}  # user id -> admin id, for tokens issued before the admin_id claim
+_tenants_lock = threading.Lock()
+
+
+def _get_buckets():
+    global _buckets
+    with _buckets_lock:
+        if _buckets is None:
+            client = optional_redis(current_app.config.get("ADMISSION_REDIS_URL"), "ADMISSION_REDIS_URL")
+            _buckets = RedisBuckets(client) if client is not None else MemoryBuckets()
+        return _buckets
+
+
+def _pool_saturated(ratio):
+    """True when the primary engine's pool is (nearly) fully checked out."""
+    pool = db.engine.pool
+    if not isinstance(pool, QueuePool):
+        return False  # NullPool (PgBouncer) / SQLite in-memory pools have no fixed size
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    if max_overflow < 0:
+        return False  # unbounded overflow never saturates
+    capacity = pool.size() + max_overflow
+    return capacity > 0 and pool.checkedout() >= capacity * ratio
+
+
+def _tenant_id(user_id):
+    # New tokens carry admin_id; for older ones it is looked up once per
+    # process (a user never moves to another admin)
+    admin_id = get_jwt().get("admin_id")
+    if admin_id is None:
+        admin_id = _tenants.get(user_id)
+    if admin_id is None:
+        admin_id = db.session.query(User.admin_id).filter(User.id == user_id).scalar()
+        with _tenants_lock:
+            if len(_tenants) >= MAX_MEMORY_BUCKETS:
+                _tenants.clear()
+            _tenants[user_id] = admin_id
+    return admin_id
+
+
+def _shed(message):
+    response = jsonify({"error": message})
+    response.headers["Retry-After"] = str(current_app.config.get("ADMISSION_RETRY_AFTER", 5))
+    return response, 503
+
+
+def _throttled(wait):
+    response = jsonify({"error": "Too many requests, slow down"})
+    response.headers["Retry-After"] = str(max(1, math.ceil(wait)))
+    return response, 429
+
+
+def admit():
+    """before_request: 429 / 503 for sync and upload calls over their budget."""
+    global _inflight
+    cls = ENDPOINT_CLASSES.get(request.endpoint)
+    if cls is None or request.method == "OPTIONS":
+        return None
+    config = current_app.config
+
+    # Load shedding first - no token spent on a request that is turned away anyway
+    max_inflight = config.get("ADMISSION_MAX_INFLIGHT", 0)
+    if max_inflight and _inflight >= max_inflight:
+        return _shed("Server busy, please retry")
+    if _pool_saturated(config.get("ADMISSION_POOL_SHED_RATIO", 0.9)):
+        return _shed("Server busy, please retry")
+
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        return None  # the endpoint reports the bad token
+    identity = get_jwt_identity()
+    if not identity or get_jwt().get("role") != "user":
+        return None
+
+    limits = config.get("ADMISSION_LIMITS", {}).get(cls)
+    if limits:
+        buckets = _get_buckets()
+        rate, burst = limits["user"]
+        wait = buckets.take(f"{cls}:user:{identity}", rate, burst)
+        if wait:
+            return _throttled(wait)
+
+        tenant = _tenant_id(int(identity))
+        if tenant is not None:
+            rate, burst = limits["tenant"]
+            wait = buckets.take(f"{cls}:tenant:{tenant}", rate, burst)
+            if wait:
+                return _throttled(wait)
+
+    with _inflight_lock:
+        _inflight += 1
+    g.admission_inflight = True
+    return None
+
+
+def release(exc=None):
+    global _inflight
+    if g.pop("admission_inflight", False):
+        with _inflight_lock:
+            _inflight -= 1
+
+
+def reset_after_fork():
+    global _buckets, _buckets_lock, _inflight, _inflight_lock, _tenants_lock
+    _buckets = None
+    _buckets_lock = threading.Lock()
+    _inflight = 0
+    _inflight_lock = threading.Lock()
+    _tenants_lock = threading.Lock()
+
+
+def init_admission(app):
+    if not app.config.get("ADMISSION_ENABLED", True):
+        return
+    app.before_request(admit)
+    app.teardown_request(release)
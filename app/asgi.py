@@ -0,0 +1,221 @@
+"""
+ASGI front for the Flask app (asgi.py, served by uvicorn).
+
+Mobile clients on slow networks take seconds to minutes to send a sync
+batch, a recording or an attendance photo. Behind gthread every one of
+them holds a worker thread - and with it a DB connection slot - while the
+bytes trickle in. Here the request body is received on the event loop
+and spooled (to memory, then to a temp file past ASGI_SPOOL_MEMORY);
+only a complete request is handed to Flask, in a small thread pool that
+matches the DB pool. Responses are sent back from the loop the same way,
+so a slow reader never holds a thread either.
+
+Handlers, services and DB access are unchanged: the number of requests
+that can actually run against PostgreSQL is bounded by the connection
+pool, not by how they are awaited. What scales to thousands is the number
+of connections that are waiting on the network.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class AsyncIngress:
+    """ASGI 3 application that runs a WSGI app on fully received requests."""
+
+    def __init__(self, wsgi_app, threads=4, spool_memory=1024 * 1024, max_body_size=None, body_timeout=60):
+        self.wsgi_app = wsgi_app
+        # The Flask app behind it, for gunicorn's fork hooks (see gunicorn.conf.py)
+        self.flask_app = getattr(wsgi_app, "flask_app", wsgi_app)
+        self.threads = threads
+        self.spool_memory = spool_memory
+        self.max_body_size = max_body_size
+        self.body_timeout = body_timeout
+        self._executor = None
+
+    def reset_after_fork(self):
+        # Threads don't survive fork; the worker starts its own pool on first use
+        self._executor = None
+
+    @property
+    def executor(self):
+        # Created lazily so a process forked after import gets its own threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="asgi-wsgi")
+        return self._executor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+        # websocket scopes are not served: returning closes the connection
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._executor is not None:
+                    self._executor.shutdown(wait=True)
+                    self._executor = None
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = tempfile.SpooledTemporaryFile(max_size=self.spool_memory)
+        try:
+            try:
+                size = await self._receive_body(scope, receive, body)
+            except BodyTooLarge:
+                await self._plain_response(send, 413, b"Request body too large")
+                return
+            except asyncio.TimeoutError:
+                await self._plain_response(send, 408, b"Request body timed out")
+                return
+            except ClientDisconnected:
+                return
+
+            body.seek(0)
+            environ = self._environ(scope, body, size)
+            await self._run_wsgi(environ, send)
+        finally:
+            body.close()
+
+    async def _receive_body(self, scope, receive, body):
+        declared = _header(scope, b"content-length")
+        if self.max_body_size and declared and declared.isdigit() and int(declared) > self.max_body_size:
+            raise BodyTooLarge()
+
+        size = 0
+        more_body = True
+        while more_body:
+            message = await asyncio.wait_for(receive(), self.body_timeout)
+            if message["type"] == "http.disconnect":
+                raise ClientDisconnected()
+            chunk = message.get("body", b"")
+            if chunk:
+                size += len(chunk)
+                if self.max_body_size and size > self.max_body_size:
+                    raise BodyTooLarge()
+                body.write(chunk)
+            more_body = message.get("more_body", False)
+        return size
+
+    def _environ(self, scope, body, size):
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "REMOTE_PORT": str(client[1]),
+            "CONTENT_LENGTH": str(size),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+        for name, value in scope.get("headers", []):
+            name = name.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            if name == "CONTENT_TYPE":
+                environ["CONTENT_TYPE"] = value
+                continue
+            if name == "CONTENT_LENGTH":
+                continue  # the received size is authoritative
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    async def _run_wsgi(self, environ, send):
+        loop = asyncio.get_running_loop()
+        started = {}
+        written = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started.get("sent"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+            return written.append
+
+        def begin():
+            # Call the app and pull the first chunk, so start_response has run
+            result = self.wsgi_app(environ, start_response)
+            iterator = iter(result)
+            return result, iterator, next(iterator, _DONE)
+
+        result, iterator, chunk = await loop.run_in_executor(self.executor, begin)
+        try:
+            await send({"type": "http.response.start", "status": started["status"], "headers": started["headers"]})
+            started["sent"] = True
+            if written:
+                await send({"type": "http.response.body", "body": b"".join(written), "more_body": True})
+            while chunk is not _DONE:
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunk = await loop.run_in_executor(self.executor, next, iterator, _DONE)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, close)
+
+    @staticmethod
+    async def _plain_response(send, status, message):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(message)).encode())],
+        })
+        await send({"type": "http.response.body", "body": message})
+
+
+def _header(scope, name):
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def create_asgi_app(config_class=None):
+    from app import create_app
+    from config import Config
+
+    flask_app = create_app(config_class or Config)
+    config = flask_app.config
+    threads = config.get("ASGI_THREADS", 4)
+
+    # The in-flight cap defaults to the gthread thread count; here it is the pool
+    if "ADMISSION_MAX_INFLIGHT" not in os.environ:
+        config["ADMISSION_MAX_INFLIGHT"] = max(1, threads - 1)
+
+    return AsyncIngress(
+        flask_app,
+        threads=threads,
+        spool_memory=config.get("ASGI_SPOOL_MEMORY", 1024 * 1024),
+        max_body_size=config.get("ASGI_MAX_BODY_SIZE"),
+        body_timeout=config.get("ASGI_BODY_TIMEOUT", 60),
+    )
@@ -0,0 +1,124 @@
+import importlib.util
+import zlib
+
+from flask import current_app, request
+
+HAS_BROTLI = importlib.util.find_spec("brotli") is not None
+
+# Text-like payloads worth compressing. Images, audio, video and PDFs
+# (ReportLab already deflates its page streams) are sent as they are.
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/javascript",
+    "application/cbor",
+    "application/msgpack",
+    "application/vnd.msgpack",
+    "application/x-msgpack",
+    "application/xml",
+    "image/svg+xml",
+    "text/csv",
+    "text/html",
+    "text/plain",
+    "text/xml",
+}
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level):
+        # wbits 31 = gzip container
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def whole(self, data):
+        return self._z.compress(data) + self._z.flush()
+
+    def finish(self):
+        return self._z.flush()
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality):
+        import brotli
+
+        self._c = brotli.Compressor(quality=quality)
+
+    def chunk(self, data):
+        return self._c.process(data) + self._c.flush()
+
+    def whole(self, data):
+        return self._c.process(data) + self._c.finish()
+
+    def finish(self):
+        return self._c.finish()
+
+
+def _negotiate():
+    """Best encoding the client accepts (q-values respected), or None."""
+    offered = ["br", "gzip"] if HAS_BROTLI else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def _encoder(name, config):
+    if name == "br":
+        return _BrotliEncoder(config.get("COMPRESSION_BROTLI_QUALITY", 4))
+    return _GzipEncoder(config.get("COMPRESSION_GZIP_LEVEL", 5))
+
+
+def _stream(chunks, encoder, charset="utf-8"):
+    # Flush after every chunk so the client still sees data as it is produced
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode(charset)
+        data = encoder.chunk(chunk)
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+def compress_response(response):
+    config = current_app.config
+
+    if request.blueprint not in config.get("COMPRESSION_BLUEPRINTS", ()):
+        return response
+    if response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if "Content-Encoding" in response.headers or "Content-Range" in response.headers:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    if response.is_streamed:
+        response.vary.add("Accept-Encoding")
+        name = _negotiate()
+        if not name:
+            return response
+        response.response = _stream(response.response, _encoder(name, config))
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < config.get("COMPRESSION_MIN_SIZE", 1024):
+            return response
+        response.vary.add("Accept-Encoding")
+        name = _negotiate()
+        if not name:
+            return response
+        response.set_data(_encoder(name, config).whole(body))
+
+    response.headers["Content-Encoding"] = name
+    # Each encoding is a different representation
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{name}", weak)
+    return response
+
+
+def init_compression(app):
+    if not app.config.get("COMPRESSION_ENABLED", True):
+        return
+    app.after_request(compress_response)
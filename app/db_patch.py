@@ -1,5 +1,105 @@
 from app.models import db
 from sqlalchemy import text, inspect
+from flask import current_app
+import hashlib
+
+# Bump when run_schema_patch() gains a new step (model changes are picked up
+# automatically through the metadata fingerprint below).
+PATCH_REVISION = 3
+
+# Advisory lock key so only one gunicorn worker bootstraps at a time
+SCHEMA_LOCK_KEY = 72_011_031
+
+
+def schema_fingerprint():
+    """Version string for the current models + patch revision."""
+    parts = []
+    for table in sorted(db.metadata.tables.values(), key=lambda t: t.name):
+        cols = ",".join(sorted(c.name for c in table.columns))
+        parts.append(f"{table.name}({cols})")
+    digest = hashlib.sha256(";".join(parts).encode()).hexdigest()[:16]
+    return f"{PATCH_REVISION}:{digest}"
+
+
+def _stored_schema_version(conn, check_table=False):
+    if check_table and not inspect(conn).has_table("schema_meta"):
+        return None
+    try:
+        row = conn.execute(text("SELECT version FROM schema_meta WHERE id = 1")).first()
+        return row[0] if row else None
+    except Exception:
+        # Table missing (first boot on this DB)
+        conn.rollback()
+        return None
+
+
+def _store_schema_version(conn, version):
+    updated = conn.execute(
+        text("UPDATE schema_meta SET version = :v, updated_at = CURRENT_TIMESTAMP WHERE id = 1"),
+        {"v": version}
+    ).rowcount
+    if not updated:
+        conn.execute(
+            text("INSERT INTO schema_meta (id, version, updated_at) VALUES (1, :v, CURRENT_TIMESTAMP)"),
+            {"v": version}
+        )
+    conn.commit()
+
+
+def bootstrap_schema():
+    """
+    Create tables + run patches once per schema version instead of on every boot.
+
+    SCHEMA_BOOTSTRAP config:
+      auto   - one cheap SELECT; only introspect/patch when the version changed (default)
+      always - old behaviour: create_all() + run_schema_patch() on every boot
+      off    - do nothing (schema managed elsewhere, e.g. migrations / build.sh)
+    """
+    mode = current_app.config.get("SCHEMA_BOOTSTRAP", "auto")
+    if mode == "off":
+        return
+
+    if mode == "always":
+        db.create_all()
+        run_schema_patch()
+        return
+
+    engine = db.engine
+    version = schema_fingerprint()
+
+    with engine.connect() as conn:
+        if _stored_schema_version(conn) == version:
+            return
+
+        is_pg = engine.dialect.name == "postgresql"
+        # Behind PgBouncer (transaction pooling) a session lock could be taken
+        # and released on different server connections - use a transaction
+        # lock instead, held until _store_schema_version() commits.
+        xact_lock = is_pg and current_app.config.get("DB_PGBOUNCER", False)
+        if xact_lock:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": SCHEMA_LOCK_KEY})
+        elif is_pg:
+            # Other workers block here, then see the new version and skip
+            conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": SCHEMA_LOCK_KEY})
+            conn.commit()
+
+        try:
+            # No failing SELECT here: a rollback would drop the xact lock
+            if _stored_schema_version(conn, check_table=True) == version:
+                return
+
+            print(f"Schema version changed -> {version}, bootstrapping...")
+            db.create_all()
+            run_schema_patch()
+            _store_schema_version(conn, version)
+            print("Schema bootstrap complete.")
+        finally:
+            if xact_lock:
+                conn.rollback()  # no-op after the commit; releases the lock on early return
+            elif is_pg:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": SCHEMA_LOCK_KEY})
+                conn.commit()
+
 
 def run_schema_patch():
     """
@@ -61,6 +161,29 @@ def run_schema_patch():
                     except Exception as e:
                          print(f"❌ Failed to add recording_path: {e}")
 
+            # UPLOAD SESSIONS - updated_at (expiry runs on last activity)
+            if 'upload_sessions' in inspector.get_table_names():
+                us_cols = [c['name'] for c in inspector.get_columns('upload_sessions')]
+                if 'updated_at' not in us_cols:
+                    print("Adding updated_at to upload_sessions table...")
+                    try:
+                         conn.execute(text('ALTER TABLE upload_sessions ADD COLUMN updated_at TIMESTAMP'))
+                         conn.execute(text('UPDATE upload_sessions SET updated_at = created_at'))
+                         print("✅ Added updated_at to upload_sessions")
+                    except Exception as e:
+                         print(f"❌ Failed to add updated_at: {e}")
+
+            # IDEMPOTENCY KEYS - headers (replayed with the stored response)
+            if 'idempotency_keys' in inspector.get_table_names():
+                ik_cols = [c['name'] for c in inspector.get_columns('idempotency_keys')]
+                if 'headers' not in ik_cols:
+                    print("Adding headers to idempotency_keys table...")
+                    try:
+                         conn.execute(text('ALTER TABLE idempotency_keys ADD COLUMN headers JSON'))
+                         print("✅ Added headers to idempotency_keys")
+                    except Exception as e:
+                         print(f"❌ Failed to add headers: {e}")
+
             conn.commit()
             
             # Create password_resets table if missing
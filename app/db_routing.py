@@ -0,0 +1,156 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+
+# SQLALCHEMY_BINDS key of the read replica (see config.py)
+REPLICA_BIND = "replica"
+
+READ_METHODS = ("GET", "HEAD")
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+# "role:identity" -> monotonic time of its last successful write (this process)
+_recent_writers = {}
+_writers_lock = threading.Lock()
+MAX_TRACKED_WRITERS = 10000
+
+# Last replica lag measurement, shared by the threads of a worker
+_lag = {"checked_at": None, "seconds": 0.0}
+_lag_lock = threading.Lock()
+
+
+def read_replica(fn):
+    """
+    Serve a read-only view from the replica (when one is configured and
+    fresh enough). Put it below @bp.route so the marker reaches the wrappers.
+    """
+    fn.read_replica = True
+    return fn
+
+
+class RoutingSession(Session):
+    """
+    Sends plain SELECTs to the replica while g.db_replica is set for the
+    request. Flushes, UPDATE/DELETE, text() statements and
+    SELECT ... FOR UPDATE always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _replica_allowed(clause):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _replica_allowed(clause):
+    if not has_request_context() or not g.get("db_replica"):
+        return False
+    if clause is None or not getattr(clause, "is_select", False):
+        return False
+    return getattr(clause, "_for_update_arg", None) is None
+
+
+# -------------------------
+# Staleness guard
+# -------------------------
+def replica_lag_seconds(engine):
+    """
+    Replication delay of the replica in seconds.
+    0 when it is caught up, or when the database has no replication info
+    (e.g. two independent SQLite / PostgreSQL databases used locally).
+    """
+    if engine.dialect.name != "postgresql":
+        return 0.0
+    with engine.connect() as conn:
+        lag = conn.execute(text(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        )).scalar()
+    return float(lag or 0)
+
+
+def _current_lag(engine):
+    interval = current_app.config.get("DB_REPLICA_LAG_CHECK_SECONDS", 5)
+    now = time.monotonic()
+    with _lag_lock:
+        if _lag["checked_at"] is not None and now - _lag["checked_at"] < interval:
+            return _lag["seconds"]
+        _lag["checked_at"] = now  # other threads keep the old value meanwhile
+
+    try:
+        seconds = replica_lag_seconds(engine)
+    except Exception as e:
+        print(f"⚠️ Replica lag check failed, using primary: {e}", flush=True)
+        seconds = float("inf")
+    _lag["seconds"] = seconds
+    return seconds
+
+
+def _wrote_recently(identity, role):
+    window = current_app.config.get("DB_REPLICA_READ_YOUR_WRITES_SECONDS", 10)
+
+    with _writers_lock:
+        wrote_at = _recent_writers.get(f"{role}:{identity}")
+    if wrote_at is not None and time.monotonic() - wrote_at < window:
+        return True
+
+    # Mobile syncs may have hit another worker: users.last_sync is on the
+    # row the subscription check already loaded from the primary (written
+    # through, not buffered, whenever a replica is configured).
+    if role == "user":
+        from app.models import db, User  # app.models imports this module
+        user = db.session.get(User, int(identity))
+        if user and user.last_sync and datetime.utcnow() - user.last_sync < timedelta(seconds=window):
+            return True
+    return False
+
+
+def _wants_replica():
+    view = current_app.view_functions.get(request.endpoint)
+    if getattr(view, "read_replica", False):
+        return True
+    return request.blueprint in current_app.config.get("DB_REPLICA_BLUEPRINTS", ())
+
+
+def _jwt_identity():
+    try:
+        return get_jwt_identity(), get_jwt().get("role")
+    except Exception:
+        return None, None  # no (verified) token in this request
+
+
+def init_read_replica(app, db):
+    @app.before_request
+    def route_reads_to_replica():
+        g.db_replica = False
+        if request.method not in READ_METHODS or not _wants_replica():
+            return
+
+        engine = db.engines.get(REPLICA_BIND)
+        if engine is None:
+            return
+
+        identity, role = _jwt_identity()
+        if identity and _wrote_recently(identity, role):
+            return
+
+        if _current_lag(engine) > app.config.get("DB_REPLICA_MAX_LAG_SECONDS", 5):
+            return
+
+        g.db_replica = True
+
+    @app.after_request
+    def remember_writer(response):
+        if request.method in WRITE_METHODS and response.status_code < 400:
+            identity, role = _jwt_identity()
+            if identity:
+                with _writers_lock:
+                    if len(_recent_writers) >= MAX_TRACKED_WRITERS:
+                        _recent_writers.clear()
+                    _recent_writers[f"{role}:{identity}"] = time.monotonic()
+        return response
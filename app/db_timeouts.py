@@ -0,0 +1,80 @@
+from flask import current_app, g, has_request_context, jsonify, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+# Endpoint classes -> config key holding the statement timeout (ms, 0 = none)
+TIMEOUT_CLASSES = {
+    "interactive": "DB_TIMEOUT_INTERACTIVE_MS",
+    "report": "DB_TIMEOUT_REPORT_MS",
+    "export": "DB_TIMEOUT_EXPORT_MS",
+}
+
+# PostgreSQL SQLSTATE for "canceling statement due to statement timeout"
+QUERY_CANCELED = "57014"
+
+
+def statement_timeout(timeout_class):
+    """
+    Mark a view with its statement-timeout class (default: interactive).
+    Put it below @bp.route so the marker is copied onto the wrappers.
+
+        @bp.route("/download-report")
+        @jwt_required()
+        @statement_timeout("export")
+        def download_report(): ...
+    """
+    if timeout_class not in TIMEOUT_CLASSES:
+        raise ValueError(f"Unknown statement timeout class: {timeout_class}")
+
+    def decorator(fn):
+        fn.statement_timeout_class = timeout_class
+        return fn
+    return decorator
+
+
+def is_statement_timeout(e):
+    """
+    True when PostgreSQL cancelled the statement for running past its
+    statement_timeout. Views that catch Exception re-raise these, so the
+    client gets the 503 below rather than a generic error:
+
+        except Exception as e:
+            if is_statement_timeout(e):
+                raise
+    """
+    return isinstance(e, OperationalError) and getattr(e.orig, "pgcode", None) == QUERY_CANCELED
+
+
+def _current_timeout_ms():
+    if not has_request_context():
+        return None  # CLI / startup / scripts: server default
+    if "statement_timeout_ms" not in g:
+        view = current_app.view_functions.get(request.endpoint)
+        timeout_class = getattr(view, "statement_timeout_class", "interactive")
+        g.statement_timeout_ms = current_app.config.get(TIMEOUT_CLASSES[timeout_class], 0)
+    return g.statement_timeout_ms
+
+
+def _set_local_timeout(session, transaction, connection):
+    if connection.dialect.name != "postgresql":
+        return
+    timeout_ms = _current_timeout_ms()
+    if timeout_ms:
+        # SET LOCAL only lasts for this transaction, so it is safe behind
+        # PgBouncer in transaction pooling mode.
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+
+def init_statement_timeouts(app):
+    if not event.contains(Session, "after_begin", _set_local_timeout):
+        event.listen(Session, "after_begin", _set_local_timeout)
+
+    @app.errorhandler(OperationalError)
+    def database_error(e):
+        from app.models import db
+        db.session.rollback()
+        if is_statement_timeout(e):
+            return jsonify({"error": "Query took too long, please narrow the date range"}), 503
+        current_app.logger.error("Unhandled database error", exc_info=e)
+        return jsonify({"error": "Internal server error"}), 500
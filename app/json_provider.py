@@ -0,0 +1,67 @@
+import importlib.util
+from datetime import date
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+HAS_ORJSON = importlib.util.find_spec("orjson") is not None
+
+
+def _default(o):
+    # Same conversions as Flask's provider for what orjson does not handle natively
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, Decimal):
+        return str(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson.
+
+    Output matches the stdlib provider (sorted keys, datetimes as HTTP
+    dates) except that non-ASCII text is sent as UTF-8 instead of \\u
+    escapes. Calls with extra json.dumps / json.loads keyword arguments
+    fall back to the stdlib implementation.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson
+
+        self._orjson = orjson
+        self._options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _dumpb(self, obj, indent=False):
+        options = self._options
+        if self.sort_keys:
+            options |= self._orjson.OPT_SORT_KEYS
+        if indent:
+            options |= self._orjson.OPT_INDENT_2
+        return self._orjson.dumps(obj, default=_default, option=options)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._dumpb(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return self._orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # bytes straight into the response, no str round trip
+        return self._app.response_class(self._dumpb(obj, indent) + b"\n", mimetype=self.mimetype)
+
+
+def init_json_provider(app):
+    if not app.config.get("ORJSON_ENABLED", True) or not HAS_ORJSON:
+        return
+    app.json = OrjsonProvider(app)
@@ -0,0 +1,53 @@
+import gc
+import threading
+
+from app.models import db
+
+
+def before_fork(app):
+    """
+    Run once in the gunicorn master after the app was preloaded.
+
+    Closes the connections opened while bootstrapping the schema (they must
+    never be shared with the workers) and moves everything allocated so far
+    into the permanent GC generation, so the collector doesn't touch - and
+    un-share - those pages in every forked worker.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+    gc.collect()
+    gc.freeze()
+    print(f"Preloaded app frozen ({gc.get_freeze_count()} objects shared with workers)", flush=True)
+
+
+def after_fork(app):
+    """
+    Run in each worker right after fork.
+
+    The pool is replaced without closing the inherited sockets (close=False)
+    - the master or a sibling may still own them. Per-process caches and
+    locks are recreated, as a lock held during fork would stay held forever.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+    from app import admission, redis_client, upload_serving
+    from app.services import presence
+    from app.services.image_service import ImageService
+    from app.services.last_seen import LastSeenBuffer
+
+    upload_serving._index_lock = threading.Lock()
+    redis_client.reset_after_fork()
+    admission.reset_after_fork()
+    presence.reset_after_fork()
+    ImageService.reset_after_fork()
+    LastSeenBuffer.reset_after_fork()
+
+    # Deferred sync ingestion: each worker drains the staging table
+    from app.services.sync_ingest import SyncIngestWorkers
+
+    SyncIngestWorkers.reset_after_fork()
+    SyncIngestWorkers.ensure_started(app)
@@ -7,8 +7,10 @@ import json
 import uuid
 from sqlalchemy.types import Text, TypeDecorator
 from sqlalchemy import JSON as SA_JSON
+from app.db_routing import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession sends reads of replica-enabled endpoints to the replica bind
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 bcrypt = Bcrypt()
 
 # -------------------------
@@ -359,3 +361,129 @@ class PasswordReset(db.Model):
         return not self.used and datetime.utcnow() < self.expires_at
 
 
+
+
+# =========================================================
+# BLOB (content-addressed upload storage)
+# =========================================================
+class Blob(db.Model):
+    __tablename__ = "blobs"
+
+    # SHA-256 of the stored bytes
+    id = db.Column(db.String(64), primary_key=True)
+    # SHA-256 of the original upload (images are re-encoded before storage)
+    source_hash = db.Column(db.String(64), index=True)
+
+    kind = db.Column(db.String(20), nullable=False)  # attendance / recordings
+    path = db.Column(db.String(1024), nullable=False)
+    size = db.Column(db.Integer)
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=now)
+
+
+# =========================================================
+# UPLOAD SESSION (resumable chunked uploads)
+# =========================================================
+class UploadSession(db.Model):
+    __tablename__ = "upload_sessions"
+
+    id = db.Column(db.String(64), primary_key=True, default=gen_uuid)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    kind = db.Column(db.String(20), default="recordings", nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    sha256 = db.Column(db.String(64), index=True)
+
+    # Call metadata (phone_number, timestamp, ...) applied on completion
+    meta = db.Column(JSONAuto())
+    status = db.Column(db.String(20), default="pending", nullable=False)
+
+    created_at = db.Column(db.DateTime, default=now)
+    # Touched by every accepted chunk; sessions expire on inactivity
+    updated_at = db.Column(db.DateTime, default=now, onupdate=now)
+
+
+# =========================================================
+# SYNC WATERMARK (delta sync high-water mark per user + stream)
+# =========================================================
+class SyncWatermark(db.Model):
+    __tablename__ = "sync_watermarks"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    stream = db.Column(db.String(20), primary_key=True)  # call_history / attendance
+
+    # Latest record timestamp stored for this user (call time / check-in)
+    high_water = db.Column(db.DateTime)
+    record_count = db.Column(db.Integer, default=0, nullable=False)
+    # XOR of 64-bit hashes of every record key (order independent, see SyncWatermarkService)
+    checksum = db.Column(db.String(16), default="0" * 16, nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=now, onupdate=now)
+
+    user = db.relationship("User", backref=db.backref("sync_watermarks", cascade="all, delete-orphan", passive_deletes=True))
+
+
+# =========================================================
+# SYNC BATCH (write-behind call-history ingestion queue)
+# =========================================================
+class SyncBatch(db.Model):
+    __tablename__ = "sync_batches"
+
+    id = db.Column(db.String(64), primary_key=True, default=gen_uuid)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    stream = db.Column(db.String(20), default="call_history", nullable=False)
+
+    # Raw entries as the phone sent them; cleared once merged
+    payload = db.Column(JSONAuto())
+    item_count = db.Column(db.Integer, default=0, nullable=False)
+
+    # pending -> processing -> done / failed (back to pending between attempts)
+    status = db.Column(db.String(20), default="pending", nullable=False, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    records_saved = db.Column(db.Integer)
+    # Same body the inline sync would have returned
+    result = db.Column(JSONAuto())
+    error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=now, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    user = db.relationship("User", backref=db.backref("sync_batches", lazy="dynamic", cascade="all, delete-orphan", passive_deletes=True))
+
+
+# =========================================================
+# IDEMPOTENCY KEY (stored responses of retried mobile requests)
+# =========================================================
+class IdempotencyKey(db.Model):
+    __tablename__ = "idempotency_keys"
+
+    # "<role>:<jwt identity>" - keys are only unique per caller
+    scope = db.Column(db.String(64), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+
+    # SHA-256 of method, path and body: a reused key with another request is rejected
+    fingerprint = db.Column(db.String(64), nullable=False)
+
+    # NULL while the first request is still running
+    status_code = db.Column(db.Integer)
+    mimetype = db.Column(db.String(100))
+    body = db.Column(db.LargeBinary)
+    # Replayed response headers (Location, Retry-After, Content-Encoding)
+    headers = db.Column(JSONAuto())
+
+    created_at = db.Column(db.DateTime, default=now, index=True)
+    completed_at = db.Column(db.DateTime)
+
+
+# =========================================================
+# SCHEMA META (startup bootstrap version)
+# =========================================================
+class SchemaMeta(db.Model):
+    __tablename__ = "schema_meta"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.String(64), nullable=False)
+    updated_at = db.Column(db.DateTime, default=now)
@@ -0,0 +1,117 @@
+"""
+Request / response bodies for the mobile sync endpoints in JSON, MessagePack
+or CBOR.
+
+The request format follows Content-Type and the response format follows
+Accept (JSON unless the client prefers a binary type). Field names and value
+types are the same in every format; timestamps stay ISO strings or epoch
+numbers.
+
+List fields may also be sent columnar, as parallel arrays per field, so a
+large offline backlog does not repeat every key on every entry:
+
+    {"call_history": {"phone_number": ["98..", "97.."], "duration": [12, 40], ...}}
+"""
+import importlib.util
+
+from flask import current_app, jsonify, request
+
+HAS_MSGPACK = importlib.util.find_spec("msgpack") is not None
+HAS_CBOR = importlib.util.find_spec("cbor2") is not None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Content-Type aliases seen in the wild for MessagePack
+_ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.msgpack": MSGPACK}
+
+
+def _msgpack_loads(data):
+    import msgpack
+
+    return msgpack.unpackb(data, raw=False)
+
+
+def _msgpack_dumps(obj):
+    import msgpack
+
+    return msgpack.packb(obj, use_bin_type=True, default=str)
+
+
+def _cbor_loads(data):
+    import cbor2
+
+    return cbor2.loads(data)
+
+
+def _cbor_dumps(obj):
+    import cbor2
+
+    return cbor2.dumps(obj, default=lambda encoder, value: encoder.encode(str(value)))
+
+
+def _codecs():
+    """Binary formats available: mimetype -> (loads, dumps)."""
+    if not current_app.config.get("BINARY_PAYLOADS_ENABLED", True):
+        return {}
+    codecs = {}
+    if HAS_MSGPACK:
+        codecs[MSGPACK] = (_msgpack_loads, _msgpack_dumps)
+    if HAS_CBOR:
+        codecs[CBOR] = (_cbor_loads, _cbor_dumps)
+    return codecs
+
+
+def read_payload():
+    """
+    Decode the request body by Content-Type.
+    Returns (data, None) or (None, error_response) like get_authorized_user().
+    """
+    mimetype = _ALIASES.get(request.mimetype, request.mimetype)
+    if mimetype in (MSGPACK, CBOR):
+        codec = _codecs().get(mimetype)
+        if codec is None:
+            return None, (jsonify({"error": f"Unsupported Content-Type: {request.mimetype}"}), 415)
+        try:
+            return codec[0](request.get_data(cache=False)), None
+        except Exception as e:
+            return None, (jsonify({"error": "Invalid request body", "detail": str(e) or type(e).__name__}), 400)
+
+    return request.get_json(silent=True), None
+
+
+def expand_columns(value):
+    """
+    Rows of a list field: a list is returned as-is, a columnar dict of
+    parallel arrays is turned into a list of dicts. ValueError when the
+    columns differ in length.
+    """
+    if not isinstance(value, dict):
+        return value
+
+    fields = list(value)
+    columns = [value[f] for f in fields]
+    if not all(isinstance(c, list) for c in columns):
+        raise ValueError("columnar fields must be arrays")
+    if len({len(c) for c in columns}) > 1:
+        raise ValueError("columnar arrays must have the same length")
+    return [dict(zip(fields, row)) for row in zip(*columns)]
+
+
+def payload_response(obj, status=200):
+    """Response in the format the client asked for in Accept (JSON by default)."""
+    codecs = _codecs()
+    offered = [*codecs, *(alias for alias, mimetype in _ALIASES.items() if mimetype in codecs)]
+    # JSON first, so */* and missing Accept headers keep getting JSON
+    best = request.accept_mimetypes.best_match([JSON, *offered]) if codecs else None
+
+    if best in offered:
+        dumps = codecs[_ALIASES.get(best, best)][1]
+        response = current_app.response_class(dumps(obj), status=status, mimetype=best)
+    else:
+        response = jsonify(obj)
+        response.status_code = status
+    if codecs:
+        response.vary.add("Accept")
+    return response
@@ -0,0 +1,50 @@
+import importlib.util
+import logging
+import threading
+
+HAS_REDIS = importlib.util.find_spec("redis") is not None
+
+log = logging.getLogger(__name__)
+
+# Short timeouts: every caller falls back to process memory rather than wait
+SOCKET_TIMEOUT = 0.2
+
+_clients = {}  # (url, decode_responses) -> redis.Redis
+_clients_lock = threading.Lock()
+
+
+def optional_redis(url, setting, decode_responses=False):
+    """
+    Redis client for state that is shared between workers when Redis is
+    configured (admission buckets, presence) and kept per process otherwise.
+
+    Returns None when `url` is empty, or when redis is not installed - then
+    a warning names the `setting` that asked for it. Clients are cached per
+    URL; redis-py opens new connections after a fork on its own.
+    """
+    if not url:
+        return None
+    if not HAS_REDIS:
+        log.warning("%s set but redis is not installed - keeping state per process", setting)
+        return None
+
+    key = (url, decode_responses)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(
+                url,
+                socket_timeout=SOCKET_TIMEOUT,
+                socket_connect_timeout=SOCKET_TIMEOUT,
+                decode_responses=decode_responses,
+            )
+            _clients[key] = client
+        return client
+
+
+def reset_after_fork():
+    global _clients, _clients_lock
+    _clients = {}
+    _clients_lock = threading.Lock()
@@ -0,0 +1,405 @@
+import atexit
+import fcntl
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Latency buckets (seconds) for request duration histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Queries per request - the N+1 detector
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500)
+
+MAX_FINGERPRINT_LENGTH = 300
+
+# Totals of workers that have exited, in the shared metrics directory
+ARCHIVE_FILE = "archive.json"
+
+log = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,?)+\)", re.IGNORECASE)
+_PARAM = re.compile(r"%\(\w+\)s|%s|:\w+|\?")
+_WHITESPACE = re.compile(r"\s+")
+_SELECT_LIST = re.compile(r"^SELECT (?:DISTINCT )?.+? FROM ", re.IGNORECASE)
+
+
+def fingerprint(statement):
+    """Normalize SQL so the same query shape always gives the same string."""
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _PARAM.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    # The column list is long and says little about the query shape
+    sql = _SELECT_LIST.sub("SELECT ... FROM ", sql, count=1)
+    return sql[:MAX_FINGERPRINT_LENGTH]
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process. Under gunicorn each worker records its own
+    requests, so with a shared directory configured every worker also
+    writes its totals to <dir>/<pid>.json (within METRICS_FLUSH_SECONDS
+    of a request, and on exit). A scrape, served by whichever
+    worker gets it, sums those files: series have no pid label and
+    counters keep growing when a worker is recycled, because a dead
+    worker's last totals are folded into <dir>/archive.json.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.directory = None
+        self.flush_seconds = 10
+        self._dumped_pid = None
+        self._exit_pid = None
+        self._timer = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}         # (endpoint, method, status) -> count
+            self.latency = {}          # (endpoint, method) -> _Histogram
+            self.query_counts = {}     # endpoint -> _Histogram
+            self.db_seconds = {}       # endpoint -> float
+            self.db_rows = {}          # endpoint -> int
+            self.slowest = {}          # endpoint -> (seconds, fingerprint)
+
+    def configure(self, directory, flush_seconds):
+        self.directory = directory or None
+        self.flush_seconds = flush_seconds
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def record(self, endpoint, method, status, duration, stats):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault((endpoint, method), _Histogram(LATENCY_BUCKETS)).observe(duration)
+            self.query_counts.setdefault(endpoint, _Histogram(QUERY_COUNT_BUCKETS)).observe(stats["count"])
+            self.db_seconds[endpoint] = self.db_seconds.get(endpoint, 0.0) + stats["seconds"]
+            self.db_rows[endpoint] = self.db_rows.get(endpoint, 0) + stats["rows"]
+            if stats["slowest"] and stats["slowest"][0] > self.slowest.get(endpoint, (0.0, ""))[0]:
+                self.slowest[endpoint] = stats["slowest"]
+
+            schedule = self.directory and self._timer is None
+            if schedule:
+                # Written once per interval, including the last requests before a quiet spell
+                self._timer = threading.Timer(self.flush_seconds, self.dump)
+                self._timer.daemon = True
+                if self._exit_pid != os.getpid():
+                    self._exit_pid = os.getpid()
+                    atexit.register(self.dump)
+        if schedule:
+            self._timer.start()
+
+    # -------------------------
+    # Shared directory
+    # -------------------------
+    def snapshot(self):
+        """This process's totals as plain JSON-able data."""
+        with self._lock:
+            return {
+                "requests": [[*key, count] for key, count in self.requests.items()],
+                "latency": [[*key, h.counts, h.sum, h.count] for key, h in self.latency.items()],
+                "query_counts": [[key, h.counts, h.sum, h.count] for key, h in self.query_counts.items()],
+                "db_seconds": [[key, value] for key, value in self.db_seconds.items()],
+                "db_rows": [[key, value] for key, value in self.db_rows.items()],
+                "slowest": [[key, *value] for key, value in self.slowest.items()],
+            }
+
+    def dump(self):
+        """Write this process's totals to <dir>/<pid>.json."""
+        if not self.directory:
+            return
+        pid = os.getpid()
+        with self._lock:
+            self._timer = None
+        try:
+            with _directory_lock(self.directory):
+                if self._dumped_pid != pid:
+                    # A file under our pid is from a dead worker whose pid was reused
+                    _archive_files(self.directory, [_pid_path(self.directory, pid)])
+                    self._dumped_pid = pid
+                _write_json(_pid_path(self.directory, pid), self.snapshot())
+        except OSError as e:
+            log.warning("Could not write metrics to %s: %s", self.directory, e)
+
+    def _collect(self):
+        """Totals of every worker, live or gone, from the shared directory."""
+        self.dump()
+        with _directory_lock(self.directory):
+            dead = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".json") and name[:-5].isdigit() and not _pid_alive(int(name[:-5])):
+                    dead.append(os.path.join(self.directory, name))
+            _archive_files(self.directory, dead)
+
+            states = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    state = _read_json(os.path.join(self.directory, name))
+                    if state:
+                        states.append(state)
+        return states
+
+    # -------------------------
+    # Prometheus text format
+    # -------------------------
+    def render(self):
+        states = self._collect() if self.directory else [self.snapshot()]
+        totals = _merge(states)
+        lines = []
+
+        def labels(**kv):
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in kv.items()) + "}"
+
+        def histogram(name, help_text, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for label_kv, hist in series:
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{labels(**label_kv, le=_num(bound))} {cumulative}")
+                lines.append(f"{name}_bucket{labels(**label_kv, le='+Inf')} {hist.count}")
+                lines.append(f"{name}_sum{labels(**label_kv)} {_num(hist.sum)}")
+                lines.append(f"{name}_count{labels(**label_kv)} {hist.count}")
+
+        lines.append("# HELP http_requests_total Requests handled, by endpoint and status.")
+        lines.append("# TYPE http_requests_total counter")
+        for (endpoint, method, status), count in sorted(totals.requests.items()):
+            lines.append(f"http_requests_total{labels(endpoint=endpoint, method=method, status=status)} {count}")
+
+        histogram(
+            "http_request_duration_seconds", "Request latency by endpoint.",
+            [({"endpoint": e, "method": m}, h) for (e, m), h in sorted(totals.latency.items())]
+        )
+        histogram(
+            "db_queries_per_request", "SQL statements executed per request (N+1 shows up here).",
+            [({"endpoint": e}, h) for e, h in sorted(totals.query_counts.items())]
+        )
+
+        lines.append("# HELP db_query_seconds_total Time spent in SQL statements.")
+        lines.append("# TYPE db_query_seconds_total counter")
+        for endpoint, seconds in sorted(totals.db_seconds.items()):
+            lines.append(f"db_query_seconds_total{labels(endpoint=endpoint)} {_num(seconds)}")
+
+        lines.append("# HELP db_rows_total Rows returned / affected as reported by the driver.")
+        lines.append("# TYPE db_rows_total counter")
+        for endpoint, rows in sorted(totals.db_rows.items()):
+            lines.append(f"db_rows_total{labels(endpoint=endpoint)} {rows}")
+
+        lines.append("# HELP db_slowest_query_seconds Slowest statement seen per endpoint.")
+        lines.append("# TYPE db_slowest_query_seconds gauge")
+        for endpoint, (seconds, fp) in sorted(totals.slowest.items()):
+            lines.append(f"db_slowest_query_seconds{labels(endpoint=endpoint, fingerprint=fp)} {_num(seconds)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _merge(states):
+    """Sum snapshots into a fresh registry (slowest: the maximum)."""
+    totals = MetricsRegistry()
+
+    def add_histogram(series, key, buckets, counts, total, count):
+        hist = series.setdefault(key, _Histogram(buckets))
+        if len(counts) != len(buckets):
+            return  # written with other bucket bounds (older release)
+        hist.counts = [a + b for a, b in zip(hist.counts, counts)]
+        hist.sum += total
+        hist.count += count
+
+    for state in states:
+        for endpoint, method, status, count in state.get("requests", []):
+            key = (endpoint, method, status)
+            totals.requests[key] = totals.requests.get(key, 0) + count
+        for endpoint, method, counts, total, count in state.get("latency", []):
+            add_histogram(totals.latency, (endpoint, method), LATENCY_BUCKETS, counts, total, count)
+        for endpoint, counts, total, count in state.get("query_counts", []):
+            add_histogram(totals.query_counts, endpoint, QUERY_COUNT_BUCKETS, counts, total, count)
+        for endpoint, seconds in state.get("db_seconds", []):
+            totals.db_seconds[endpoint] = totals.db_seconds.get(endpoint, 0.0) + seconds
+        for endpoint, rows in state.get("db_rows", []):
+            totals.db_rows[endpoint] = totals.db_rows.get(endpoint, 0) + rows
+        for endpoint, seconds, fp in state.get("slowest", []):
+            if seconds > totals.slowest.get(endpoint, (0.0, ""))[0]:
+                totals.slowest[endpoint] = (seconds, fp)
+    return totals
+
+
+def _pid_path(directory, pid):
+    return os.path.join(directory, f"{pid}.json")
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _directory_lock(directory):
+    # Serializes dumps / archiving between the workers sharing the directory
+    with open(os.path.join(directory, ".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _archive_files(directory, paths):
+    """Fold finished workers' files into archive.json (caller holds the lock)."""
+    paths = [path for path in paths if os.path.exists(path)]
+    states = [state for state in map(_read_json, paths) if state]
+    if states:
+        archive = os.path.join(directory, ARCHIVE_FILE)
+        previous = _read_json(archive)
+        _write_json(archive, _merge(([previous] if previous else []) + states).snapshot())
+    for path in paths:
+        os.remove(path)
+
+
+def clear_metrics_dir(directory):
+    """Start a server's counters from zero (gunicorn on_starting)."""
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith((".json", ".tmp")):
+                os.remove(os.path.join(directory, name))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+
+# -------------------------
+# SQLAlchemy hooks
+# -------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start_time")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+
+    if not has_request_context():
+        return
+    stats = g.get("db_stats")
+    if stats is None:
+        return
+
+    stats["count"] += 1
+    stats["seconds"] += elapsed
+    stats["rows"] += max(cursor.rowcount or 0, 0)
+    if not stats["slowest"] or elapsed > stats["slowest"][0]:
+        stats["slowest"] = (elapsed, fingerprint(statement))
+
+    slow_ms = current_app.config.get("DB_SLOW_QUERY_MS", 0)
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        print(f"🐢 Slow query ({elapsed * 1000:.0f} ms) on {request.endpoint}: {fingerprint(statement)}", flush=True)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute - drop its start
+    # time so the next query on this connection doesn't time against it
+    conn = exception_context.connection
+    if conn is None or exception_context.execution_context is None:
+        return
+    starts = conn.info.get("query_start_time")
+    if starts:
+        starts.pop()
+
+
+def init_request_metrics(app):
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    registry.configure(app.config.get("METRICS_DIR"), app.config.get("METRICS_FLUSH_SECONDS", 10))
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        g.db_stats = {"count": 0, "seconds": 0.0, "rows": 0, "slowest": None}
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get("request_started")
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        stats = g.db_stats
+
+        # Unmatched URLs share one series instead of one per path
+        endpoint = request.endpoint or "<unmatched>"
+        registry.record(endpoint, request.method, str(response.status_code), duration, stats)
+
+        if app.debug or app.config.get("METRICS_DEBUG_HEADERS", False):
+            response.headers["X-Query-Count"] = str(stats["count"])
+            response.headers["Server-Timing"] = (
+                f'db;dur={stats["seconds"] * 1000:.1f};desc="{stats["count"]} queries", '
+                f"app;dur={duration * 1000:.1f}"
+            )
+        return response
@@ -3,8 +3,13 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity, get_jwt
 from datetime import datetime, timezone, timedelta
 from ..models import db, Admin, User, Attendance, CallHistory, ActivityLog, UserRole
+from ..db_timeouts import is_statement_timeout, statement_timeout
+from ..db_routing import read_replica
+from ..services.blob_store import BlobStore
+from ..services.last_seen import LastSeenBuffer
+from ..services.presence import PresenceRegistry
 import re
-from sqlalchemy import func
+from sqlalchemy import func, case, or_
 
 bp = Blueprint("admin", __name__, url_prefix="/api/admin")
 
@@ -139,9 +144,11 @@ def get_admin_or_401():
         return None, (jsonify({"error": "Account expired"}), 403)
     return admin, None
 
-def paginate_query(query, serialize_fn):
+def paginate_query(query, serialize_fn, prepare_fn=None):
     """
     Generic pagination helper. Reads ?page & ?per_page from request.
+    prepare_fn(items) runs once per page before serializing, so per-row
+    lookups can be batched instead of issuing one query per item.
     """
     try:
         page = max(1, int(request.args.get("page", 1)))
@@ -154,6 +161,8 @@ def paginate_query(query, serialize_fn):
     per_page = max(1, min(per_page, 200))  # bound per_page
 
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    if prepare_fn:
+        prepare_fn(pagination.items)
     items = [serialize_fn(item) for item in pagination.items]
     meta = {
         "page": pagination.page,
@@ -173,25 +182,45 @@ def calculate_performance_for_user(user_id):
     Returns a rounded 0-100 score.
     Adjust this function to match your desired business logic.
     """
-    # attendance punctuality
-    total_att = db.session.query(func.count(Attendance.id)).filter(Attendance.user_id == user_id).scalar() or 0
-    ontime_att = db.session.query(func.count(Attendance.id)).filter(
-        Attendance.user_id == user_id, Attendance.status == "on-time"
-    ).scalar() or 0
+    return calculate_performance_for_users([user_id]).get(user_id, 0)
 
-    att_score = (ontime_att / total_att * 100) if total_att else 0
 
-    # call responsiveness
-    total_calls = db.session.query(func.count(CallHistory.id)).filter(CallHistory.user_id == user_id).scalar() or 0
-    answered_calls = db.session.query(func.count(CallHistory.id)).filter(
-        CallHistory.user_id == user_id, CallHistory.duration > 0
-    ).scalar() or 0
+def calculate_performance_for_users(user_ids):
+    """
+    Same score as calculate_performance_for_user() for many users at once:
+    two grouped queries in total instead of four queries per user.
+    Returns {user_id: score}.
+    """
+    if not user_ids:
+        return {}
 
-    call_score = (answered_calls / total_calls * 100) if total_calls else 0
+    # attendance punctuality
+    att_rows = db.session.query(
+        Attendance.user_id,
+        func.count(Attendance.id),
+        func.sum(case((Attendance.status == "on-time", 1), else_=0)),
+    ).filter(Attendance.user_id.in_(user_ids)).group_by(Attendance.user_id).all()
+    attendance = {uid: (total or 0, ontime or 0) for uid, total, ontime in att_rows}
 
-    # combine
-    combined = (att_score * 0.6) + (call_score * 0.4)
-    return round(combined, 2)
+    # call responsiveness
+    call_rows = db.session.query(
+        CallHistory.user_id,
+        func.count(CallHistory.id),
+        func.sum(case((CallHistory.duration > 0, 1), else_=0)),
+    ).filter(CallHistory.user_id.in_(user_ids)).group_by(CallHistory.user_id).all()
+    calls = {uid: (total or 0, answered or 0) for uid, total, answered in call_rows}
+
+    scores = {}
+    for uid in user_ids:
+        total_att, ontime_att = attendance.get(uid, (0, 0))
+        total_calls, answered_calls = calls.get(uid, (0, 0))
+        att_score = (ontime_att / total_att * 100) if total_att else 0
+        call_score = (answered_calls / total_calls * 100) if total_calls else 0
+
+        # combine
+        combined = (att_score * 0.6) + (call_score * 0.4)
+        scores[uid] = round(combined, 2)
+    return scores
 
 
 # -------------------------
@@ -219,8 +248,8 @@ def login():
             return jsonify({"error": "Account expired"}), 403
 
 
-        admin.last_login = datetime.now(timezone.utc)
-        db.session.commit()
+        # Buffered: the activity log below is the only commit
+        LastSeenBuffer.touch(admin, "last_login")
 
         # LOGGING (Added for Recent Activity)
         try:
@@ -404,33 +433,49 @@ def get_users():
 
         query = query.order_by(User.created_at.desc())
 
+        page_data = {"scores": {}, "todays_attendance": {}}
+
+        def prepare(users):
+            # Batch the per-user lookups for the whole page
+            missing = [u.id for u in users if not getattr(u, "performance_score", None)]
+            page_data["scores"] = calculate_performance_for_users(missing)
+
+            # Latest of TODAY'S attendance records per user
+            if PresenceRegistry.shared():
+                _, today = PresenceRegistry.snapshot(admin.id)
+                page_data["todays_attendance"] = {
+                    user_id: (check_in, check_out) for user_id, (_, _, check_in, check_out) in today.items()
+                }
+                return
+
+            today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            rows = (
+                db.session.query(Attendance.user_id, Attendance.check_in, Attendance.check_out)
+                .filter(
+                    Attendance.user_id.in_([u.id for u in users]),
+                    Attendance.check_in >= today_start
+                )
+                .order_by(Attendance.user_id, Attendance.check_in.desc())
+                .all()
+            )
+            for user_id, check_in, check_out in rows:
+                page_data["todays_attendance"].setdefault(user_id, (check_in, check_out))
+
         def serialize(u):
             # Calculate performance score if missing
             score = getattr(u, "performance_score", None)
             if score is None or score == 0:
-                score = calculate_performance_for_user(u.id)
-
-            # Determine "Online Status" based on TODAY'S attendance
-            # 1. Get today's attendance record for this user
-            today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-            
-            todays_attendance = (
-               Attendance.query.filter(
-                   Attendance.user_id == u.id, 
-                   Attendance.check_in >= today_start
-               )
-               .order_by(Attendance.check_in.desc())
-               .first()
-            )
+                score = page_data["scores"].get(u.id, 0)
 
-            # 2. Logic:
+            # Determine "Online Status" based on TODAY'S attendance:
             # - If checked_in but NOT checked_out -> "Active"
             # - If checked_out -> "Inactive"
             # - If no record -> "Inactive"
-            
             attendance_status = "Inactive"
+            todays_attendance = page_data["todays_attendance"].get(u.id)
             if todays_attendance:
-                if todays_attendance.check_in and not todays_attendance.check_out:
+                check_in, check_out = todays_attendance
+                if check_in and not check_out:
                     attendance_status = "Active"
                 
             return {
@@ -442,12 +487,12 @@ def get_users():
                 "attendance_status": attendance_status, # Today's Check-in status
                 "performance_score": score,
                 "created_at": iso(getattr(u, "created_at", None)),
-                "last_login": iso(getattr(u, "last_login", None)),
-                "last_sync": iso(getattr(u, "last_sync", None)),
-                "has_sync_data": bool(getattr(u, "last_sync", None))
+                "last_login": iso(LastSeenBuffer.last_login(u)),
+                "last_sync": iso(LastSeenBuffer.last_sync(u)),
+                "has_sync_data": bool(LastSeenBuffer.last_sync(u))
             }
 
-        items, meta = paginate_query(query, serialize)
+        items, meta = paginate_query(query, serialize, prepare)
         return jsonify({"users": items, "meta": meta}), 200
 
     except Exception as e:
@@ -539,6 +584,8 @@ def user_attendance(user_id):
 # -------------------------
 @bp.route("/user-analytics/<int:user_id>", methods=["GET"])
 @jwt_required()
+@statement_timeout("report")
+@read_replica
 def user_analytics(user_id):
     """
     Returns analytics for a user:
@@ -559,14 +606,18 @@ def user_analytics(user_id):
         return jsonify({"error": "Unauthorized user access"}), 403
 
     try:
-        # Calls
-        # Calls
+        # Calls (one aggregate pass)
         try:
-            total_calls = CallHistory.query.filter_by(user_id=user_id).count()
-            answered_calls = CallHistory.query.filter(CallHistory.user_id == user_id, CallHistory.duration > 0).count()
-            avg_duration_res = db.session.query(func.avg(CallHistory.duration)).filter(CallHistory.user_id == user_id).scalar()
+            total_calls, answered_calls, avg_duration_res = db.session.query(
+                func.count(CallHistory.id),
+                func.sum(case((CallHistory.duration > 0, 1), else_=0)),
+                func.avg(CallHistory.duration),
+            ).filter(CallHistory.user_id == user_id).one()
+            answered_calls = int(answered_calls or 0)
             avg_duration = float(avg_duration_res or 0.0)
         except Exception as e:
+            if is_statement_timeout(e):
+                raise
             current_app.logger.error(f"Error calculating call stats for user {user_id}: {e}")
             total_calls = 0
             answered_calls = 0
@@ -574,23 +625,30 @@ def user_analytics(user_id):
 
         # Attendance
         try:
-            total_att = Attendance.query.filter_by(user_id=user_id).count()
-            on_time = Attendance.query.filter_by(user_id=user_id, status="on-time").count()
+            total_att, on_time = db.session.query(
+                func.count(Attendance.id),
+                func.sum(case((Attendance.status == "on-time", 1), else_=0)),
+            ).filter(Attendance.user_id == user_id).one()
+            on_time = int(on_time or 0)
             on_time_rate = round((on_time / total_att) * 100, 2) if total_att else 0.0
         except Exception as e:
+            if is_statement_timeout(e):
+                raise
             current_app.logger.error(f"Error calculating attendance stats for user {user_id}: {e}")
             total_att = 0
             on_time = 0
             on_time_rate = 0.0
 
         # last sync & login
-        last_sync = getattr(user, "last_sync", None)
-        last_login = getattr(user, "last_login", None)
+        last_sync = LastSeenBuffer.last_sync(user)
+        last_login = LastSeenBuffer.last_login(user)
 
         # computed performance
         try:
             perf_score = calculate_performance_for_user(user_id)
         except Exception as e:
+            if is_statement_timeout(e):
+                raise
             current_app.logger.error(f"Error calculating performance for user {user_id}: {e}")
             perf_score = 0
 
@@ -622,6 +680,8 @@ def user_analytics(user_id):
         return jsonify({"analytics": analytics}), 200
 
     except Exception as e:
+        if is_statement_timeout(e):
+            raise
         current_app.logger.exception("User analytics failed")
         return jsonify({"error": "Internal server error"}), 500
 
@@ -631,6 +691,7 @@ def user_analytics(user_id):
 # -------------------------
 @bp.route("/dashboard-stats", methods=["GET"])
 @jwt_required()
+@read_replica
 def dashboard_stats():
     if not admin_required():
         return jsonify({"error": "Admin access only"}), 403
@@ -647,8 +708,12 @@ def dashboard_stats():
     # 2. Active Users
     active_users = User.query.filter_by(admin_id=admin_id, is_active=True).count()
 
-    # 3. Users with Sync Data (last_sync is not None)
-    synced_users = User.query.filter(User.admin_id == admin_id, User.last_sync.isnot(None)).count()
+    # 3. Users with Sync Data (last_sync is not None, or a first sync still buffered)
+    pending_sync = LastSeenBuffer.pending_ids(User, "last_sync")
+    has_synced = User.last_sync.isnot(None)
+    if pending_sync:
+        has_synced = or_(has_synced, User.id.in_(pending_sync))
+    synced_users = User.query.filter(User.admin_id == admin_id, has_synced).count()
 
     # 4. Remaining Slots (assuming user_limit exists on Admin model)
     limit = getattr(admin, "user_limit", 10) # Default to 10 if not set
@@ -722,20 +787,20 @@ def recent_sync():
     admin_id = int(get_jwt_identity())
     
     # Get users with most recent last_sync
-    recent_users = User.query.filter(
-        User.admin_id == admin_id,
-        User.last_sync.isnot(None)
-    ).order_by(User.last_sync.desc()).limit(5).all()
+    recent_users = LastSeenBuffer.most_recent(
+        User.query.filter(User.admin_id == admin_id), User, "last_sync", 5, skip_null=True
+    )
 
     data = []
     for u in recent_users:
+        last_sync = LastSeenBuffer.last_sync(u)
         data.append({
             "id": u.id,
             "name": u.name,
             "email": u.email,
-            "last_sync": iso(u.last_sync),
+            "last_sync": iso(last_sync),
             "time_ago": "Just now", # simplified, frontend can calc relative time
-            "is_active": is_online(u.last_sync)
+            "is_active": is_online(last_sync)
         })
 
     return jsonify({"recent_sync": data}), 200
@@ -785,6 +850,41 @@ def user_logs():
     return jsonify({"logs": data}), 200
 
 
+# -------------------------
+# LIVE PRESENCE ("Active now")
+# -------------------------
+@bp.route("/presence", methods=["GET"])
+@jwt_required()
+def presence():
+    """
+    Users seen (sync / login) within PRESENCE_ONLINE_SECONDS and users
+    checked in today, from the presence registry.
+    """
+    if not admin_required():
+        return jsonify({"error": "Admin access only"}), 403
+
+    admin_id = int(get_jwt_identity())
+    online, today = PresenceRegistry.snapshot(admin_id)
+    checked_in = sorted(
+        ((user_id, row) for user_id, row in today.items() if row[3] is None),
+        key=lambda item: item[1][2], reverse=True,
+    )
+
+    return jsonify({
+        "online_count": len(online),
+        "checked_in_count": len(checked_in),
+        "online": [
+            {"id": user_id, "name": name, "last_seen": iso(last_seen)}
+            for user_id, name, last_seen in online
+        ],
+        "checked_in": [
+            {"id": user_id, "name": name, "check_in": iso(check_in)}
+            for user_id, (name, _, check_in, _) in checked_in
+        ],
+        "online_window_seconds": current_app.config.get("PRESENCE_ONLINE_SECONDS", 300),
+    }), 200
+
+
 # =========================================================
 # UPDATE USER (Full Edit including Password)
 # =========================================================
@@ -865,6 +965,10 @@ def delete_user(user_id):
 
     try:
         user_email = user.email
+        admin_id = user.admin_id
+
+        # The cascade drops the rows, so drop their image / recording references first
+        BlobStore.release_users([user_id])
 
         # Delete User (Cascade should handle related data, but we can be explicit if needed)
         db.session.delete(user)
@@ -879,6 +983,7 @@ def delete_user(user_id):
         )
         db.session.add(log)
         db.session.commit()
+        PresenceRegistry.forget(admin_id, user_id)
 
         return jsonify({"message": f"User {user_email} deleted successfully"}), 200
 
@@ -2,18 +2,39 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from datetime import datetime, timedelta
 from sqlalchemy import func
+from sqlalchemy.orm import contains_eager
 from io import BytesIO
 from flask import send_file
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
 
 from ..models import db, Admin, Attendance, User
+from ..db_timeouts import is_statement_timeout, statement_timeout
+from ..db_routing import read_replica
+from ..serializers import RowShape, ISO, ISO_Z, OR_UNKNOWN
 
 bp = Blueprint("admin_attendance", __name__, url_prefix="/api/admin/attendance")
 
+# One row of the admin attendance list, straight from the joined columns
+ATTENDANCE_ROW = RowShape(
+    ("id", Attendance.id),
+    ("user_id", Attendance.user_id),
+    ("user_name", User.name, OR_UNKNOWN),
+    ("status", Attendance.status),
+    ("check_in", Attendance.check_in, ISO_Z),
+    ("check_out", Attendance.check_out, ISO_Z),
+    ("address", Attendance.address),
+    ("latitude", Attendance.latitude),
+    ("longitude", Attendance.longitude),
+    ("image_path", Attendance.image_path),
+    ("check_out_address", Attendance.check_out_address),
+    ("check_out_latitude", Attendance.check_out_latitude),
+    ("check_out_longitude", Attendance.check_out_longitude),
+    ("check_out_image", Attendance.check_out_image),
+    ("synced", Attendance.synced),
+    ("external_id", Attendance.external_id),
+    ("created_at", Attendance.created_at, ISO),
+    ("sync_timestamp", Attendance.sync_timestamp, ISO),
+)
+
 def admin_required():
     claims = get_jwt()
     return claims.get("role") == "admin"
@@ -77,7 +98,12 @@ def get_admin_attendance():
     try:
         # Query all users of this admin
         # Explicit join to avoid ambiguity
-        base_query = db.session.query(Attendance).join(User, Attendance.user_id == User.id).filter(User.admin_id == admin_id)
+        base_query = (
+            db.session.query(*ATTENDANCE_ROW.columns)
+            .select_from(Attendance)
+            .join(User, Attendance.user_id == User.id)
+            .filter(User.admin_id == admin_id)
+        )
 
         # User Filter (ADDED)
         user_id = request.args.get("user_id")
@@ -102,29 +128,7 @@ def get_admin_attendance():
 
         paginated = base_query.order_by(Attendance.check_in.desc()).paginate(page=page, per_page=per_page, error_out=False)
 
-        results = []
-        for a in paginated.items:
-            results.append({
-                "id": a.id,
-                "user_id": a.user_id,
-                "user_name": a.user.name if a.user else "Unknown",
-                "status": a.status,
-                "check_in": a.check_in.isoformat() + 'Z' if a.check_in else None,
-                "check_out": a.check_out.isoformat() + 'Z' if a.check_out else None,
-                "address": a.address,
-                "latitude": a.latitude,
-                "longitude": a.longitude,
-                "image_path": a.image_path,
-                # ✅ ADD CHECKOUT FIELDS
-                "check_out_address": a.check_out_address,
-                "check_out_latitude": a.check_out_latitude,
-                "check_out_longitude": a.check_out_longitude,
-                "check_out_image": a.check_out_image,
-                "synced": a.synced,
-                "external_id": a.external_id,
-                "created_at": a.created_at.isoformat() if a.created_at else None,
-                "sync_timestamp": a.sync_timestamp.isoformat() if a.sync_timestamp else None
-            })
+        results = ATTENDANCE_ROW.serialize_all(paginated.items)
 
         return jsonify({
             "attendance": results,
@@ -145,17 +149,30 @@ def get_admin_attendance():
 
 @bp.route("/export_pdf", methods=["GET"])
 @jwt_required()
+@statement_timeout("export")
+@read_replica
 def export_attendance_pdf():
     """Export attendance data as PDF."""
     
     if not admin_required():
         return jsonify({"error": "Admin access only"}), 403
 
+    # ReportLab is slow to import - only load it when a PDF is requested
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib import colors
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet
+
     try:
         admin_id = int(get_jwt_identity())
         
         # Build Query (Reuse logic)
-        base_query = db.session.query(Attendance).join(User, Attendance.user_id == User.id).filter(User.admin_id == admin_id)
+        base_query = (
+            db.session.query(Attendance)
+            .join(User, Attendance.user_id == User.id)
+            .options(contains_eager(Attendance.user))  # a.user comes from the join, no query per row
+            .filter(User.admin_id == admin_id)
+        )
 
         # Filters
         date_str = request.args.get("date")
@@ -267,5 +284,7 @@ def export_attendance_pdf():
         )
 
     except Exception as e:
+        if is_statement_timeout(e):
+            raise
         current_app.logger.exception("PDF Export failed")
         return jsonify({"error": "Export failed"}), 500
\ No newline at end of file
@@ -4,19 +4,13 @@ from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from sqlalchemy import func, case
 from app.models import db, User, CallHistory
+from app.db_timeouts import is_statement_timeout, statement_timeout
 from datetime import datetime, timedelta
+import importlib.util
 import io
 
-# Optional: ReportLab for PDF
-try:
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.enums import TA_CENTER
-    HAS_REPORTLAB = True
-except ImportError:
-    HAS_REPORTLAB = False
+# Optional: ReportLab for PDF (imported on first export - it is slow to import)
+HAS_REPORTLAB = importlib.util.find_spec("reportlab") is not None
 
 bp = Blueprint("admin_call_analytics", __name__, url_prefix="/api/admin/call-analytics")
 
@@ -27,6 +21,7 @@ def is_admin():
 
 @bp.route("", methods=["GET"])
 @jwt_required()
+@statement_timeout("report")
 def admin_analytics_all_users():
     """
     Returns aggregated analytics for ALL users under the admin.
@@ -272,6 +267,8 @@ def admin_analytics_all_users():
         }), 200
 
     except Exception as e:
+        if is_statement_timeout(e):
+            raise
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 400
@@ -279,6 +276,7 @@ def admin_analytics_all_users():
 
 @bp.route("/download-report", methods=["GET"])
 @jwt_required()
+@statement_timeout("export")
 def download_analytics_report():
     """
     Generates and downloads a PDF report for the filtered data.
@@ -289,6 +287,12 @@ def download_analytics_report():
     if not HAS_REPORTLAB:
         return jsonify({"error": "PDF generation library (reportlab) not installed on server."}), 500
 
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+
     try:
         admin_id = int(get_jwt_identity())
         
@@ -435,6 +439,8 @@ def download_analytics_report():
         )
 
     except Exception as e:
+        if is_statement_timeout(e):
+            raise
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 400
@@ -442,6 +448,7 @@ def download_analytics_report():
 
 @bp.route("/<int:user_id>", methods=["GET"])
 @jwt_required()
+@statement_timeout("report")
 def admin_analytics_single_user(user_id):
     """
     Returns analytics for a SINGLE user for a specific period (default: today).
@@ -509,4 +516,6 @@ def admin_analytics_single_user(user_id):
         }), 200
 
     except Exception as e:
+        if is_statement_timeout(e):
+            raise
         return jsonify({"error": str(e)}), 400
@@ -4,22 +4,33 @@ from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from datetime import datetime, timedelta
 from app.models import db, User, CallHistory
+from app.db_timeouts import is_statement_timeout, statement_timeout
+from app.db_routing import read_replica
+from app.serializers import RowShape, ISO_Z
 from sqlalchemy import or_, func, case
+import importlib.util
 import io
 
-# Optional: ReportLab for PDF
-try:
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.enums import TA_CENTER
-    HAS_REPORTLAB = True
-except ImportError:
-    HAS_REPORTLAB = False
+# Optional: ReportLab for PDF (imported on first export - it is slow to import)
+HAS_REPORTLAB = importlib.util.find_spec("reportlab") is not None
 
 bp = Blueprint("admin_all_call_history", __name__, url_prefix="/api/admin")
 
+# One row of /all-call-history, straight from the joined columns
+ALL_CALL_HISTORY_ROW = RowShape(
+    ("id", CallHistory.id),
+    ("user_id", CallHistory.user_id),
+    ("user_name", User.name),
+    ("phone_number", CallHistory.phone_number),
+    ("formatted_number", CallHistory.formatted_number),
+    ("contact_name", CallHistory.contact_name),
+    ("call_type", CallHistory.call_type),
+    ("duration", CallHistory.duration),
+    ("recording_path", CallHistory.recording_path),
+    ("timestamp", CallHistory.timestamp, ISO_Z),
+    ("created_at", CallHistory.created_at, ISO_Z),
+)
+
 
 from functools import wraps
 
@@ -87,7 +98,8 @@ def all_call_history():
         # 6️⃣ BASE QUERY (JOIN + ADMIN FILTER)
         # ============================
         query = (
-            db.session.query(CallHistory, User)
+            db.session.query(*ALL_CALL_HISTORY_ROW.columns)
+            .select_from(CallHistory)
             .join(User, CallHistory.user_id == User.id)
             .filter(User.admin_id == admin_id)
         )
@@ -151,27 +163,7 @@ def all_call_history():
         # Pagination
         paginated = query.paginate(page=page, per_page=per_page, error_out=False)
 
-        data = []
-        for rec, user_obj in paginated.items:
-            # Safely get recording_path (may not exist in DB yet)
-            try:
-                recording_path = rec.recording_path
-            except AttributeError:
-                recording_path = None
-            
-            data.append({
-                "id": rec.id,
-                "user_id": rec.user_id,
-                "user_name": user_obj.name,
-                "phone_number": rec.phone_number,
-                "formatted_number": rec.formatted_number,
-                "contact_name": rec.contact_name,
-                "call_type": rec.call_type,
-                "duration": rec.duration,
-                "recording_path": recording_path,
-                "timestamp": rec.timestamp.isoformat() + 'Z' if rec.timestamp else None,
-                "created_at": rec.created_at.isoformat() + 'Z' if rec.created_at else None,
-            })
+        data = ALL_CALL_HISTORY_ROW.serialize_all(paginated.items)
 
         # Calculate Stats for the response if filtered by "today" (or generally if possible)
         # We need "last active day" stats logic if filter is ALL, or "specific day" stats if filter is TODAY.
@@ -352,6 +344,8 @@ def all_call_history():
 @bp.route("/download-user-history", methods=["GET"])
 @jwt_required()
 @admin_required
+@statement_timeout("export")
+@read_replica
 def download_user_history():
     """
     Generates and downloads a PDF report for a single user's call history.
@@ -360,6 +354,12 @@ def download_user_history():
     if not HAS_REPORTLAB:
         return jsonify({"error": "PDF generation library (reportlab) not installed on server."}), 500
 
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER
+
     try:
         admin_id = int(get_jwt_identity())
         user_id = request.args.get("user_id")
@@ -493,6 +493,8 @@ def download_user_history():
         )
 
     except Exception as e:
+        if is_statement_timeout(e):
+            raise
         import traceback
         traceback.print_exc()
         return jsonify({"error": "Internal error generating report", "detail": str(e)}), 400
\ No newline at end of file
@@ -7,6 +7,7 @@ from sqlalchemy import func
 from app.models import db
 
 from app.models import User, Admin, Attendance, CallHistory, ActivityLog
+from app.services.last_seen import LastSeenBuffer
 
 admin_dashboard_bp = Blueprint("admin_dashboard", __name__, url_prefix="/api/admin")
 
@@ -43,7 +44,7 @@ def dashboard_stats():
     users = User.query.filter_by(admin_id=admin_id).all()
     total = len(users)
     active = sum(1 for u in users if u.is_active)
-    synced = sum(1 for u in users if u.last_sync)
+    synced = sum(1 for u in users if LastSeenBuffer.last_sync(u))
 
     # Handle None values in performance_score safely
     total_score = sum((u.performance_score or 0.0) for u in users)
@@ -148,12 +149,8 @@ def recent_sync():
         admin_id = int(get_jwt_identity())
 
         # Removed nullslast() to be safe across DB versions
-        users = (
-            User.query
-            .filter(User.admin_id == admin_id)
-            .order_by(User.last_sync.desc())
-            .limit(10)
-            .all()
+        users = LastSeenBuffer.most_recent(
+            User.query.filter(User.admin_id == admin_id), User, "last_sync", 10
         )
 
         print("="*80, flush=True)
@@ -170,8 +167,8 @@ def recent_sync():
                     "email": u.email or "-",
                     "phone": u.phone or "-",
                     "is_active": u.is_active,
-                    "last_sync": iso(u.last_sync),
-                    "is_online": check_online_status(u.last_sync)
+                    "last_sync": iso(LastSeenBuffer.last_sync(u)),
+                    "is_online": check_online_status(LastSeenBuffer.last_sync(u))
                 }
                 for u in users
             ]
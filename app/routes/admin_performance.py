@@ -6,6 +6,7 @@ from sqlalchemy import func, and_, or_, case
 from datetime import datetime, timedelta
 
 from app.models import db, CallHistory, User, Admin, Attendance
+from app.db_timeouts import is_statement_timeout, statement_timeout
 
 bp = Blueprint("admin_performance", __name__, url_prefix="/api/admin")
 
@@ -40,6 +41,7 @@ def get_date_range(filter_type):
 # ---------------------------
 @bp.route("/performance", methods=["GET"])
 @jwt_required()
+@statement_timeout("report")
 def performance():
     try:
         admin_id = int(get_jwt_identity())
@@ -70,22 +72,32 @@ def performance():
         def is_lunch_time(dt):
             return dt.hour == 13
 
-        for user in users:
-            # 1. Fetch Attendance (to define work sessions)
-            # We assume one main session per day for simplicity or take min(check_in) and max(check_out)
-            # Filtering by range
-            attendances = Attendance.query.filter(
-                Attendance.user_id == user.id,
+        # Load attendance + calls for all users at once (not two queries per user)
+        user_ids = [u.id for u in users]
+        attendance_by_user = {}
+        calls_by_user = {}
+        if user_ids:
+            for att in Attendance.query.filter(
+                Attendance.user_id.in_(user_ids),
                 Attendance.check_in >= start_dt,
                 Attendance.check_in < end_dt
-            ).all()
+            ).all():
+                attendance_by_user.setdefault(att.user_id, []).append(att)
 
-            # 2. Fetch Call History
-            calls = CallHistory.query.filter(
-                CallHistory.user_id == user.id,
+            for call in CallHistory.query.filter(
+                CallHistory.user_id.in_(user_ids),
                 CallHistory.timestamp >= start_dt,
                 CallHistory.timestamp < end_dt
-            ).order_by(CallHistory.timestamp.asc()).all()
+            ).order_by(CallHistory.timestamp.asc()).all():
+                calls_by_user.setdefault(call.user_id, []).append(call)
+
+        for user in users:
+            # 1. Attendance (to define work sessions)
+            # We assume one main session per day for simplicity or take min(check_in) and max(check_out)
+            attendances = attendance_by_user.get(user.id, [])
+
+            # 2. Call History (ordered by timestamp)
+            calls = calls_by_user.get(user.id, [])
 
             # Group by Date (YYYY-MM-DD)
             daily_data = {}
@@ -465,5 +477,7 @@ def performance():
         }), 200
 
     except Exception as e:
+        if is_statement_timeout(e):
+            raise
         print(f"Performance error: {e}") # Log to console
         return jsonify({"error": str(e)}), 400
@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
-from app.models import User, CallHistory
+from sqlalchemy import func
+from app.models import db, User, CallHistory, Attendance
+from app.services.last_seen import LastSeenBuffer
 
 bp = Blueprint("admin_sync", __name__, url_prefix="/api/admin")
 
@@ -14,18 +16,33 @@ def sync_summary():
 
     users = User.query.filter_by(admin_id=admin_id).all()
 
+    # Per-user totals with one grouped query each (not two counts per user)
+    user_ids = [u.id for u in users]
+    call_counts = {}
+    attendance_counts = {}
+    if user_ids:
+        call_counts = dict(
+            db.session.query(CallHistory.user_id, func.count(CallHistory.id))
+            .filter(CallHistory.user_id.in_(user_ids))
+            .group_by(CallHistory.user_id)
+            .all()
+        )
+        attendance_counts = dict(
+            db.session.query(Attendance.user_id, func.count(Attendance.id))
+            .filter(Attendance.user_id.in_(user_ids))
+            .group_by(Attendance.user_id)
+            .all()
+        )
+
     result = []
     for u in users:
-        # Count only non-duplicate calls if needed, but with unique constraint, count() is accurate
-        total_calls = CallHistory.query.filter_by(user_id=u.id).count()
-        total_attendance = Attendance.query.filter_by(user_id=u.id).count()
-
+        last_sync = LastSeenBuffer.last_sync(u)
         result.append({
             "user_id": u.id,
             "user_name": u.name,
-            "last_sync": u.last_sync.isoformat() if u.last_sync else None,
-            "total_synced_calls": total_calls,
-            "total_attendance_records": total_attendance
+            "last_sync": last_sync.isoformat() if last_sync else None,
+            "total_synced_calls": call_counts.get(u.id, 0),
+            "total_attendance_records": attendance_counts.get(u.id, 0)
         })
 
     return jsonify({"users": result}), 200
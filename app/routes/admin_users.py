@@ -2,6 +2,9 @@ from flask import Blueprint, jsonify
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from app.models import db
 from ..models import User, Admin, Attendance, CallHistory, ActivityLog, UserRole
+from ..services.last_seen import LastSeenBuffer
+from ..services.blob_store import BlobStore
+from ..services.presence import PresenceRegistry
 
 admin_user_bp = Blueprint("admin_user", __name__, url_prefix="/api/admin")
 
@@ -37,6 +40,9 @@ def admin_get_user_data(user_id):
         # Call history count
         call_count = CallHistory.query.filter_by(user_id=user_id).count()
 
+        last_login = LastSeenBuffer.last_login(user)
+        last_sync = LastSeenBuffer.last_sync(user)
+
         return jsonify({
             "user": {
                 "id": user.id,
@@ -46,8 +52,8 @@ def admin_get_user_data(user_id):
                 "is_active": user.is_active,
                 "performance_score": user.performance_score,
                 "created_at": user.created_at.isoformat(),
-                "last_login": user.last_login.isoformat() if user.last_login else None,
-                "last_sync": user.last_sync.isoformat() if user.last_sync else None,
+                "last_login": last_login.isoformat() if last_login else None,
+                "last_sync": last_sync.isoformat() if last_sync else None,
                 "attendance_records": attendance_count,
                 "call_records": call_count
             }
@@ -83,9 +89,12 @@ def delete_user(user_id):
         )
         db.session.add(log)
 
-        # Delete user (cascade deletes attendance + calls automatically)
+        # Delete user (cascade deletes attendance + calls automatically,
+        # so their image / recording references are dropped first)
+        BlobStore.release_users([user.id])
         db.session.delete(user)
         db.session.commit()
+        PresenceRegistry.forget(admin_id, user_id)
 
         return jsonify({"message": "User deleted successfully"}), 200
 
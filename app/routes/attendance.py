@@ -6,8 +6,12 @@ from app.auth_helpers import get_authorized_user
 from datetime import datetime
 import uuid
 import os
-from werkzeug.utils import secure_filename
-from PIL import Image
+from app.services.image_service import ImageService, ImageQueueFull
+from app.services.blob_store import BlobStore, sha256_bytes
+from app.payloads import read_payload, expand_columns, payload_response
+from app.services.idempotency import idempotent
+from app.services.presence import PresenceRegistry
+from app.services.sync_watermark import SyncWatermarkService, ATTENDANCE, attendance_key
 
 bp = Blueprint("attendance", __name__, url_prefix="/api/attendance")
 
@@ -32,6 +36,7 @@ def ts_to_datetime(value):
 
 @bp.route("/upload-image", methods=["POST"])
 @jwt_required()
+@idempotent
 def upload_image():
     """
     Uploads an image, compresses it to < 200KB, and returns the relative path.
@@ -50,40 +55,37 @@ def upload_image():
     
     if file and allowed_file(file.filename):
         try:
-            filename = secure_filename(f"{uuid.uuid4().hex}_{file.filename}")
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-            
-            # Open image using Pillow
-            img = Image.open(file)
-            
-            # Convert RGBA to RGB if necessary
-            if img.mode in ("RGBA", "P"):
-                img = img.convert("RGB")
-            
-            # Resize if too large (max width 1024px)
-            max_width = 1024
-            if img.width > max_width:
-                ratio = max_width / img.width
-                new_height = int(img.height * ratio)
-                img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Compress and Save
-            # Quality 85 is usually good, but we want < 200KB.
-            # We can try saving with quality 70 first.
-            img.save(filepath, "JPEG", quality=70, optimize=True)
-            
-            # Check size
-            file_size = os.path.getsize(filepath)
-            if file_size > 200 * 1024:
-                # If still too big, compress more
-                img.save(filepath, "JPEG", quality=50, optimize=True)
+            raw = file.read()
+            source_hash = sha256_bytes(raw)
+
+            # Retried upload of the same photo → reuse the stored file, skip compression.
+            # No reference is taken here: the attendance row that syncs this path takes it.
+            blob = BlobStore.find_by_source(source_hash, "attendance")
+            if blob:
+                if not blob.ref_count:
+                    blob.created_at = datetime.utcnow()  # still unclaimed: restart the orphan clock
+                    db.session.commit()
+                print(f"♻️ Image already stored: {blob.path}", flush=True)
+                return jsonify({
+                    "status": "success",
+                    "image_path": blob.path,
+                    "message": "Image already uploaded",
+                    "deduplicated": True
+                }), 200
+
+            # Decode / resize / encode in the image pool (bounded, off the request worker)
+            data, quality = ImageService.process(raw)
+
+            # Content-addressed storage: uploads/attendance/<aa>/<bb>/<sha256>.jpg
+            blob = BlobStore.put_bytes(data, "attendance", "jpg", source_hash=source_hash)
+            BlobStore.purge_orphans()
+            db.session.commit()
 
             # Return relative path for storage
-            relative_path = f"uploads/attendance/{filename}"
+            relative_path = blob.path
             
             print(f"✅ Image uploaded successfully: {relative_path}", flush=True)
-            print(f"   File size: {file_size} bytes", flush=True)
-            print(f"   Saved to: {filepath}", flush=True)
+            print(f"   File size: {len(data)} bytes (quality {quality})", flush=True)
             
             return jsonify({
                 "status": "success",
@@ -91,7 +93,14 @@ def upload_image():
                 "message": "Image uploaded and compressed"
             }), 200
 
+        except ImageQueueFull as e:
+            print(f"⚠️ Image upload rejected: {e}", flush=True)
+            response = jsonify({"error": "Server busy, please retry"})
+            response.headers["Retry-After"] = "5"
+            return response, 503
+
         except Exception as e:
+            db.session.rollback()
             print(f"❌ Image upload failed: {e}", flush=True)
             return jsonify({"error": "Image processing failed"}), 500
     
@@ -100,9 +109,13 @@ def upload_image():
 
 @bp.route("/sync", methods=["POST"])
 @jwt_required()
+@idempotent
 def sync_attendance():
     try:
-        data = request.get_json()
+        # JSON, MessagePack or CBOR; records may also come columnar
+        data, err_resp = read_payload()
+        if err_resp:
+            return err_resp
 
         if not data or "records" not in data:
             return jsonify({"error": "Invalid request format"}), 400
@@ -111,7 +124,18 @@ def sync_attendance():
         if err_resp:
             return err_resp
         user_id = user.id
-        records = data["records"]
+        try:
+            records = expand_columns(data["records"])
+        except ValueError as e:
+            return jsonify({"error": f"'records': {e}"}), 400
+
+        # Days past the watermark have nothing stored yet, so their records
+        # skip both lookups; days inserted earlier in this batch are tracked here
+        watermark = SyncWatermarkService.load(user_id, ATTENDANCE, for_update=True)
+        batch_days = {}
+        stored = []
+        checkins = []  # (attendance id, check_in, check_out) for the presence registry
+        owner = (user.admin_id, user_id, user.name)  # read before commit expires the row
 
         for rec in records:
             try:
@@ -123,16 +147,20 @@ def sync_attendance():
 
                 # Check if record already exists
                 existing = None
-                
+                past_watermark = check_in is not None and SyncWatermarkService.is_new(watermark, check_in)
+
+                if past_watermark:
+                    existing = batch_days.get(check_in.date())
+
                 # First, try to find by external_id (mobile-generated ID)
-                if external_id:
+                elif external_id:
                     existing = Attendance.query.filter_by(
                         external_id=external_id,
                         user_id=user_id
                     ).first()
                 
                 # If not found by external_id, check if there's already a record for today
-                if not existing and check_in:
+                if not existing and check_in and not past_watermark:
                     from sqlalchemy import func
                     check_in_date = check_in.date()
                     existing = Attendance.query.filter(
@@ -152,7 +180,9 @@ def sync_attendance():
                         existing.longitude = rec.get("longitude")
                     if rec.get("location"):
                         existing.address = rec.get("location")
-                    if rec.get("image_path"):
+                    if rec.get("image_path") and rec.get("image_path") != existing.image_path:
+                        BlobStore.release(existing.image_path)  # the replaced photo's reference
+                        BlobStore.add_ref(rec.get("image_path"))
                         existing.image_path = rec.get("image_path")
                     
                     # Check-out Data - Only update if provided
@@ -162,12 +192,15 @@ def sync_attendance():
                         existing.check_out_longitude = rec.get("check_out_longitude")
                     if rec.get("check_out_location"):
                         existing.check_out_address = rec.get("check_out_location")
-                    if rec.get("check_out_image"):
+                    if rec.get("check_out_image") and rec.get("check_out_image") != existing.check_out_image:
+                        BlobStore.release(existing.check_out_image)
+                        BlobStore.add_ref(rec.get("check_out_image"))
                         existing.check_out_image = rec.get("check_out_image")
 
                     existing.status = rec.get("status", "present").lower()
                     existing.synced = True
                     existing.sync_timestamp = datetime.utcnow()
+                    checkins.append((existing.id, check_in, check_out))
 
                 else:
                     # INSERT new
@@ -193,15 +226,53 @@ def sync_attendance():
                         sync_timestamp = datetime.utcnow()
                     )
                     db.session.add(new_rec)
+                    BlobStore.add_ref(new_rec.image_path)
+                    BlobStore.add_ref(new_rec.check_out_image)
+
+                    if check_in:
+                        # No record existed for this day until now
+                        batch_days[check_in.date()] = new_rec
+                        stored.append((check_in, attendance_key(check_in)))
+                        checkins.append((new_rec.id, check_in, check_out))
             except Exception as e:
                 print(f"Error processing attendance record: {e}")
                 continue
 
+        SyncWatermarkService.advance(watermark, stored)
+        watermark_info = SyncWatermarkService.to_dict(watermark)
         db.session.commit()
 
-        return jsonify({"status": "success", "message": "Attendance synced"}), 200
+        for attendance_id, check_in, check_out in checkins:
+            PresenceRegistry.attendance(*owner, attendance_id, check_in, check_out)
+
+        return payload_response({
+            "status": "success",
+            "message": "Attendance synced",
+            "watermark": watermark_info
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        print(e)
+        return jsonify({"error": "Internal server error", "detail": str(e)}), 500
+
+
+@bp.route("/watermark", methods=["GET"])
+@jwt_required()
+def attendance_watermark():
+    """Latest synced attendance day with the count and checksum of stored days."""
+    try:
+        user, err_resp = get_authorized_user()
+        if err_resp:
+            return err_resp
+
+        watermark = SyncWatermarkService.load(user.id, ATTENDANCE)
+        data = SyncWatermarkService.to_dict(watermark)
+        db.session.commit()  # keeps a watermark built on first use
+
+        return jsonify({"watermark": data}), 200
 
     except Exception as e:
         db.session.rollback()
         print(e)
-        return jsonify({"error": "Internal server error", "detail": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": "Internal server error", "detail": str(e)}), 500
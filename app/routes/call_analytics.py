@@ -3,6 +3,8 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.auth_helpers import get_authorized_user
+from app.services.last_seen import LastSeenBuffer
+from app.services.presence import PresenceRegistry
 from datetime import datetime, timedelta
 from sqlalchemy import func
 from app.models import db, User, CallHistory
@@ -50,7 +52,8 @@ def sync_analytics():
         )
 
         # ---- Update Last Sync ----
-        user.last_sync = datetime.utcnow()
+        last_sync = LastSeenBuffer.touch(user, "last_sync")
+        PresenceRegistry.seen(user.admin_id, user.id, user.name, last_sync)
         db.session.commit()
 
         # ---- Final Response ----
@@ -60,7 +63,7 @@ def sync_analytics():
             "total_calls": total_calls,
             "call_types": call_type_summary,
             "total_duration_seconds": total_duration,
-            "last_sync": user.last_sync.isoformat()
+            "last_sync": last_sync.isoformat()
         }), 200
 
     except Exception as e:
@@ -130,6 +133,8 @@ def get_analytics():
             dur = db.session.query(func.coalesce(func.sum(CallHistory.duration), 0)).filter(CallHistory.user_id == user_id, CallHistory.timestamp >= start_dt, CallHistory.timestamp <= end_dt).scalar() or 0
             duration_trend.append({"date": d.isoformat(), "duration": dur})
 
+        last_sync = LastSeenBuffer.last_sync(user)
+
         # ---- Final Response ----
         return jsonify({
             "user_id": user_id,
@@ -148,7 +153,7 @@ def get_analytics():
                 "activity": activity_trend,
                 "duration": duration_trend
             },
-            "last_sync": user.last_sync.isoformat() if user.last_sync else None
+            "last_sync": last_sync.isoformat() if last_sync else None
         }), 200
 
     except Exception as e:
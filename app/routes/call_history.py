@@ -1,58 +1,44 @@
 # app/routes/call_history.py
 
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from functools import wraps
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 
-from app.models import db, User, CallHistory
+from app.models import db, User, CallHistory, SyncBatch
 from app.auth_helpers import get_authorized_user
-from sqlalchemy import func
+from app.serializers import RowShape, ISO
+from app.payloads import read_payload, expand_columns, payload_response
+from app.services.idempotency import idempotent
+from app.services.last_seen import LastSeenBuffer
+from app.services.presence import PresenceRegistry
+from app.services.sync_ingest import SyncIngestService, SyncIngestWorkers, parse_timestamp
+from app.services.sync_watermark import SyncWatermarkService, CALL_HISTORY, call_key
 
 bp = Blueprint("call_history", __name__, url_prefix="/api/call-history")
 
 DEFAULT_PER_PAGE = 25
 MAX_PER_PAGE = 200
 
+# Same shape as CallHistory.to_dict(), built from column tuples
+CALL_HISTORY_ROW = RowShape(
+    ("id", CallHistory.id),
+    ("user_id", CallHistory.user_id),
+    ("phone_number", CallHistory.phone_number),
+    ("formatted_number", CallHistory.formatted_number),
+    ("call_type", CallHistory.call_type),
+    ("timestamp", CallHistory.timestamp, ISO),
+    ("duration", CallHistory.duration),
+    ("contact_name", CallHistory.contact_name),
+    ("recording_path", CallHistory.recording_path),
+    ("created_at", CallHistory.created_at, ISO),
+)
+
 
 # -------------------------------------------------
 # Helpers
 # -------------------------------------------------
-def parse_timestamp(ts_value):
-    """Convert timestamp input from ISO string, seconds, or milliseconds."""
-    if ts_value is None:
-        return None
-
-    # Epoch seconds/milliseconds
-    if isinstance(ts_value, (int, float)):
-        try:
-            # milliseconds
-            if ts_value > 1e10:
-                return datetime.utcfromtimestamp(ts_value / 1000)
-            # seconds
-            return datetime.utcfromtimestamp(ts_value)
-        except:
-            return None
-
-    # ISO string
-    if isinstance(ts_value, str):
-        try:
-            if ts_value.endswith("Z"):
-                ts_value = ts_value[:-1] + "+00:00"
-
-            dt = datetime.fromisoformat(ts_value)
-
-            if dt.tzinfo:
-                dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
-
-            return dt
-        except:
-            return None
-
-    return None
-
-
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
@@ -83,6 +69,7 @@ def paginate(query):
 # -------------------------------------------------
 @bp.route("/sync", methods=["POST"])
 @jwt_required()
+@idempotent
 def sync_call_history():
     try:
         user, err_resp = get_authorized_user()
@@ -90,81 +77,40 @@ def sync_call_history():
             return err_resp
         user_id = user.id
 
-        payload = request.get_json(silent=True) or {}
-        call_list = payload.get("call_history", [])
+        # JSON, MessagePack or CBOR; the list may also come columnar
+        payload, err_resp = read_payload()
+        if err_resp:
+            return err_resp
+        try:
+            call_list = expand_columns((payload or {}).get("call_history", []))
+        except ValueError as e:
+            return jsonify({"error": f"'call_history': {e}"}), 400
 
         if not isinstance(call_list, list):
             return jsonify({"error": "'call_history' must be a list"}), 400
 
-        # Load existing records (hash of key fields) to avoid duplicates
-        # Key: (timestamp_iso, phone_number, call_type, duration)
-        existing_hashes = set()
-        existing_query = db.session.query(
-            CallHistory.timestamp,
-            CallHistory.phone_number,
-            CallHistory.call_type,
-            CallHistory.duration
-        ).filter(CallHistory.user_id == user_id).all()
-
-        for r in existing_query:
-            # Normalize timestamp to ISO string (no microseconds) for comparison
-            ts_str = r.timestamp.replace(microsecond=0).isoformat() if r.timestamp else ""
-            key = f"{ts_str}|{r.phone_number}|{r.call_type}|{r.duration}"
-            existing_hashes.add(key)
-
-        saved = 0
-        errors = []
-
-        for entry in call_list:
-            try:
-                phone_number = entry.get("phone_number")
-                call_type = entry.get("call_type")
-                duration = int(entry.get("duration", 0))
-                timestamp_raw = entry.get("timestamp")
-
-                if not phone_number or not timestamp_raw:
-                    errors.append({"entry": entry, "error": "Missing fields"})
-                    continue
-
-                # Convert and normalize timestamp
-                dt = parse_timestamp(timestamp_raw)
-                if not dt:
-                    errors.append({"entry": entry, "error": "Invalid timestamp"})
-                    continue
-
-                # Ensure UTC and strip microseconds
-                if dt.tzinfo:
-                    dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
-                dt = dt.replace(microsecond=0)
-
-                # Generate key for duplicate check
-                ts_str = dt.isoformat()
-                key = f"{ts_str}|{phone_number}|{call_type}|{duration}"
-
-                if key in existing_hashes:
-                    continue
-
-                new_record = CallHistory(
-                    user_id=user_id,
-                    phone_number=phone_number,
-                    formatted_number=entry.get("formatted_number") or "",
-                    call_type=call_type.lower() if call_type else "unknown",
-                    duration=duration,
-                    timestamp=dt,
-                    contact_name=entry.get("contact_name") or ""
-                )
-
-                db.session.add(new_record)
-                existing_hashes.add(key) # Add to set to prevent duplicates within the same batch
-                saved += 1
-
-            except Exception as e:
-                errors.append({"entry": entry, "error": str(e)})
-                continue
-
-        # Update user last sync
-        user.last_sync = datetime.utcnow()
-        db.session.add(user)
+        # Write-behind: stage the raw batch and let the ingest workers merge it
+        if current_app.config.get("SYNC_INGEST_MODE") == "deferred":
+            batch = SyncIngestService.enqueue(user_id, call_list)
+            last_sync = LastSeenBuffer.touch(user, "last_sync")
+            PresenceRegistry.seen(user.admin_id, user_id, user.name, last_sync)
+            db.session.commit()
+            SyncIngestWorkers.ensure_started(current_app._get_current_object())
+            SyncIngestWorkers.notify()
+
+            response = payload_response({
+                "message": "Call history accepted",
+                "batch_id": batch.id,
+                "status": "pending",
+                "records": batch.item_count,
+            }, 202)
+            response.headers["Location"] = url_for("call_history.sync_batch_status", batch_id=batch.id)
+            return response
+
+        saved, errors, watermark_info = SyncIngestService.merge_calls(user_id, call_list)
+
+        last_sync = LastSeenBuffer.touch(user, "last_sync")
+        PresenceRegistry.seen(user.admin_id, user_id, user.name, last_sync)
 
         try:
             db.session.commit()
@@ -175,58 +121,67 @@ def sync_call_history():
         # =========================================================
         # 📊 AUTO-CALCULATE ANALYTICS
         # =========================================================
-        try:
-            # ---- Total Calls ----
-            total_calls = CallHistory.query.filter_by(user_id=user_id).count()
-
-            # ---- Call Type Summary ----
-            call_types = (
-                db.session.query(
-                    CallHistory.call_type,
-                    func.count(CallHistory.id)
-                )
-                .filter(CallHistory.user_id == user_id)
-                .group_by(CallHistory.call_type)
-                .all()
-            )
-            # Normalize keys to lowercase for consistency
-            call_type_summary = {ctype.lower(): count for ctype, count in call_types}
-
-            # ---- Total Call Duration ----
-            total_duration = (
-                db.session.query(func.coalesce(func.sum(CallHistory.duration), 0))
-                .filter(CallHistory.user_id == user_id)
-                .scalar()
-                or 0
-            )
+        analytics = SyncIngestService.call_analytics(user_id)
+        analytics["last_sync"] = last_sync.isoformat()
 
-            # ---- Recent Calls (Optional context) ----
-            # We can return the last few calls if needed, or just the summary
-            
-        except Exception as analytics_error:
-            # If analytics fail, we still return success for the sync but log the error
-            current_app.logger.error(f"Analytics calc failed: {analytics_error}")
-            total_calls = 0
-            call_type_summary = {}
-            total_duration = 0
-
-        return jsonify({
+        return payload_response({
             "message": "Call history synced successfully",
             "records_saved": saved,
             "errors": errors,
-            "analytics": {
-                "total_calls": total_calls,
-                "call_types": call_type_summary,
-                "total_duration_seconds": int(total_duration),
-                "last_sync": user.last_sync.isoformat()
-            }
-        }), 200
+            "analytics": analytics,
+            "watermark": watermark_info
+        })
 
     except Exception as e:
         current_app.logger.exception("CALL HISTORY SYNC ERROR")
         return jsonify({"error": "Internal server error", "detail": str(e)}), 400
 
 
+@bp.route("/sync/<batch_id>", methods=["GET"])
+@jwt_required()
+def sync_batch_status(batch_id):
+    """Progress of a batch accepted by a deferred sync (202)."""
+    try:
+        user, err_resp = get_authorized_user()
+        if err_resp:
+            return err_resp
+
+        batch = SyncBatch.query.filter_by(id=batch_id, user_id=user.id).first()
+        if not batch:
+            return jsonify({"error": "Sync batch not found"}), 404
+
+        data = SyncIngestService.to_dict(batch)
+        if batch.status == "pending":
+            data["pending_ahead"] = SyncIngestService.pending_ahead(batch)
+        return payload_response(data)
+
+    except Exception as e:
+        current_app.logger.exception("SYNC BATCH STATUS ERROR")
+        return jsonify({"error": str(e)}), 400
+
+
+@bp.route("/watermark", methods=["GET"])
+@jwt_required()
+def call_history_watermark():
+    """Cheap pre-sync check: the device only uploads calls newer than high_water
+    when its own count and checksum up to high_water match."""
+    try:
+        user, err_resp = get_authorized_user()
+        if err_resp:
+            return err_resp
+
+        watermark = SyncWatermarkService.load(user.id, CALL_HISTORY)
+        data = SyncWatermarkService.to_dict(watermark)
+        db.session.commit()  # keeps a watermark built on first use
+
+        return jsonify({"watermark": data})
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("CALL HISTORY WATERMARK ERROR")
+        return jsonify({"error": str(e)}), 400
+
+
 # -------------------------------------------------
 # 2️⃣ USER CALL HISTORY
 # -------------------------------------------------
@@ -239,12 +194,16 @@ def my_call_history():
             return err_resp
         user_id = user.id
 
-        q = CallHistory.query.filter_by(user_id=user_id).order_by(CallHistory.timestamp.desc())
+        q = (
+            db.session.query(*CALL_HISTORY_ROW.columns)
+            .filter(CallHistory.user_id == user_id)
+            .order_by(CallHistory.timestamp.desc())
+        )
         items, meta = paginate(q)
 
         return jsonify({
             "user_id": user_id,
-            "call_history": [r.to_dict() for r in items],
+            "call_history": CALL_HISTORY_ROW.serialize_all(items),
             "meta": meta
         })
 
@@ -261,12 +220,16 @@ def my_call_history():
 @admin_required
 def admin_user_call_history(user_id):
     try:
-        q = CallHistory.query.filter_by(user_id=user_id).order_by(CallHistory.timestamp.desc())
+        q = (
+            db.session.query(*CALL_HISTORY_ROW.columns)
+            .filter(CallHistory.user_id == user_id)
+            .order_by(CallHistory.timestamp.desc())
+        )
         items, meta = paginate(q)
 
         return jsonify({
             "user_id": user_id,
-            "call_history": [r.to_dict() for r in items],
+            "call_history": CALL_HISTORY_ROW.serialize_all(items),
             "meta": meta
         })
 
@@ -278,16 +241,108 @@ def admin_user_call_history(user_id):
 # -------------------------------------------------
 # 4️⃣ UPLOAD CALL RECORDING
 # -------------------------------------------------
+import hashlib
 import os
-from werkzeug.utils import secure_filename
+from app.models import Blob, UploadSession
+from app.services.blob_store import BlobStore
 
 ALLOWED_EXTENSIONS = {'mp3', 'wav', 'aac', 'm4a', 'amr', 'opus', 'ogg'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+
+def parse_recording_meta(source):
+    """
+    Read call metadata (form or JSON) used to match a recording to a call.
+    Returns (meta, error_response).
+    """
+    phone_number = source.get("phone_number")
+    timestamp_raw = source.get("timestamp")
+    call_type = source.get("call_type")
+    try:
+        duration = int(source.get("duration") or 0)
+    except (TypeError, ValueError):
+        duration = 0
+    contact_name = source.get("contact_name") or ""
+
+    if not phone_number or not timestamp_raw:
+        return None, (jsonify({"error": "Missing metadata (phone_number, timestamp)"}), 400)
+
+    # Parse timestamp
+    dt = parse_timestamp(timestamp_raw)
+    if not dt:
+        return None, (jsonify({"error": "Invalid timestamp"}), 400)
+
+    return {
+        "phone_number": phone_number,
+        "timestamp": timestamp_raw,
+        "call_type": call_type,
+        "duration": duration,
+        "contact_name": contact_name,
+    }, None
+
+
+def find_or_create_call(user_id, meta):
+    """Match a recording to its CallHistory row (creating it if sync has not arrived yet)."""
+    dt = parse_timestamp(meta["timestamp"])
+
+    # Ensure UTC and strip microseconds for matching
+    if dt.tzinfo:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    dt = dt.replace(microsecond=0)
+
+    # 🔍 Try to find existing record
+    # We match broadly on timestamp (within seconds tolerance?) 
+    # For now, exact match on normalized timestamp as per sync logic
+    record = CallHistory.query.filter(
+        CallHistory.user_id == user_id,
+        CallHistory.phone_number == meta["phone_number"],
+        CallHistory.timestamp == dt
+    ).first()
+
+    # If not found exactly, maybe allow small drift? (Optional, skipping for now)
+
+    if not record:
+        # Create new record if one doesn't exist (Recording arrived before sync or missed sync)
+        call_type = meta.get("call_type")
+        record = CallHistory(
+            user_id=user_id,
+            phone_number=meta["phone_number"],
+            formatted_number="", # Can be added if sent
+            call_type=call_type.lower() if call_type else "unknown",
+            duration=meta.get("duration") or 0,
+            timestamp=dt,
+            contact_name=meta.get("contact_name") or ""
+        )
+        db.session.add(record)
+        db.session.flush() # Get ID
+
+        # Keep the delta-sync watermark in step with rows created outside sync
+        watermark = SyncWatermarkService.load(user_id, CALL_HISTORY, for_update=True)
+        SyncWatermarkService.advance(
+            watermark, [(dt, call_key(dt, record.phone_number, record.call_type, record.duration))]
+        )
+
+    return record
+
+
+def attach_recording(record, blob):
+    """Point the call at a stored blob, keeping blob reference counts right."""
+    if record.recording_path == blob.path:
+        return blob.path  # retry of the same upload for the same call
+
+    BlobStore.release(record.recording_path)
+    BlobStore.add_ref(blob.path)
+
+    # Store relative path for frontend access (/uploads/...)
+    record.recording_path = blob.path
+    return blob.path
+
+
 @bp.route("/upload-recording", methods=["POST"])
 @jwt_required()
+@idempotent
 def upload_recording():
     try:
         user, err_resp = get_authorized_user()
@@ -307,63 +362,17 @@ def upload_recording():
             return jsonify({"error": "File type not allowed"}), 400
 
         # Metadata to match record
-        phone_number = request.form.get("phone_number")
-        timestamp_raw = request.form.get("timestamp")
-        call_type = request.form.get("call_type")
-        duration = request.form.get("duration", type=int) or 0
-        contact_name = request.form.get("contact_name") or ""
-        
-        if not phone_number or not timestamp_raw:
-            return jsonify({"error": "Missing metadata (phone_number, timestamp)"}), 400
+        meta, err_resp = parse_recording_meta(request.form)
+        if err_resp:
+            return err_resp
 
-        # Parse timestamp
-        dt = parse_timestamp(timestamp_raw)
-        if not dt:
-             return jsonify({"error": "Invalid timestamp"}), 400
+        record = find_or_create_call(user_id, meta)
         
-        # Ensure UTC and strip microseconds for matching
-        if dt.tzinfo:
-            dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
-        dt = dt.replace(microsecond=0)
-
-        # 🔍 Try to find existing record
-        # We match broadly on timestamp (within seconds tolerance?) 
-        # For now, exact match on normalized timestamp as per sync logic
-        record = CallHistory.query.filter(
-            CallHistory.user_id == user_id,
-            CallHistory.phone_number == phone_number,
-            CallHistory.timestamp == dt
-        ).first()
-
-        # If not found exactly, maybe allow small drift? (Optional, skipping for now)
-
-        if not record:
-            # Create new record if one doesn't exist (Recording arrived before sync or missed sync)
-            record = CallHistory(
-                user_id=user_id,
-                phone_number=phone_number,
-                formatted_number="", # Can be added if sent
-                call_type=call_type.lower() if call_type else "unknown",
-                duration=duration,
-                timestamp=dt,
-                contact_name=contact_name
-            )
-            db.session.add(record)
-            db.session.flush() # Get ID
-        
-        # 📂 Save File
-        # Structure: uploads/recordings/user_{id}/filename
-        upload_folder = os.path.join(current_app.root_path, 'static', 'uploads', 'recordings', f'user_{user_id}')
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        filename = secure_filename(f"{dt.strftime('%Y%m%d_%H%M%S')}_{phone_number}_{file.filename}")
-        file_path = os.path.join(upload_folder, filename)
-        file.save(file_path)
-        
-        # Store relative path for frontend access
-        # Assuming typical static setup: /static/uploads/...
-        relative_path = f"uploads/recordings/user_{user_id}/{filename}"
-        record.recording_path = relative_path
+        # 📂 Save File (content-addressed: uploads/recordings/<aa>/<bb>/<sha256>.<ext>)
+        # Streams to disk while hashing; a re-uploaded file is not stored twice.
+        ext = file.filename.rsplit('.', 1)[1].lower()
+        blob = BlobStore.put_stream(file.stream, "recordings", ext)
+        relative_path = attach_recording(record, blob)
         
         db.session.commit()
 
@@ -374,5 +383,265 @@ def upload_recording():
         }), 200
 
     except Exception as e:
+        db.session.rollback()
         current_app.logger.exception("UPLOAD RECORDING ERROR")
         return jsonify({"error": "Upload failed", "detail": str(e)}), 500
+
+
+# -------------------------------------------------
+# 5️⃣ RESUMABLE (CHUNKED) RECORDING UPLOAD
+#    POST   /recording-uploads                 → init (or resume) a session
+#    GET    /recording-uploads/<id>            → current offset
+#    PUT    /recording-uploads/<id>?offset=N   → append raw chunk at offset
+#    POST   /recording-uploads/<id>/complete   → verify sha256 + attach to call
+# -------------------------------------------------
+def _session_state(session):
+    part_path = BlobStore.partial_path(session.kind, session.id)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return {
+        "upload_id": session.id,
+        "offset": offset,
+        "size": session.total_size,
+        "status": session.status,
+        "chunk_size": current_app.config.get("RECORDING_CHUNK_SIZE", 1024 * 1024),
+    }
+
+
+def _get_upload_session(user_id, upload_id, for_update=False):
+    query = UploadSession.query.filter_by(id=upload_id, user_id=user_id)
+    if for_update:
+        # Serializes appends / completion of one session across workers
+        query = query.with_for_update()
+    session = query.first()
+    if not session:
+        return None, (jsonify({"error": "Upload session not found"}), 404)
+    return session, None
+
+
+def _expire_upload_sessions(user_id):
+    """Drop this user's abandoned sessions (no chunk within the TTL) and their partial files."""
+    ttl_hours = current_app.config.get("RECORDING_UPLOAD_TTL_HOURS", 24)
+    cutoff = datetime.utcnow() - timedelta(hours=ttl_hours)
+    stale = UploadSession.query.filter(
+        UploadSession.user_id == user_id,
+        UploadSession.updated_at < cutoff
+    ).all()
+    for session in stale:
+        part_path = BlobStore.partial_path(session.kind, session.id)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        db.session.delete(session)
+
+
+@bp.route("/recording-uploads", methods=["POST"])
+@jwt_required()
+@idempotent
+def init_recording_upload():
+    try:
+        user, err_resp = get_authorized_user()
+        if err_resp:
+            return err_resp
+
+        data = request.get_json(silent=True) or {}
+        filename = data.get("filename") or ""
+        sha256 = (data.get("sha256") or "").lower() or None
+
+        if not allowed_file(filename):
+            return jsonify({"error": "File type not allowed"}), 400
+
+        try:
+            total_size = int(data.get("size"))
+        except (TypeError, ValueError):
+            return jsonify({"error": "'size' (bytes) is required"}), 400
+
+        max_size = current_app.config.get("RECORDING_MAX_SIZE", 200 * 1024 * 1024)
+        if total_size <= 0 or total_size > max_size:
+            return jsonify({"error": f"size must be between 1 and {max_size} bytes"}), 400
+
+        meta, err_resp = parse_recording_meta(data)
+        if err_resp:
+            return err_resp
+
+        _expire_upload_sessions(user.id)
+
+        # This user already uploaded these bytes: attach them, nothing to upload.
+        # Anyone else has to send the file - knowing a hash is not having it.
+        if sha256:
+            blob = Blob.query.get(sha256)
+            if blob and blob.kind == "recordings" and db.session.query(CallHistory.id).filter(
+                CallHistory.user_id == user.id, CallHistory.recording_path == blob.path
+            ).first():
+                record = find_or_create_call(user.id, meta)
+                relative_path = attach_recording(record, blob)
+                db.session.commit()
+                return jsonify({
+                    "message": "Recording already uploaded",
+                    "status": "complete",
+                    "id": record.id,
+                    "path": relative_path
+                }), 200
+
+        # Same file again: resume the open session instead of starting from zero
+        session = None
+        if sha256:
+            session = UploadSession.query.filter_by(
+                user_id=user.id, sha256=sha256, status="pending"
+            ).first()
+
+        if not session:
+            session = UploadSession(
+                user_id=user.id,
+                kind="recordings",
+                filename=filename,
+                total_size=total_size,
+                sha256=sha256,
+                meta=meta,
+                status="pending"
+            )
+            db.session.add(session)
+
+        db.session.commit()
+
+        return jsonify(_session_state(session)), 200
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("INIT RECORDING UPLOAD ERROR")
+        return jsonify({"error": "Upload init failed", "detail": str(e)}), 500
+
+
+@bp.route("/recording-uploads/<upload_id>", methods=["GET"])
+@jwt_required()
+def recording_upload_status(upload_id):
+    user, err_resp = get_authorized_user()
+    if err_resp:
+        return err_resp
+
+    session, err_resp = _get_upload_session(user.id, upload_id)
+    if err_resp:
+        return err_resp
+
+    return jsonify(_session_state(session)), 200
+
+
+@bp.route("/recording-uploads/<upload_id>", methods=["PUT"])
+@jwt_required()
+def append_recording_chunk(upload_id):
+    try:
+        user, err_resp = get_authorized_user()
+        if err_resp:
+            return err_resp
+
+        session, err_resp = _get_upload_session(user.id, upload_id, for_update=True)
+        if err_resp:
+            return err_resp
+
+        if session.status != "pending":
+            return jsonify({"error": "Upload already completed"}), 409
+
+        offset = request.args.get("offset", type=int)
+        if offset is None:
+            offset = request.headers.get("Upload-Offset", type=int)
+        if offset is None or offset < 0:
+            return jsonify({"error": "offset is required"}), 400
+
+        part_path = BlobStore.partial_path(session.kind, session.id)
+        current = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+        # Chunks must be contiguous. Re-sending an earlier chunk is fine (retry).
+        if offset > current:
+            state = _session_state(session)
+            state["error"] = "Offset mismatch"
+            return jsonify(state), 409
+
+        max_chunk = current_app.config.get("RECORDING_MAX_CHUNK_SIZE", 8 * 1024 * 1024)
+        length = request.content_length
+        if length is not None and length > max_chunk:
+            return jsonify({"error": f"Chunk too large (max {max_chunk} bytes)"}), 413
+
+        # Stream the body straight into the partial file at the given offset
+        written = 0
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        with open(part_path, "r+b" if os.path.exists(part_path) else "wb") as f:
+            f.seek(offset)
+            while True:
+                chunk = request.stream.read(64 * 1024)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_chunk or offset + written > session.total_size:
+                    f.truncate(current)
+                    return jsonify({"error": "Chunk exceeds declared size"}), 413
+                f.write(chunk)
+
+        state = _session_state(session)
+        session.updated_at = datetime.utcnow()
+        db.session.commit()  # releases the session row lock
+        return jsonify(state), 200
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("APPEND RECORDING CHUNK ERROR")
+        return jsonify({"error": "Chunk upload failed", "detail": str(e)}), 500
+
+
+@bp.route("/recording-uploads/<upload_id>/complete", methods=["POST"])
+@jwt_required()
+@idempotent
+def complete_recording_upload(upload_id):
+    try:
+        user, err_resp = get_authorized_user()
+        if err_resp:
+            return err_resp
+
+        session, err_resp = _get_upload_session(user.id, upload_id, for_update=True)
+        if err_resp:
+            return err_resp
+
+        if session.status != "pending":
+            return jsonify({"error": "Upload already completed"}), 409
+
+        data = request.get_json(silent=True) or {}
+        expected = (data.get("sha256") or session.sha256 or "").lower()
+        if not expected:
+            return jsonify({"error": "sha256 checksum is required"}), 400
+
+        part_path = BlobStore.partial_path(session.kind, session.id)
+        size = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if size != session.total_size:
+            state = _session_state(session)
+            state["error"] = "Upload incomplete"
+            return jsonify(state), 409
+
+        hasher = hashlib.sha256()
+        with open(part_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+
+        if digest != expected:
+            # Corrupt upload - throw it away so the client restarts cleanly
+            os.remove(part_path)
+            return jsonify({"error": "Checksum mismatch", "offset": 0}), 422
+
+        record = find_or_create_call(user.id, session.meta or {})
+
+        # Rename into the content-addressed location (no copy)
+        ext = session.filename.rsplit('.', 1)[1].lower()
+        blob = BlobStore.adopt_file(part_path, digest, size, session.kind, ext)
+        relative_path = attach_recording(record, blob)
+
+        # Kept until it expires, so a late chunk retry gets a clear 409
+        session.status = "complete"
+        db.session.commit()
+
+        return jsonify({
+            "message": "Recording uploaded successfully",
+            "id": record.id,
+            "path": relative_path
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("COMPLETE RECORDING UPLOAD ERROR")
+        return jsonify({"error": "Upload failed", "detail": str(e)}), 500
@@ -3,19 +3,41 @@ from ..models import db, Followup, User
 from datetime import datetime, timedelta
 from flask_jwt_extended import jwt_required
 from app.auth_helpers import get_authorized_user
+from app.serializers import RowShape, ISO_Z, OR_UNKNOWN
+from app.payloads import read_payload, payload_response
+from app.services.idempotency import idempotent
 
 bp = Blueprint("followup", __name__, url_prefix="/api")
 
+# Same shape as Followup.to_dict(), built from column tuples
+FOLLOWUP_ROW = RowShape(
+    ("reminder_id", Followup.id),
+    ("user_id", Followup.user_id),
+    ("user_name", User.name, OR_UNKNOWN),
+    ("contact_name", Followup.contact_name),
+    ("phone", Followup.phone),
+    ("message", Followup.message),
+    ("date_time", Followup.date_time, ISO_Z),
+    ("status", Followup.status),
+    ("created_at", Followup.created_at, ISO_Z),
+)
+
 @bp.route("/followup/create", methods=["POST"])
 @jwt_required()
+@idempotent
 def create_followup():
     try:
-        data = request.get_json()
-        
         # Verify Auth & Expiry
         user, err_resp = get_authorized_user()
         if err_resp:
             return err_resp
+
+        # JSON, MessagePack or CBOR body
+        data, err_resp = read_payload()
+        if err_resp:
+            return err_resp
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid request format"}), 400
             
         # Validate required fields
         required_fields = ["reminder_id", "user_id", "phone", "date_time"]
@@ -54,11 +76,11 @@ def create_followup():
         db.session.add(followup)
         db.session.commit()
 
-        return jsonify({
+        return payload_response({
             "success": True,
             "message": "Reminder saved",
             "reminder_id": followup.id
-        }), 201
+        }, 201)
 
     except Exception as e:
         current_app.logger.exception("Create followup failed")
@@ -72,11 +94,15 @@ def get_admin_followups():
         user_id = request.args.get("user_id")
         date_filter = request.args.get("filter") # today, tomorrow, yesterday, all
 
-        query = Followup.query
+        query = (
+            db.session.query(*FOLLOWUP_ROW.columns)
+            .select_from(Followup)
+            .outerjoin(User, Followup.user_id == User.id)
+        )
 
         # Apply User Filter
         if user_id and user_id.lower() != "all":
-            query = query.filter_by(user_id=user_id)
+            query = query.filter(Followup.user_id == user_id)
 
         # Apply Date Filter
         if date_filter and date_filter.lower() != "all":
@@ -103,7 +129,7 @@ def get_admin_followups():
         # Fetch and sort
         followups = query.order_by(Followup.date_time.asc()).all()
         
-        result = [f.to_dict() for f in followups]
+        result = FOLLOWUP_ROW.serialize_all(followups)
         
         return jsonify(result), 200
         
@@ -0,0 +1,24 @@
+from flask import Blueprint, Response, jsonify
+from flask_jwt_extended import jwt_required, get_jwt
+
+from app.request_metrics import registry
+
+bp = Blueprint("metrics", __name__, url_prefix="/api")
+
+
+# =========================================================
+# PROMETHEUS METRICS (super admin only)
+# =========================================================
+@bp.route("/metrics", methods=["GET"])
+@jwt_required()
+def metrics():
+    """
+    Per-endpoint latency / query metrics summed over all workers (see
+    MetricsRegistry), in Prometheus text format. Other workers' numbers
+    are up to METRICS_FLUSH_SECONDS old. Scrape with a super admin token
+    (bearer_token in the Prometheus job).
+    """
+    if get_jwt().get("role") != "super_admin":
+        return jsonify({"error": "Super admin access required"}), 403
+
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -2,6 +2,10 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity
 from datetime import datetime
 from ..models import db, SuperAdmin, Admin, User, ActivityLog, UserRole
+from ..db_routing import read_replica
+from ..services.blob_store import BlobStore
+from ..services.last_seen import LastSeenBuffer
+from sqlalchemy import func, case, or_
 import re
 
 bp = Blueprint("super_admin", __name__, url_prefix="/api/superadmin")
@@ -23,6 +27,50 @@ def _safe_enum_value(role):
         return str(role)
 
 
+def _user_counts_by_admin(admin_ids=None):
+    """
+    Count users per admin with ONE grouped query instead of one count per admin.
+    Pass admin_ids to restrict the scan to a single page of admins.
+    Returns {admin_id: user_count}.
+    """
+    q = db.session.query(User.admin_id, func.count(User.id)).group_by(User.admin_id)
+    if admin_ids is not None:
+        if not admin_ids:
+            return {}
+        q = q.filter(User.admin_id.in_(admin_ids))
+    return {admin_id: count for admin_id, count in q.all()}
+
+
+def _paginate_args(default_per_page=50):
+    """
+    Read ?page & ?per_page. Returns (page, per_page) or (None, None) when
+    the caller did not ask for pagination (keeps the old full-list response).
+    """
+    if "page" not in request.args and "per_page" not in request.args:
+        return None, None
+    try:
+        page = max(1, int(request.args.get("page", 1)))
+    except ValueError:
+        page = 1
+    try:
+        per_page = int(request.args.get("per_page", default_per_page))
+    except ValueError:
+        per_page = default_per_page
+    per_page = max(1, min(per_page, 200))  # bound per_page
+    return page, per_page
+
+
+def _pagination_meta(pagination):
+    return {
+        "page": pagination.page,
+        "per_page": pagination.per_page,
+        "total": pagination.total,
+        "pages": pagination.pages,
+        "has_next": pagination.has_next,
+        "has_prev": pagination.has_prev,
+    }
+
+
 # =========================================================
 # SUPER ADMIN LOGIN
 # =========================================================
@@ -153,27 +201,54 @@ def create_admin():
 @bp.route("/admins", methods=["GET"])
 @jwt_required()
 def get_admins():
+    """
+    List admins with their user counts.
+    Optional: ?search= (name/email), ?page= & ?per_page= (max 200).
+    Without page params the full list is returned (used by the console).
+    """
     try:
-        admins = Admin.query.order_by(Admin.created_at.desc()).all()
+        query = Admin.query
+
+        # Search filter
+        search = request.args.get("search", "").strip()
+        if search:
+            term = f"%{search}%"
+            query = query.filter(or_(Admin.name.ilike(term), Admin.email.ilike(term)))
+
+        query = query.order_by(Admin.created_at.desc())
+
+        page, per_page = _paginate_args()
+        meta = None
+        if page:
+            pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+            admins = pagination.items
+            meta = _pagination_meta(pagination)
+            user_counts = _user_counts_by_admin([a.id for a in admins])
+        else:
+            admins = query.all()
+            user_counts = _user_counts_by_admin([a.id for a in admins] if search else None)
+
         result = []
 
         for a in admins:
-            user_count = User.query.filter_by(admin_id=a.id).count()
-
+            last_login = LastSeenBuffer.last_login(a)
             result.append({
                 "id": a.id,
                 "name": a.name,
                 "email": a.email,
                 "user_limit": a.user_limit,
-                "user_count": user_count,
+                "user_count": user_counts.get(a.id, 0),
                 "is_active": a.is_active,
                 "is_expired": a.is_expired(),
                 "created_at": a.created_at.isoformat(),
-                "last_login": a.last_login.isoformat() if a.last_login else None,
-                "expiry_date": a.expiry_date.isoformat(),
+                "last_login": last_login.isoformat() if last_login else None,
+                "expiry_date": a.expiry_date.isoformat() if a.expiry_date else None,
             })
 
-        return jsonify({"admins": result}), 200
+        response = {"admins": result}
+        if meta:
+            response["meta"] = meta
+        return jsonify(response), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -184,16 +259,24 @@ def get_admins():
 # =========================================================
 @bp.route("/dashboard-stats", methods=["GET"])
 @jwt_required()
+@read_replica
 def dashboard_stats():
     try:
         super_admin_id = get_jwt_identity()
         super_admin = SuperAdmin.query.get(super_admin_id)
 
+        # One pass over admins for all three admin counters
+        total_admins, active_admins, expired_admins = db.session.query(
+            func.count(Admin.id),
+            func.sum(case((Admin.is_active == True, 1), else_=0)),
+            func.sum(case((Admin.expiry_date < datetime.utcnow(), 1), else_=0)),
+        ).one()
+
         stats = {
-            "total_admins": Admin.query.count(),
-            "active_admins": Admin.query.filter_by(is_active=True).count(),
-            "expired_admins": Admin.query.filter(Admin.expiry_date < datetime.utcnow()).count(),
-            "total_users": User.query.count(),
+            "total_admins": total_admins or 0,
+            "active_admins": int(active_admins or 0),
+            "expired_admins": int(expired_admins or 0),
+            "total_users": db.session.query(func.count(User.id)).scalar() or 0,
             "super_admin_name": super_admin.name if super_admin else "Super Admin",
             "super_admin_email": super_admin.email if super_admin else "superadmin@example.com",
         }
@@ -224,6 +307,16 @@ def activity_logs():
             print(f"ActivityLog table error: {table_error}")
             return jsonify({"logs": []}), 200
 
+        # Resolve actor names with one query per role instead of one per log
+        admin_ids = {log.actor_id for log in logs if log.actor_role == UserRole.ADMIN}
+        user_ids = {log.actor_id for log in logs if log.actor_role == UserRole.USER}
+        admin_names = dict(
+            db.session.query(Admin.id, Admin.name).filter(Admin.id.in_(admin_ids)).all()
+        ) if admin_ids else {}
+        user_names = dict(
+            db.session.query(User.id, User.name).filter(User.id.in_(user_ids)).all()
+        ) if user_ids else {}
+
         formatted = []
         for log in logs:
             display_name = "Unknown"
@@ -232,13 +325,9 @@ def activity_logs():
                 if log.actor_role == UserRole.SUPER_ADMIN:
                     display_name = "Super Admin"
                 elif log.actor_role == UserRole.ADMIN:
-                    admin = Admin.query.get(log.actor_id)
-                    display_name = admin.name if admin else f"Admin #{log.actor_id} (Deleted)"
+                    display_name = admin_names.get(log.actor_id) or f"Admin #{log.actor_id} (Deleted)"
                 elif log.actor_role == UserRole.USER:
-                    user = User.query.get(log.actor_id)
-                    display_name = f"User #{log.actor_id}" # Simplify as user name might not be needed or User model issue
-                    if user:
-                         display_name = user.name
+                    display_name = user_names.get(log.actor_id) or f"User #{log.actor_id}"
             except Exception as inner_e:
                 print(f"Error processing log {log.id}: {inner_e}")
                 display_name = "Error Resolving Name"
@@ -403,8 +492,9 @@ def delete_admin(admin_id):
         if not admin:
             return jsonify({"error": "Admin not found"}), 404
 
-        # Delete admin
+        # Delete admin (and, by cascade, their users' rows and file references)
         admin_name = admin.name
+        BlobStore.release_users([u.id for u in admin.users])
         db.session.delete(admin)
         db.session.commit()
 
@@ -433,7 +523,17 @@ def get_admin_users(admin_id):
         if not SuperAdmin.query.get(super_admin_id):
             return jsonify({"error": "Unauthorized"}), 401
         
-        users = User.query.filter_by(admin_id=admin_id).all()
+        query = User.query.filter_by(admin_id=admin_id).order_by(User.created_at.desc())
+
+        page, per_page = _paginate_args()
+        meta = None
+        if page:
+            pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+            users = pagination.items
+            meta = _pagination_meta(pagination)
+        else:
+            users = query.all()
+
         result = []
         for u in users:
             result.append({
@@ -446,6 +546,9 @@ def get_admin_users(admin_id):
                 "last_login": u.last_login.isoformat() if u.last_login else None
             })
             
-        return jsonify({"users": result}), 200
+        response = {"users": result}
+        if meta:
+            response["meta"] = meta
+        return jsonify(response), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
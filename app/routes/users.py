@@ -13,6 +13,8 @@ import re
 
 from app.models import db, User, Admin, ActivityLog, UserRole
 from app.auth_helpers import get_authorized_user
+from app.services.last_seen import LastSeenBuffer
+from app.services.presence import PresenceRegistry
 
 bp = Blueprint("users", __name__, url_prefix="/api/users")
 
@@ -167,8 +169,10 @@ def login():
         import uuid
         session_id = uuid.uuid4().hex
         try:
+            # The row is written for the session id anyway, so last_login rides along
             user.last_login = datetime.utcnow()
             user.current_session_id = session_id
+            PresenceRegistry.seen(user.admin_id, user.id, user.name, user.last_login)
             db.session.commit()
         except:
             db.session.rollback()
@@ -178,7 +182,8 @@ def login():
             expires_delta=timedelta(days=1),
             additional_claims={
                 "role": "user",
-                "session_id": session_id
+                "session_id": session_id,
+                "admin_id": user.admin_id
             }
         )
 
@@ -190,7 +195,7 @@ def login():
                 "email": user.email,
                 "phone": user.phone,
                 "role": "user",
-                "last_sync": iso(user.last_sync)
+                "last_sync": iso(LastSeenBuffer.last_sync(user))
             }
         }), 200
 
@@ -222,8 +227,8 @@ def get_me():
                 "email": user.email,
                 "phone": user.phone,
                 "created_at": iso(user.created_at),
-                "last_login": iso(user.last_login),
-                "last_sync": iso(user.last_sync),
+                "last_login": iso(LastSeenBuffer.last_login(user)),
+                "last_sync": iso(LastSeenBuffer.last_sync(user)),
             }
         }), 200
 
@@ -278,12 +283,13 @@ def sync_data():
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        user.last_sync = datetime.utcnow()
+        last_sync = LastSeenBuffer.touch(user, "last_sync")
+        PresenceRegistry.seen(user.admin_id, user.id, user.name, last_sync)
         db.session.commit()
 
         return jsonify({
             "message": "Data synced",
-            "last_sync": iso(user.last_sync)
+            "last_sync": iso(last_sync)
         }), 200
 
     except Exception as e:
@@ -307,7 +313,7 @@ def sync_status():
 
         return jsonify({
             "sync_status": {
-                "last_sync": iso(user.last_sync),
+                "last_sync": iso(LastSeenBuffer.last_sync(user)),
                 "call_history_count": count
             }
         }), 200
@@ -0,0 +1,53 @@
+"""
+Column-tuple serialization for list endpoints.
+
+A RowShape names the columns a response needs and compiles one function
+that turns a result row (plain tuple) into the response dict. List queries
+select `shape.columns` instead of ORM entities, so no objects or identity
+map are built just to emit JSON.
+
+    CALL_ROW = RowShape(
+        ("id", CallHistory.id),
+        ("timestamp", CallHistory.timestamp, ISO),
+    )
+    rows = db.session.query(*CALL_ROW.columns).filter(...).all()
+    return jsonify(CALL_ROW.serialize_all(rows))
+"""
+
+# Value formatters: source templates where {v} is the row item
+ISO = "({v}.isoformat() if {v} is not None else None)"
+ISO_Z = "({v}.isoformat() + 'Z' if {v} is not None else None)"
+OR_UNKNOWN = "({v} if {v} is not None else 'Unknown')"  # like to_dict: "" stays ""
+
+
+class RowShape:
+    """
+    fields: (key, column) or (key, column, formatter) tuples, in output
+    order. A formatter is one of the templates above or a callable.
+    """
+
+    def __init__(self, *fields):
+        self.keys = tuple(f[0] for f in fields)
+        self.columns = tuple(f[1] for f in fields)
+        self.serialize = _compile(fields)
+
+    def serialize_all(self, rows):
+        return list(map(self.serialize, rows))
+
+
+def _compile(fields):
+    namespace = {}
+    items = []
+    for i, field in enumerate(fields):
+        key, formatter = field[0], field[2] if len(field) > 2 else None
+        value = f"row[{i}]"
+        if callable(formatter):
+            namespace[f"_f{i}"] = formatter
+            value = f"_f{i}({value})"
+        elif formatter:
+            value = formatter.format(v=value)
+        items.append(f"{key!r}: {value}")
+
+    source = "def serialize(row):\n    return {" + ", ".join(items) + "}\n"
+    exec(compile(source, "<RowShape>", "exec"), namespace)
+    return namespace["serialize"]
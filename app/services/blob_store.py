@@ -0,0 +1,263 @@
+import hashlib
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, Attendance, Blob, CallHistory
+
+CHUNK_SIZE = 1024 * 1024
+
+# session.info key: files of blobs deleted in the open transaction
+PENDING_DELETES = "blob_store_pending_deletes"
+
+# Unreferenced blobs: purged at most this often per process, this many at a time
+ORPHAN_PURGE_INTERVAL_SECONDS = 600
+ORPHAN_PURGE_BATCH = 100
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed, write-once storage for uploads.
+
+    Files live at uploads/<kind>/<aa>/<bb>/<sha256>.<ext>, so the same bytes
+    are only ever stored once. Each Blob row counts the rows that point at
+    its path (attendance images, call recordings): storing takes no
+    reference, add_ref() is called when a row starts pointing at the path
+    and release() when it stops. The file is removed with the last
+    reference; blobs nobody ever referenced are purged after
+    BLOB_ORPHAN_TTL_HOURS.
+    """
+    _last_purge = 0.0  # monotonic time of this process's last orphan purge
+
+    @staticmethod
+    def _root(kind):
+        # Keep each kind where it was stored before, so /uploads serves both.
+        if kind == "recordings":
+            return os.path.join(current_app.root_path, "static", "uploads")
+        return os.path.join(os.getcwd(), "uploads")
+
+    @staticmethod
+    def _relative_path(kind, digest, ext):
+        ext = (ext or "bin").lower().lstrip(".")
+        return f"uploads/{kind}/{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+    @staticmethod
+    def _absolute_path(kind, relative_path):
+        # relative_path starts with "uploads/"
+        return os.path.join(BlobStore._root(kind), relative_path.split("/", 1)[1])
+
+    @staticmethod
+    def partial_path(kind, upload_id):
+        """Where a resumable upload is assembled (same filesystem as the final blob)."""
+        return os.path.join(BlobStore._root(kind), kind, ".partial", f"{upload_id}.part")
+
+    # -------------------------
+    # Lookup
+    # -------------------------
+    @staticmethod
+    def find_by_source(source_hash, kind):
+        """Blob of this kind previously produced from these exact upload bytes (or None)."""
+        return Blob.query.filter_by(source_hash=source_hash, kind=kind).first()
+
+    @staticmethod
+    def _digest(relative_path):
+        return os.path.basename(relative_path).split(".", 1)[0]
+
+    @staticmethod
+    def add_ref(relative_path):
+        """A row now points at relative_path. Caller commits."""
+        if not relative_path:
+            return
+        Blob.query.filter_by(id=BlobStore._digest(relative_path), path=relative_path).update(
+            {Blob.ref_count: Blob.ref_count + 1}, synchronize_session=False
+        )
+
+    # -------------------------
+    # Store
+    # -------------------------
+    @staticmethod
+    def put_bytes(data, kind, ext, source_hash=None):
+        """Store bytes (if not already stored). Caller commits."""
+        digest = sha256_bytes(data)
+        existing = Blob.query.get(digest)
+        if existing:
+            return existing
+
+        relative_path = BlobStore._relative_path(kind, digest, ext)
+        abs_path = BlobStore._absolute_path(kind, relative_path)
+        if not os.path.exists(abs_path):
+            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+            tmp_path = f"{abs_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, abs_path)
+
+        return BlobStore._insert(digest, kind, relative_path, len(data), source_hash)
+
+    @staticmethod
+    def put_stream(stream, kind, ext, source_hash=None):
+        """
+        Stream a file into the store while hashing it (no full copy in memory).
+        Returns the Blob. Caller commits.
+        """
+        tmp_dir = os.path.join(BlobStore._root(kind), kind, ".tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            return BlobStore.adopt_file(tmp_path, hasher.hexdigest(), size, kind, ext, source_hash)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def adopt_file(tmp_path, digest, size, kind, ext, source_hash=None):
+        """Move an already-hashed temp file into place (or drop it if we have it)."""
+        existing = Blob.query.get(digest)
+        if existing:
+            os.remove(tmp_path)
+            return existing
+
+        relative_path = BlobStore._relative_path(kind, digest, ext)
+        abs_path = BlobStore._absolute_path(kind, relative_path)
+        if os.path.exists(abs_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+            os.replace(tmp_path, abs_path)
+
+        return BlobStore._insert(digest, kind, relative_path, size, source_hash)
+
+    @staticmethod
+    def _insert(digest, kind, relative_path, size, source_hash):
+        blob = Blob(
+            id=digest,
+            source_hash=source_hash or digest,
+            kind=kind,
+            path=relative_path,
+            size=size,
+            ref_count=0,
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(blob)
+        except IntegrityError:
+            # Same bytes uploaded concurrently - the other request won the insert
+            return Blob.query.get(digest)
+        return blob
+
+    # -------------------------
+    # Release
+    # -------------------------
+    @staticmethod
+    def release(relative_path):
+        """
+        A row no longer points at relative_path. Caller commits; the file of
+        a blob left unreferenced is removed only once that commit succeeds,
+        so a rollback never leaves rows pointing at a missing file.
+        """
+        BlobStore.release_many([relative_path])
+
+    @staticmethod
+    def release_many(relative_paths):
+        """release() for many paths (repeats count), with one lookup."""
+        counts = Counter(path for path in relative_paths if path)
+        if not counts:
+            return
+        digests = {BlobStore._digest(path) for path in counts}
+        for blob in Blob.query.filter(Blob.id.in_(digests)).all():
+            dropped = counts.get(blob.path, 0)
+            if not dropped:
+                continue  # legacy (pre blob store) file under another path
+            if (blob.ref_count or 0) > dropped:
+                Blob.query.filter_by(id=blob.id).update(
+                    {Blob.ref_count: Blob.ref_count - dropped}, synchronize_session=False
+                )
+            else:
+                BlobStore._delete(blob)
+
+    @staticmethod
+    def release_users(user_ids):
+        """Release every image / recording of these users' rows (before deleting them)."""
+        if not user_ids:
+            return
+        paths = []
+        for image_path, check_out_image in db.session.query(
+            Attendance.image_path, Attendance.check_out_image
+        ).filter(Attendance.user_id.in_(user_ids)):
+            paths += [image_path, check_out_image]
+        paths += [path for (path,) in db.session.query(CallHistory.recording_path).filter(
+            CallHistory.user_id.in_(user_ids), CallHistory.recording_path.isnot(None)
+        )]
+        BlobStore.release_many(paths)
+
+    @staticmethod
+    def purge_orphans():
+        """
+        Drop blobs stored but never referenced (an image uploaded whose
+        attendance never synced) once they are BLOB_ORPHAN_TTL_HOURS old.
+        Runs at most every few minutes per process. Caller commits.
+        """
+        now = time.monotonic()
+        if now - BlobStore._last_purge < ORPHAN_PURGE_INTERVAL_SECONDS:
+            return
+        BlobStore._last_purge = now
+        cutoff = datetime.utcnow() - timedelta(hours=current_app.config.get("BLOB_ORPHAN_TTL_HOURS", 72))
+        for blob in Blob.query.filter(Blob.ref_count <= 0, Blob.created_at < cutoff).limit(ORPHAN_PURGE_BATCH):
+            BlobStore._delete(blob)
+
+    @staticmethod
+    def _delete(blob):
+        abs_path = BlobStore._absolute_path(blob.kind, blob.path)
+        db.session.delete(blob)
+        db.session.info.setdefault(PENDING_DELETES, []).append((blob.id, abs_path))
+
+
+def _remove_files(session):
+    if session.in_nested_transaction():
+        return  # a savepoint was released; the outer transaction may still roll back
+    pending = session.info.pop(PENDING_DELETES, None)
+    if not pending:
+        return
+    with db.engine.connect() as conn:  # the primary, never a replica
+        for digest, abs_path in pending:
+            # The same bytes may have been stored again since our DELETE committed
+            if conn.execute(select(Blob.id).where(Blob.id == digest)).first():
+                continue
+            try:
+                if os.path.exists(abs_path):
+                    os.remove(abs_path)
+            except OSError as e:
+                logging.warning(f"Could not remove blob file {abs_path}: {e}")
+
+
+def _forget_files(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(PENDING_DELETES, None)  # rolled back (a commit already took them)
+
+
+if not event.contains(Session, "after_commit", _remove_files):
+    event.listen(Session, "after_commit", _remove_files)
+    event.listen(Session, "after_transaction_end", _forget_files)
@@ -0,0 +1,193 @@
+import hashlib
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, IdempotencyKey
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+# Response headers stored with the body and sent again on replay
+REPLAYED_HEADERS = ("Location", "Retry-After", "Content-Encoding")
+
+# Retry-After of the 409 a duplicate gets while the first request still runs
+IN_PROGRESS_RETRY_SECONDS = 1
+
+# Expired keys are purged at most this often per process
+PURGE_INTERVAL_SECONDS = 300
+_last_purge = 0.0
+
+
+def request_fingerprint():
+    """SHA-256 of what makes two requests "the same": method, path, query and body."""
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.full_path}\n".encode())
+    if request.mimetype == "multipart/form-data":
+        # The boundary changes on every retry: hash the parsed fields and files
+        for name, value in sorted(request.form.items(multi=True)):
+            digest.update(f"{name}={value}\n".encode())
+        for name, file in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(f"{name}:{file.filename}\n".encode())
+            for chunk in iter(lambda: file.stream.read(1024 * 1024), b""):
+                digest.update(chunk)
+            file.stream.seek(0)
+    else:
+        digest.update(request.get_data())  # cached, the endpoint still reads it
+    return digest.hexdigest()
+
+
+class IdempotencyService:
+    """
+    Claim / store / replay of Idempotency-Key responses.
+
+    The first request with a key inserts a row (status_code NULL) and runs;
+    its final response is stored on the row. A retry with the same key gets
+    the stored response back without running the endpoint again, and a
+    duplicate that arrives while the first is still running gets a 409 with
+    Retry-After. Server errors are not stored, so those retries run again.
+    """
+
+    @staticmethod
+    def claim(scope, key, fingerprint):
+        """
+        Returns (None, None) when this request owns the key and must run,
+        (record, None) with a completed record to replay, or (None, error_response).
+        """
+        config = current_app.config
+        ttl = timedelta(hours=config.get("IDEMPOTENCY_TTL_HOURS", 24))
+        lock = timedelta(seconds=config.get("IDEMPOTENCY_LOCK_SECONDS", 120))
+
+        IdempotencyService.purge_expired(ttl)
+
+        while True:
+            try:
+                db.session.execute(insert(IdempotencyKey).values(
+                    scope=scope, key=key, fingerprint=fingerprint, created_at=datetime.utcnow()
+                ))
+                db.session.commit()
+                return None, None
+            except IntegrityError:
+                db.session.rollback()
+
+            record = db.session.get(IdempotencyKey, (scope, key), populate_existing=True)
+            if record is None:
+                continue  # released in the meantime
+
+            if record.fingerprint != fingerprint:
+                return None, (jsonify({"error": f"{HEADER} was already used for a different request"}), 422)
+
+            if record.status_code is not None and record.created_at >= datetime.utcnow() - ttl:
+                return record, None
+
+            # Expired, or the first request died without releasing the key: take it over
+            if record.status_code is not None or record.created_at < datetime.utcnow() - lock:
+                db.session.execute(delete(IdempotencyKey).where(
+                    IdempotencyKey.scope == scope,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.created_at == record.created_at,
+                ))
+                db.session.commit()
+                continue
+
+            # Still running elsewhere: the client retries later rather than
+            # holding a worker while it waits
+            db.session.rollback()
+            response = jsonify({"error": "A request with this Idempotency-Key is still in progress"})
+            response.headers["Retry-After"] = str(IN_PROGRESS_RETRY_SECONDS)
+            return None, (response, 409)
+
+    @staticmethod
+    def store(scope, key, response):
+        values = {
+            "status_code": response.status_code,
+            "mimetype": response.mimetype,
+            "body": response.get_data(),
+            "headers": {
+                name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers
+            } or None,
+            "completed_at": datetime.utcnow(),
+        }
+        IdempotencyService._finish(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+            .values(**values)
+        )
+
+    @staticmethod
+    def release(scope, key):
+        """Forget an unfinished key so the next retry runs the request again."""
+        IdempotencyService._finish(
+            delete(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        )
+
+    @staticmethod
+    def _finish(statement):
+        # The endpoint may have left the session in a failed transaction
+        for attempt in range(2):
+            try:
+                db.session.execute(statement)
+                db.session.commit()
+                return
+            except Exception:
+                db.session.rollback()
+                if attempt:
+                    current_app.logger.exception("Idempotency key bookkeeping failed")
+
+    @staticmethod
+    def replay(record):
+        response = current_app.response_class(record.body, status=record.status_code, mimetype=record.mimetype)
+        for name, value in (record.headers or {}).items():
+            response.headers[name] = value
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+    @staticmethod
+    def purge_expired(ttl):
+        global _last_purge
+        if time.monotonic() - _last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        _last_purge = time.monotonic()
+        db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < datetime.utcnow() - ttl))
+        db.session.commit()
+
+
+def idempotent(fn):
+    """
+    Honour an Idempotency-Key header on a JWT-protected endpoint
+    (goes below @jwt_required()). Requests without the header run as usual.
+    """
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not current_app.config.get("IDEMPOTENCY_ENABLED", True):
+            return fn(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{HEADER} is longer than {MAX_KEY_LENGTH} characters"}), 400
+
+        scope = f"{get_jwt().get('role')}:{get_jwt_identity()}"
+        record, err_resp = IdempotencyService.claim(scope, key, request_fingerprint())
+        if err_resp:
+            return err_resp
+        if record is not None:
+            return IdempotencyService.replay(record)
+
+        try:
+            response = current_app.make_response(fn(*args, **kwargs))
+        except Exception:
+            IdempotencyService.release(scope, key)
+            raise
+
+        if response.status_code >= 500 or response.is_streamed:
+            IdempotencyService.release(scope, key)
+        else:
+            IdempotencyService.store(scope, key, response)
+        return response
+
+    return wrapper
@@ -0,0 +1,153 @@
+import io
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+
+# Output limits for attendance selfies
+MAX_WIDTH = 1024
+TARGET_BYTES = 200 * 1024
+QUALITY_HIGH = 70
+QUALITY_LOW = 50
+
+# Size of the probe used to estimate the encoded size before the real encode
+PROBE_WIDTH = 256
+
+
+class ImageQueueFull(Exception):
+    """Raised when the compression pool is saturated (caller should retry later)."""
+
+
+def compress_image(data):
+    """
+    Decode, resize and JPEG-encode an uploaded image.
+    Runs inside a pool worker, so it only takes/returns plain bytes.
+    Returns (jpeg_bytes, quality_used).
+    """
+    # Imported here so web workers don't pay for Pillow at boot
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+
+    # JPEG: let libjpeg decode at 1/2, 1/4 or 1/8 scale straight away
+    # instead of decoding the full 12MP frame and throwing most of it away.
+    if img.format == "JPEG" and img.width > MAX_WIDTH:
+        target_height = int(img.height * MAX_WIDTH / img.width)
+        img.draft("RGB", (MAX_WIDTH, target_height))
+
+    # Convert RGBA to RGB if necessary
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    # Resize if too large (max width 1024px)
+    if img.width > MAX_WIDTH:
+        ratio = MAX_WIDTH / img.width
+        new_height = int(img.height * ratio)
+        img = img.resize((MAX_WIDTH, new_height), Image.Resampling.LANCZOS)
+
+    # Estimate the full-size output from a small probe encode and pick the
+    # quality up front, so the full image is only encoded once.
+    quality = QUALITY_HIGH
+    if img.width > PROBE_WIDTH:
+        probe = img.resize((PROBE_WIDTH, max(1, int(img.height * PROBE_WIDTH / img.width))), Image.Resampling.BILINEAR)
+        probe_buf = io.BytesIO()
+        probe.save(probe_buf, "JPEG", quality=QUALITY_HIGH)
+        scale = (img.width * img.height) / float(probe.width * probe.height)
+        if probe_buf.tell() * scale > TARGET_BYTES:
+            quality = QUALITY_LOW
+
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality, optimize=True)
+    return out.getvalue(), quality
+
+
+class ImageService:
+    """
+    Bounded process pool for image compression.
+    The pool is created lazily in each worker process (safe with gunicorn forks).
+    """
+    _pool = None
+    _slots = None
+    _workers = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _get_pool():
+        with ImageService._lock:
+            if ImageService._slots is None:
+                workers = current_app.config.get("IMAGE_POOL_WORKERS", 2)
+                max_pending = current_app.config.get("IMAGE_POOL_MAX_PENDING", 8)
+                # In-flight jobs (running + queued). Beyond this we shed load.
+                ImageService._slots = threading.BoundedSemaphore(max(1, max_pending))
+                ImageService._workers = workers
+            if ImageService._pool is None and ImageService._workers > 0:
+                ImageService._pool = ProcessPoolExecutor(max_workers=ImageService._workers)
+            return ImageService._pool
+
+    @staticmethod
+    def process(data):
+        """
+        Compress image bytes in the pool.
+        Returns (jpeg_bytes, quality_used). Raises ImageQueueFull on
+        backpressure, including a job that did not finish within
+        IMAGE_POOL_TIMEOUT_SECONDS.
+        """
+        pool = ImageService._get_pool()
+        wait = current_app.config.get("IMAGE_POOL_WAIT_SECONDS", 5.0)
+        timeout = current_app.config.get("IMAGE_POOL_TIMEOUT_SECONDS", 30.0)
+
+        slots = ImageService._slots
+        if not slots.acquire(timeout=wait):
+            raise ImageQueueFull("Image processing queue is full")
+
+        if pool is None:
+            # IMAGE_POOL_WORKERS=0 → process inline (dev / tests)
+            try:
+                return compress_image(data)
+            finally:
+                slots.release()
+
+        try:
+            future = pool.submit(compress_image, data)
+        except BrokenProcessPool:
+            slots.release()
+            ImageService._discard_pool()
+            raise
+        # The slot is held until the job really leaves the pool - a job that
+        # timed out here may still be queued or running there
+        future.add_done_callback(lambda _: slots.release())
+
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()  # only succeeds while it is still queued
+            raise ImageQueueFull("Image processing timed out")
+        except BrokenProcessPool:
+            ImageService._discard_pool()
+            raise
+
+    @staticmethod
+    def _discard_pool():
+        # A worker died (e.g. OOM on a huge image) - rebuild the pool next time
+        logging.error("Image pool broken, recreating")
+        with ImageService._lock:
+            ImageService._pool = None
+
+    @staticmethod
+    def shutdown():
+        with ImageService._lock:
+            if ImageService._pool is not None:
+                ImageService._pool.shutdown(wait=False, cancel_futures=True)
+                logging.info("Image pool shut down")
+            ImageService._pool = None
+
+    @staticmethod
+    def reset_after_fork():
+        """Forget pool state inherited from the parent (gunicorn --preload)."""
+        ImageService._lock = threading.Lock()
+        ImageService._pool = None
+        ImageService._slots = None
+        ImageService._workers = 0
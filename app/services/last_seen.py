@@ -0,0 +1,209 @@
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import case, or_, update
+
+from app.db_routing import REPLICA_BIND
+from app.models import db, User
+
+log = logging.getLogger(__name__)
+
+# Ids per UPDATE statement
+FLUSH_CHUNK = 500
+
+
+class LastSeenBuffer:
+    """
+    Write-behind buffer for presence timestamps (users.last_sync,
+    users.last_login, admins.last_login).
+
+    Every sync and login used to UPDATE its users / admins row, so a burst
+    of syncs queued on row locks and churned WAL for a value nobody needs
+    to the millisecond. Timestamps are kept here instead and a background
+    thread writes them every LAST_SEEN_FLUSH_SECONDS: one UPDATE ... CASE
+    per column for the whole batch, never moving a value backwards (so
+    workers flushing out of order are harmless).
+
+    Readers go through value() / last_sync() / last_login(), which return
+    the newer of the loaded row and this process's buffer. Other processes
+    see the change after the next flush; a crash loses at most one
+    interval. LAST_SEEN_FLUSH_SECONDS=0 writes through on the row as before.
+
+    With a read replica configured, users.last_sync is always written
+    through: replica routing (app.db_routing) reads it on the primary to
+    send a user who just synced - on any worker - to the primary.
+    """
+    _pending = {}  # (model, id) -> {column: datetime}
+    _lock = threading.Lock()
+    _thread = None
+    _stop = threading.Event()
+
+    @staticmethod
+    def _interval():
+        return current_app.config.get("LAST_SEEN_FLUSH_SECONDS", 5)
+
+    @staticmethod
+    def _write_through(model, column):
+        if LastSeenBuffer._interval() <= 0:
+            return True
+        # The read-your-writes signal must be visible to every worker at once
+        return model is User and column == "last_sync" and REPLICA_BIND in db.engines
+
+    @staticmethod
+    def touch(obj, column, when=None):
+        """Record `column` = now (or `when`) for a User / Admin. Returns the timestamp."""
+        when = when or datetime.utcnow()
+        if LastSeenBuffer._write_through(type(obj), column):
+            setattr(obj, column, when)  # written with the caller's commit
+            return when
+
+        key = (type(obj), obj.id)
+        with LastSeenBuffer._lock:
+            columns = LastSeenBuffer._pending.setdefault(key, {})
+            if columns.get(column) is None or columns[column] < when:
+                columns[column] = when
+        LastSeenBuffer.ensure_started()
+        return when
+
+    @staticmethod
+    def buffered(model, obj_id, column):
+        """The value waiting to be flushed, or None."""
+        with LastSeenBuffer._lock:
+            return LastSeenBuffer._pending.get((model, obj_id), {}).get(column)
+
+    @staticmethod
+    def value(obj, column):
+        """The freshest known value of `column`: the loaded row or the buffer."""
+        stored = getattr(obj, column, None)
+        buffered = LastSeenBuffer.buffered(type(obj), obj.id, column)
+        if buffered is None or (stored is not None and stored >= buffered):
+            return stored
+        return buffered
+
+    @staticmethod
+    def last_sync(user):
+        return LastSeenBuffer.value(user, "last_sync")
+
+    @staticmethod
+    def last_login(obj):
+        return LastSeenBuffer.value(obj, "last_login")
+
+    @staticmethod
+    def pending_ids(model, column):
+        with LastSeenBuffer._lock:
+            return [
+                obj_id for (m, obj_id), columns in LastSeenBuffer._pending.items()
+                if m is model and column in columns
+            ]
+
+    @staticmethod
+    def most_recent(query, model, column, limit, skip_null=False):
+        """
+        First `limit` rows of `query` by `column`, newest first, counting
+        values still in the buffer. skip_null leaves out rows that have none.
+        """
+        col = getattr(model, column)
+        ids = LastSeenBuffer.pending_ids(model, column)
+        if skip_null:
+            query = query.filter(or_(col.isnot(None), model.id.in_(ids)) if ids else col.isnot(None))
+        if not ids:
+            return query.order_by(col.desc()).limit(limit).all()
+
+        # Buffered rows first (whatever their stored value), then the stored order
+        rows = query.order_by(model.id.in_(ids).desc(), col.desc()).limit(limit + len(ids)).all()
+        rows.sort(key=lambda r: LastSeenBuffer.value(r, column) or datetime.min, reverse=True)
+        return rows[:limit]
+
+    @staticmethod
+    def flush():
+        """Write the buffer out (needs an app context). Returns the number of rows updated."""
+        with LastSeenBuffer._lock:
+            snapshot = {key: dict(columns) for key, columns in LastSeenBuffer._pending.items()}
+        if not snapshot:
+            return 0
+
+        by_column = {}  # (model, column) -> {id: timestamp}
+        for (model, obj_id), columns in snapshot.items():
+            for column, when in columns.items():
+                by_column.setdefault((model, column), {})[obj_id] = when
+
+        try:
+            for (model, column), values in by_column.items():
+                col = getattr(model, column)
+                ids = list(values)
+                for start in range(0, len(ids), FLUSH_CHUNK):
+                    chunk = {obj_id: values[obj_id] for obj_id in ids[start:start + FLUSH_CHUNK]}
+                    new = case(chunk, value=model.id)
+                    db.session.execute(
+                        update(model)
+                        .where(model.id.in_(list(chunk)))
+                        .values({column: case((or_(col.is_(None), col < new), new), else_=col)})
+                        .execution_options(synchronize_session=False)
+                    )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            log.exception("Flushing last-seen timestamps failed, retrying next interval")
+            return 0
+
+        # Keep anything that was touched again while the UPDATE ran
+        with LastSeenBuffer._lock:
+            for key, columns in snapshot.items():
+                current = LastSeenBuffer._pending.get(key)
+                if current is None:
+                    continue
+                for column, when in columns.items():
+                    if current.get(column) == when:
+                        del current[column]
+                if not current:
+                    del LastSeenBuffer._pending[key]
+        return len(snapshot)
+
+    @staticmethod
+    def ensure_started(app=None):
+        app = app or current_app._get_current_object()
+        if app.config.get("LAST_SEEN_FLUSH_SECONDS", 5) <= 0:
+            return
+        with LastSeenBuffer._lock:
+            if LastSeenBuffer._thread is not None and LastSeenBuffer._thread.is_alive():
+                return
+            LastSeenBuffer._thread = threading.Thread(
+                target=LastSeenBuffer.run, args=(app,), name=f"last-seen-{os.getpid()}", daemon=True
+            )
+            LastSeenBuffer._thread.start()
+
+    @staticmethod
+    def run(app):
+        interval = app.config.get("LAST_SEEN_FLUSH_SECONDS", 5)
+        atexit.register(LastSeenBuffer.stop, app)
+        while not LastSeenBuffer._stop.wait(interval):
+            LastSeenBuffer._flush_in(app)
+
+    @staticmethod
+    def _flush_in(app):
+        try:
+            with app.app_context():
+                try:
+                    LastSeenBuffer.flush()
+                finally:
+                    db.session.remove()
+        except Exception:
+            log.exception("Last-seen flush error")
+
+    @staticmethod
+    def stop(app):
+        """Final flush on shutdown (registered with atexit by the flush thread)."""
+        LastSeenBuffer._stop.set()
+        LastSeenBuffer._flush_in(app)
+
+    @staticmethod
+    def reset_after_fork():
+        # The master never serves requests, but start clean anyway
+        LastSeenBuffer._pending = {}
+        LastSeenBuffer._lock = threading.Lock()
+        LastSeenBuffer._thread = None
+        LastSeenBuffer._stop = threading.Event()
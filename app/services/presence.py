@@ -0,0 +1,391 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+from app.models import db, Attendance, User
+from app.redis_client import optional_redis
+from app.services.last_seen import LastSeenBuffer
+
+log = logging.getLogger(__name__)
+
+# Redis day keys outlive the day they describe by this much
+DAY_KEY_TTL_SECONDS = 2 * 86400
+
+# TenantPresence.record_attendance() in Redis: compare with the stored record
+# and write in one step, so an older record of the day arriving late is ignored.
+# KEYS: att hash, checked-in set. ARGV: user id, attendance id, check_in epoch,
+# "1" when checked out, stored value.
+RECORD_ATTENDANCE_LUA = """
+local current = redis.call("HGET", KEYS[1], ARGV[1])
+if current then
+    local stored = cjson.decode(current)
+    if tostring(stored[1]) ~= ARGV[2] and stored[2] > tonumber(ARGV[3]) then
+        return 0
+    end
+end
+redis.call("HSET", KEYS[1], ARGV[1], ARGV[5])
+if ARGV[4] == "1" then
+    redis.call("SREM", KEYS[2], ARGV[1])
+else
+    redis.call("SADD", KEYS[2], ARGV[1])
+end
+redis.call("EXPIRE", KEYS[1], ARGV[6])
+redis.call("EXPIRE", KEYS[2], ARGV[6])
+return 1
+"""
+
+
+def _utc(dt):
+    """Naive UTC, the way the timestamp columns are stored."""
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _epoch(dt):
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _from_epoch(value):
+    return datetime.fromtimestamp(float(value), timezone.utc).replace(tzinfo=None)
+
+
+class TenantPresence:
+    """One admin's users: last seen, and today's (UTC) attendance."""
+
+    def __init__(self, day):
+        self.day = day
+        self.loaded_at = time.monotonic()
+        self.names = {}  # user id -> name
+        self.last_seen = {}  # user id -> datetime
+        self.recent = OrderedDict()  # user id -> datetime seen inside the online window, oldest first
+        self.attendance = {}  # user id -> (attendance id, check_in, check_out), latest of today
+        self.checked_in = set()  # users whose attendance today is still open
+
+    def seen(self, user_id, when):
+        if self.last_seen.get(user_id) is not None and self.last_seen[user_id] >= when:
+            return
+        self.last_seen[user_id] = when
+        self.recent.pop(user_id, None)
+        self.recent[user_id] = when
+
+    def record_attendance(self, user_id, attendance_id, check_in, check_out):
+        current = self.attendance.get(user_id)
+        if current is not None and current[0] != attendance_id and current[1] > check_in:
+            return  # another, older record of the day arriving late
+        self.attendance[user_id] = (attendance_id, check_in, check_out)
+        if check_out is None:
+            self.checked_in.add(user_id)
+        else:
+            self.checked_in.discard(user_id)
+
+    def forget(self, user_id):
+        for mapping in (self.names, self.last_seen, self.recent, self.attendance):
+            mapping.pop(user_id, None)
+        self.checked_in.discard(user_id)
+
+    def roll(self, day):
+        if day != self.day:
+            self.day = day
+            self.attendance.clear()
+            self.checked_in.clear()
+
+    def online_count(self, cutoff):
+        # Amortised O(1): every entry is dropped once when it leaves the window
+        while self.recent:
+            user_id, when = next(iter(self.recent.items()))
+            if when >= cutoff:
+                break
+            self.recent.popitem(last=False)
+        return len(self.recent)
+
+
+def load_tenant(admin_id, day):
+    """Rebuild a tenant from the users / attendances rows (two queries)."""
+    tenant = TenantPresence(day)
+    users = db.session.query(User.id, User.name, User.last_sync, User.last_login).filter(User.admin_id == admin_id)
+    seen = []
+    for user_id, name, last_sync, last_login in users:
+        tenant.names[user_id] = name
+        values = [
+            _utc(last_sync), _utc(last_login),
+            LastSeenBuffer.buffered(User, user_id, "last_sync"),
+            LastSeenBuffer.buffered(User, user_id, "last_login"),
+        ]
+        values = [v for v in values if v is not None]
+        if values:
+            seen.append((max(values), user_id))
+    for when, user_id in sorted(seen):
+        tenant.seen(user_id, when)
+
+    day_start = datetime.combine(day, datetime.min.time())
+    rows = (
+        db.session.query(Attendance.id, Attendance.user_id, Attendance.check_in, Attendance.check_out)
+        .join(User, Attendance.user_id == User.id)
+        .filter(User.admin_id == admin_id, Attendance.check_in >= day_start)
+    )
+    for attendance_id, user_id, check_in, check_out in rows:
+        tenant.record_attendance(user_id, attendance_id, _utc(check_in), _utc(check_out))
+    return tenant
+
+
+class MemoryPresence:
+    """
+    Presence in this process. A tenant is loaded from the database on first
+    use and reloaded after PRESENCE_REFRESH_SECONDS to pick up what other
+    workers saw; this process's own events apply immediately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tenants = {}
+
+    def _tenant(self, admin_id, day, refresh):
+        with self._lock:
+            tenant = self._tenants.get(admin_id)
+        if tenant is None or tenant.day != day or time.monotonic() - tenant.loaded_at > refresh:
+            tenant = load_tenant(admin_id, day)
+            with self._lock:
+                self._tenants[admin_id] = tenant
+        return tenant
+
+    def seen(self, admin_id, user_id, name, when):
+        with self._lock:
+            tenant = self._tenants.get(admin_id)
+            if tenant is not None:  # otherwise the next load reads it from the database
+                tenant.names[user_id] = name
+                tenant.seen(user_id, when)
+
+    def attendance(self, admin_id, user_id, name, day, attendance_id, check_in, check_out):
+        with self._lock:
+            tenant = self._tenants.get(admin_id)
+            if tenant is not None:
+                tenant.roll(day)
+                if check_in.date() == day:
+                    tenant.names[user_id] = name
+                    tenant.record_attendance(user_id, attendance_id, check_in, check_out)
+
+    def forget(self, admin_id, user_id, day):
+        with self._lock:
+            tenant = self._tenants.get(admin_id)
+            if tenant is not None:
+                tenant.forget(user_id)
+
+    def counts(self, admin_id, day, cutoff, refresh):
+        tenant = self._tenant(admin_id, day, refresh)
+        with self._lock:
+            return {"online": tenant.online_count(cutoff), "checked_in": len(tenant.checked_in)}
+
+    def snapshot(self, admin_id, day, cutoff, refresh):
+        """(online [(user id, name, last seen)], today {user id: (name, attendance id, check_in, check_out)})"""
+        tenant = self._tenant(admin_id, day, refresh)
+        with self._lock:
+            tenant.online_count(cutoff)
+            online = [(uid, tenant.names.get(uid), when) for uid, when in reversed(tenant.recent.items())]
+            today = {uid: (tenant.names.get(uid), *att) for uid, att in tenant.attendance.items()}
+        return online, today
+
+
+class RedisPresence:
+    """
+    Presence shared by every worker and node through Redis. Per tenant:
+    a sorted set of last-seen times, a hash of names, and per UTC day a
+    hash of attendance plus a set of checked-in users (needs Redis 6.2+).
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._record_attendance = client.register_script(RECORD_ATTENDANCE_LUA)
+
+    @staticmethod
+    def _keys(admin_id, day):
+        base = f"presence:{admin_id}"
+        return {
+            "seen": f"{base}:seen",
+            "names": f"{base}:names",
+            "att": f"{base}:att:{day.isoformat()}",
+            "in": f"{base}:in:{day.isoformat()}",
+            "loaded": f"{base}:loaded:{day.isoformat()}",
+        }
+
+    def _ensure_loaded(self, admin_id, day):
+        keys = self._keys(admin_id, day)
+        if self._client.exists(keys["loaded"]):
+            return
+        tenant = load_tenant(admin_id, day)
+        pipe = self._client.pipeline()
+        if tenant.names:
+            pipe.hset(keys["names"], mapping={str(uid): name or "" for uid, name in tenant.names.items()})
+        if tenant.last_seen:
+            pipe.zadd(keys["seen"], {str(uid): _epoch(when) for uid, when in tenant.last_seen.items()}, gt=True)
+        for user_id, (attendance_id, check_in, check_out) in tenant.attendance.items():
+            self._attendance(pipe, keys, user_id, attendance_id, check_in, check_out)
+        pipe.set(keys["loaded"], 1, ex=DAY_KEY_TTL_SECONDS)
+        pipe.execute()
+
+    def _attendance(self, pipe, keys, user_id, attendance_id, check_in, check_out):
+        value = json.dumps([attendance_id, _epoch(check_in), _epoch(check_out) if check_out else None])
+        self._record_attendance(
+            keys=[keys["att"], keys["in"]],
+            args=[str(user_id), str(attendance_id), _epoch(check_in), "1" if check_out else "",
+                  value, DAY_KEY_TTL_SECONDS],
+            client=pipe,
+        )
+
+    def seen(self, admin_id, user_id, name, when):
+        keys = self._keys(admin_id, when.date())
+        pipe = self._client.pipeline()
+        pipe.hset(keys["names"], str(user_id), name or "")
+        pipe.zadd(keys["seen"], {str(user_id): _epoch(when)}, gt=True)
+        pipe.execute()
+
+    def attendance(self, admin_id, user_id, name, day, attendance_id, check_in, check_out):
+        if check_in.date() != day:
+            return
+        keys = self._keys(admin_id, day)
+        pipe = self._client.pipeline()
+        pipe.hset(keys["names"], str(user_id), name or "")
+        self._attendance(pipe, keys, user_id, attendance_id, check_in, check_out)
+        pipe.execute()
+
+    def forget(self, admin_id, user_id, day):
+        keys = self._keys(admin_id, day)
+        pipe = self._client.pipeline()
+        pipe.zrem(keys["seen"], str(user_id))
+        pipe.hdel(keys["names"], str(user_id))
+        pipe.hdel(keys["att"], str(user_id))
+        pipe.srem(keys["in"], str(user_id))
+        pipe.execute()
+
+    def counts(self, admin_id, day, cutoff, refresh):
+        self._ensure_loaded(admin_id, day)
+        keys = self._keys(admin_id, day)
+        pipe = self._client.pipeline()
+        pipe.zcount(keys["seen"], _epoch(cutoff), "+inf")
+        pipe.scard(keys["in"])
+        online, checked_in = pipe.execute()
+        return {"online": online, "checked_in": checked_in}
+
+    def snapshot(self, admin_id, day, cutoff, refresh):
+        self._ensure_loaded(admin_id, day)
+        keys = self._keys(admin_id, day)
+        pipe = self._client.pipeline()
+        pipe.zrevrangebyscore(keys["seen"], "+inf", _epoch(cutoff), withscores=True)
+        pipe.hgetall(keys["att"])
+        pipe.hgetall(keys["names"])
+        seen, attendance, names = pipe.execute()
+
+        online = [(int(uid), names.get(uid), _from_epoch(score)) for uid, score in seen]
+        today = {}
+        for uid, value in attendance.items():
+            attendance_id, check_in, check_out = json.loads(value)
+            today[int(uid)] = (
+                names.get(uid), attendance_id, _from_epoch(check_in),
+                _from_epoch(check_out) if check_out is not None else None,
+            )
+        return online, today
+
+
+_backend = None
+_fallback = None
+_backend_lock = threading.Lock()
+
+
+def _get_backend():
+    global _backend, _fallback
+    with _backend_lock:
+        if _backend is None:
+            client = optional_redis(
+                current_app.config.get("PRESENCE_REDIS_URL"), "PRESENCE_REDIS_URL", decode_responses=True
+            )
+            if client is not None:
+                _backend = RedisPresence(client)
+                _fallback = MemoryPresence()
+            else:
+                _backend = MemoryPresence()
+        return _backend
+
+
+def _call(method, *args):
+    backend = _get_backend()
+    try:
+        return getattr(backend, method)(*args)
+    except Exception as e:
+        if _fallback is None:
+            raise
+        # Fail open: a Redis outage degrades to per-process presence
+        log.warning("Presence Redis unavailable, using process memory: %s", e)
+        return getattr(_fallback, method)(*args)
+
+
+class PresenceRegistry:
+    """
+    Who is online ("seen" by a sync or login within PRESENCE_ONLINE_SECONDS)
+    and who is checked in today, per admin, without querying users or
+    attendances on every dashboard request.
+    """
+
+    @staticmethod
+    def _window():
+        config = current_app.config
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=config.get("PRESENCE_ONLINE_SECONDS", 300))
+        return now.date(), cutoff, config.get("PRESENCE_REFRESH_SECONDS", 30)
+
+    @staticmethod
+    def seen(admin_id, user_id, name, when=None):
+        """A sync or login from the user."""
+        if admin_id is None:
+            return
+        _call("seen", admin_id, user_id, name, _utc(when) or datetime.utcnow())
+
+    @staticmethod
+    def attendance(admin_id, user_id, name, attendance_id, check_in, check_out):
+        """A check-in (check_out None) or check-out was stored for the user."""
+        if admin_id is None or check_in is None:
+            return
+        _call("attendance", admin_id, user_id, name, datetime.utcnow().date(),
+              attendance_id, _utc(check_in), _utc(check_out))
+
+    @staticmethod
+    def forget(admin_id, user_id):
+        """The user was deleted."""
+        if admin_id is None:
+            return
+        _call("forget", admin_id, user_id, datetime.utcnow().date())
+
+    @staticmethod
+    def shared():
+        """
+        True when presence is kept in Redis for all workers. Otherwise it is
+        this worker's view, up to PRESENCE_REFRESH_SECONDS behind the others,
+        so callers that must be exact query the database instead.
+        """
+        return isinstance(_get_backend(), RedisPresence)
+
+    @staticmethod
+    def counts(admin_id):
+        """{"online": n, "checked_in": n} for the admin's users."""
+        day, cutoff, refresh = PresenceRegistry._window()
+        return _call("counts", admin_id, day, cutoff, refresh)
+
+    @staticmethod
+    def snapshot(admin_id):
+        """
+        (online, today): online users as [(user id, name, last seen)], newest
+        first, and today's attendance as {user id: (name, attendance id, check_in, check_out)}.
+        """
+        day, cutoff, refresh = PresenceRegistry._window()
+        return _call("snapshot", admin_id, day, cutoff, refresh)
+
+
+def reset_after_fork():
+    global _backend, _fallback, _backend_lock
+    _backend = None
+    _fallback = None
+    _backend_lock = threading.Lock()
@@ -0,0 +1,449 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+
+from flask import current_app
+from sqlalchemy import func, insert, update, delete, exists, or_, and_, text
+from sqlalchemy.orm import aliased
+
+from app.models import db, CallHistory, SyncBatch
+from app.services.sync_watermark import SyncWatermarkService, CALL_HISTORY, call_key
+
+log = logging.getLogger(__name__)
+
+# Done / failed batches are purged at most this often per process
+PURGE_INTERVAL_SECONDS = 300
+
+# Advisory lock space for claiming a user's batches: (space, user id)
+CLAIM_LOCK_SPACE = 72_011_046
+
+
+def parse_timestamp(ts_value):
+    """Convert timestamp input from ISO string, seconds, or milliseconds."""
+    if ts_value is None:
+        return None
+
+    # Epoch seconds/milliseconds
+    if isinstance(ts_value, (int, float)):
+        try:
+            # milliseconds
+            if ts_value > 1e10:
+                return datetime.utcfromtimestamp(ts_value / 1000)
+            # seconds
+            return datetime.utcfromtimestamp(ts_value)
+        except:
+            return None
+
+    # ISO string
+    if isinstance(ts_value, str):
+        try:
+            if ts_value.endswith("Z"):
+                ts_value = ts_value[:-1] + "+00:00"
+
+            dt = datetime.fromisoformat(ts_value)
+
+            if dt.tzinfo:
+                dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+            return dt
+        except:
+            return None
+
+    return None
+
+
+class SyncIngestService:
+    """
+    Call-history ingestion, inline or write-behind.
+
+    merge_calls() is the dedup + bulk insert used by both paths. With
+    SYNC_INGEST_MODE=deferred the sync endpoint only enqueue()s the raw
+    batch; worker threads (SyncIngestWorkers, or ingest_worker.py on another
+    node) claim batches with SELECT ... FOR UPDATE SKIP LOCKED and merge them.
+    """
+
+    # -------------------------
+    # Merge (shared)
+    # -------------------------
+    @staticmethod
+    def merge_calls(user_id, call_list):
+        """
+        Dedupe and insert a user's calls; the caller commits.
+        Returns (records_saved, errors, watermark_dict).
+        """
+        # Delta sync: only calls at or before the watermark can already be stored
+        watermark = SyncWatermarkService.load(user_id, CALL_HISTORY, for_update=True)
+
+        errors = []
+        parsed = []
+        for entry in call_list:
+            try:
+                phone_number = entry.get("phone_number")
+                call_type = entry.get("call_type")
+                duration = int(entry.get("duration", 0))
+                timestamp_raw = entry.get("timestamp")
+
+                if not phone_number or not timestamp_raw:
+                    errors.append({"entry": entry, "error": "Missing fields"})
+                    continue
+
+                # Convert and normalize timestamp
+                dt = parse_timestamp(timestamp_raw)
+                if not dt:
+                    errors.append({"entry": entry, "error": "Invalid timestamp"})
+                    continue
+
+                # Ensure UTC and strip microseconds
+                if dt.tzinfo:
+                    dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+                dt = dt.replace(microsecond=0)
+
+                parsed.append((entry, phone_number, call_type, duration, dt))
+
+            except Exception as e:
+                errors.append({"entry": entry, "error": str(e)})
+                continue
+
+        # Load existing records (hash of key fields) to avoid duplicates, but
+        # only for the time range that overlaps what the server already has.
+        # Key: call_key(timestamp, phone_number, call_type, duration)
+        existing_hashes = set()
+        overlap = [p[4] for p in parsed if not SyncWatermarkService.is_new(watermark, p[4])]
+        if overlap:
+            # no_autoflush: a freshly rebuilt watermark is inserted once, at commit
+            with db.session.no_autoflush:
+                existing_query = db.session.query(
+                    CallHistory.timestamp,
+                    CallHistory.phone_number,
+                    CallHistory.call_type,
+                    CallHistory.duration
+                ).filter(
+                    CallHistory.user_id == user_id,
+                    CallHistory.timestamp >= min(overlap),
+                    CallHistory.timestamp < max(overlap) + timedelta(seconds=1)
+                ).all()
+
+            for r in existing_query:
+                existing_hashes.add(call_key(*r))
+
+        rows = []
+        stored = []
+
+        for entry, phone_number, call_type, duration, dt in parsed:
+            # Generate key for duplicate check (call_type as stored, lower-case)
+            call_type = call_type.lower() if call_type else "unknown"
+            key = call_key(dt, phone_number, call_type, duration)
+
+            if key in existing_hashes:
+                continue
+
+            rows.append({
+                "user_id": user_id,
+                "phone_number": phone_number,
+                "formatted_number": entry.get("formatted_number") or "",
+                "call_type": call_type,
+                "duration": duration,
+                "timestamp": dt,
+                "contact_name": entry.get("contact_name") or "",
+            })
+            existing_hashes.add(key) # Add to set to prevent duplicates within the same batch
+            stored.append((dt, key))
+
+        # One executemany instead of an ORM flush per object
+        if rows:
+            db.session.execute(insert(CallHistory), rows)
+
+        SyncWatermarkService.advance(watermark, stored)
+        return len(rows), errors, SyncWatermarkService.to_dict(watermark)
+
+    @staticmethod
+    def call_analytics(user_id):
+        """Totals returned with every sync: call count, per-type counts, total duration."""
+        try:
+            # ---- Total Calls ----
+            total_calls = CallHistory.query.filter_by(user_id=user_id).count()
+
+            # ---- Call Type Summary ----
+            call_types = (
+                db.session.query(
+                    CallHistory.call_type,
+                    func.count(CallHistory.id)
+                )
+                .filter(CallHistory.user_id == user_id)
+                .group_by(CallHistory.call_type)
+                .all()
+            )
+            # Normalize keys to lowercase for consistency
+            call_type_summary = {ctype.lower(): count for ctype, count in call_types}
+
+            # ---- Total Call Duration ----
+            total_duration = (
+                db.session.query(func.coalesce(func.sum(CallHistory.duration), 0))
+                .filter(CallHistory.user_id == user_id)
+                .scalar()
+                or 0
+            )
+
+        except Exception as analytics_error:
+            # If analytics fail, we still return success for the sync but log the error
+            current_app.logger.error(f"Analytics calc failed: {analytics_error}")
+            total_calls = 0
+            call_type_summary = {}
+            total_duration = 0
+
+        return {
+            "total_calls": total_calls,
+            "call_types": call_type_summary,
+            "total_duration_seconds": int(total_duration),
+        }
+
+    # -------------------------
+    # Write-behind queue
+    # -------------------------
+    @staticmethod
+    def enqueue(user_id, call_list):
+        """Stage a raw batch; the caller commits (then wakes the workers)."""
+        batch = SyncBatch(user_id=user_id, stream=CALL_HISTORY, payload=call_list,
+                          item_count=len(call_list), status="pending")
+        db.session.add(batch)
+        return batch
+
+    @staticmethod
+    def claim_next():
+        """
+        Take the oldest pending batch (or one whose worker died) for this
+        worker. Returns (id, attempt) - the attempt number is this worker's
+        claim on the batch - or None when there is nothing to do.
+        """
+        lock = timedelta(seconds=current_app.config.get("SYNC_INGEST_LOCK_SECONDS", 300))
+        running = aliased(SyncBatch)
+        while True:
+            cutoff = datetime.utcnow() - lock
+            # One batch per user at a time, so a user's batches merge in order
+            # and never dedupe against each other's uncommitted rows
+            busy_user = exists().where(
+                running.user_id == SyncBatch.user_id,
+                running.id != SyncBatch.id,
+                running.status == "processing",
+                running.started_at >= cutoff,
+            )
+            claimable = and_(
+                or_(
+                    SyncBatch.status == "pending",
+                    and_(SyncBatch.status == "processing", SyncBatch.started_at < cutoff),
+                ),
+                ~busy_user,
+            )
+            # SKIP LOCKED: concurrent workers each get a different row (plain SELECT on SQLite)
+            candidate = (
+                db.session.query(SyncBatch.id, SyncBatch.status, SyncBatch.user_id, SyncBatch.attempts)
+                .filter(claimable)
+                .order_by(SyncBatch.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if candidate is None:
+                db.session.rollback()
+                return None
+
+            # busy_user is checked under READ COMMITTED, so two workers could each
+            # claim a batch of the same user. Held until commit; the UPDATE below
+            # re-checks busy_user with a fresh snapshot once it is ours.
+            SyncIngestService._lock_user(candidate.user_id)
+
+            # Conditional update: only one worker wins a row even without row locks
+            claimed = db.session.execute(
+                update(SyncBatch)
+                .where(SyncBatch.id == candidate.id, SyncBatch.status == candidate.status,
+                       SyncBatch.attempts == candidate.attempts, claimable)
+                .values(status="processing", started_at=datetime.utcnow(), attempts=SyncBatch.attempts + 1)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return candidate.id, candidate.attempts + 1
+
+    @staticmethod
+    def _lock_user(user_id):
+        """Per-user transaction lock shared by claiming and merging (PostgreSQL only)."""
+        connection = db.session.connection()
+        if connection.dialect.name == "postgresql":
+            connection.execute(
+                text("SELECT pg_advisory_xact_lock(:space, :user_id)"),
+                {"space": CLAIM_LOCK_SPACE, "user_id": user_id},
+            )
+
+    @staticmethod
+    def _still_claimed(batch_id, attempt):
+        """
+        False once the batch was taken over (its lock expired and another
+        worker claimed it again) or finished elsewhere.
+        """
+        return db.session.query(SyncBatch.id).filter(
+            SyncBatch.id == batch_id,
+            SyncBatch.status == "processing",
+            SyncBatch.attempts == attempt,
+        ).with_for_update().first() is not None
+
+    @staticmethod
+    def process(batch_id, attempt):
+        """
+        Merge one claimed batch and record the outcome on it. Returns False
+        without touching the batch when this worker no longer owns the claim.
+        """
+        batch = db.session.get(SyncBatch, batch_id)
+        try:
+            # A batch held past SYNC_INGEST_LOCK_SECONDS can be claimed again.
+            # The user lock keeps that claim waiting until this merge commits,
+            # and the re-check below discards a merge whose claim was lost.
+            SyncIngestService._lock_user(batch.user_id)
+
+            saved, errors, watermark_info = SyncIngestService.merge_calls(batch.user_id, batch.payload or [])
+            analytics = SyncIngestService.call_analytics(batch.user_id)
+            analytics["last_sync"] = batch.created_at.isoformat()
+
+            if not SyncIngestService._still_claimed(batch_id, attempt):
+                db.session.rollback()
+                log.warning("Sync batch %s was claimed again, dropping attempt %s", batch_id, attempt)
+                return False
+
+            batch.status = "done"
+            batch.records_saved = saved
+            batch.result = {
+                "message": "Call history synced successfully",
+                "records_saved": saved,
+                "errors": errors,
+                "analytics": analytics,
+                "watermark": watermark_info,
+            }
+            batch.payload = None
+            batch.finished_at = datetime.utcnow()
+            db.session.commit()
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            log.exception("Sync batch %s failed", batch_id)
+            if not SyncIngestService._still_claimed(batch_id, attempt):
+                db.session.rollback()
+                return False
+            batch = db.session.get(SyncBatch, batch_id)
+            max_attempts = current_app.config.get("SYNC_INGEST_MAX_ATTEMPTS", 3)
+            batch.status = "failed" if batch.attempts >= max_attempts else "pending"
+            batch.error = str(e)
+            if batch.status == "failed":
+                batch.finished_at = datetime.utcnow()
+            db.session.commit()
+            return False
+
+    @staticmethod
+    def drain(stop=None):
+        """Process batches until the queue is empty. Returns how many were taken."""
+        taken = 0
+        while stop is None or not stop.is_set():
+            claim = SyncIngestService.claim_next()
+            if claim is None:
+                break
+            SyncIngestService.process(*claim)
+            taken += 1
+        return taken
+
+    @staticmethod
+    def purge_finished():
+        retention = timedelta(hours=current_app.config.get("SYNC_INGEST_RETENTION_HOURS", 24))
+        db.session.execute(delete(SyncBatch).where(
+            SyncBatch.status.in_(("done", "failed")),
+            SyncBatch.finished_at < datetime.utcnow() - retention,
+        ))
+        db.session.commit()
+
+    @staticmethod
+    def pending_ahead(batch):
+        """Batches queued before this one that are not merged yet."""
+        return db.session.query(func.count(SyncBatch.id)).filter(
+            SyncBatch.status.in_(("pending", "processing")),
+            SyncBatch.created_at < batch.created_at,
+        ).scalar()
+
+    @staticmethod
+    def to_dict(batch):
+        data = {
+            "batch_id": batch.id,
+            "status": batch.status,
+            "records": batch.item_count,
+            "records_saved": batch.records_saved,
+            "attempts": batch.attempts,
+            "created_at": batch.created_at.isoformat() + "Z" if batch.created_at else None,
+            "started_at": batch.started_at.isoformat() + "Z" if batch.started_at else None,
+            "finished_at": batch.finished_at.isoformat() + "Z" if batch.finished_at else None,
+        }
+        if batch.status == "done":
+            data["result"] = batch.result
+        if batch.status == "failed":
+            data["error"] = batch.error
+        return data
+
+
+class SyncIngestWorkers:
+    """
+    Background threads draining sync_batches in this process.
+    Started lazily (first deferred sync) and after each gunicorn fork.
+    """
+    _threads = []
+    _stop = threading.Event()
+    _wakeup = threading.Event()
+    _lock = threading.Lock()
+    _last_purge = 0.0
+
+    @staticmethod
+    def ensure_started(app):
+        count = app.config.get("SYNC_INGEST_WORKERS", 2)
+        if app.config.get("SYNC_INGEST_MODE") != "deferred" or count <= 0:
+            return
+        with SyncIngestWorkers._lock:
+            alive = [t for t in SyncIngestWorkers._threads if t.is_alive()]
+            for i in range(len(alive), count):
+                thread = threading.Thread(target=SyncIngestWorkers.run, args=(app,),
+                                          name=f"sync-ingest-{os.getpid()}-{i}", daemon=True)
+                thread.start()
+                alive.append(thread)
+            SyncIngestWorkers._threads = alive
+
+    @staticmethod
+    def notify():
+        """A batch was committed: wake an idle worker now instead of at the next poll."""
+        SyncIngestWorkers._wakeup.set()
+
+    @staticmethod
+    def run(app):
+        poll = app.config.get("SYNC_INGEST_POLL_SECONDS", 2)
+        stop = SyncIngestWorkers._stop
+        while not stop.is_set():
+            try:
+                with app.app_context():
+                    try:
+                        SyncIngestService.drain(stop)
+                        if time.monotonic() - SyncIngestWorkers._last_purge > PURGE_INTERVAL_SECONDS:
+                            SyncIngestWorkers._last_purge = time.monotonic()
+                            SyncIngestService.purge_finished()
+                    finally:
+                        db.session.remove()
+            except Exception:
+                log.exception("Sync ingest worker error")
+            SyncIngestWorkers._wakeup.wait(poll)
+            SyncIngestWorkers._wakeup.clear()
+
+    @staticmethod
+    def stop():
+        SyncIngestWorkers._stop.set()
+        SyncIngestWorkers._wakeup.set()
+
+    @staticmethod
+    def reset_after_fork():
+        # Threads are not copied by fork; events / lock may be in any state
+        SyncIngestWorkers._threads = []
+        SyncIngestWorkers._stop = threading.Event()
+        SyncIngestWorkers._wakeup = threading.Event()
+        SyncIngestWorkers._lock = threading.Lock()
@@ -0,0 +1,129 @@
+import hashlib
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, Attendance, CallHistory, SyncWatermark
+
+CALL_HISTORY = "call_history"
+ATTENDANCE = "attendance"
+
+
+def call_key(timestamp, phone_number, call_type, duration):
+    """Checksum key of a stored call (timestamp to the second, call_type lower-case)."""
+    return f"{timestamp.replace(microsecond=0).isoformat()}|{phone_number}|{call_type}|{duration}"
+
+
+def attendance_key(check_in):
+    """Checksum key of an attendance day (the server keeps one record per user per day)."""
+    return check_in.date().isoformat()
+
+
+def record_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class SyncWatermarkService:
+    """
+    Per-user, per-stream high-water mark for delta sync.
+
+    high_water is the latest timestamp stored for the stream, record_count
+    the number of records and checksum the XOR of blake2b-64 hashes of every
+    record key (call_key / attendance_key). A device whose own records up to
+    high_water give the same count and checksum only needs to upload newer
+    records; the server skips duplicate detection for anything past the mark.
+    """
+
+    @staticmethod
+    def load(user_id, stream, for_update=False):
+        """The user's watermark, built from the stored rows on first use."""
+        query = SyncWatermark.query.filter_by(user_id=user_id, stream=stream)
+        if for_update:
+            # Serializes concurrent syncs of the same user (no-op on SQLite)
+            query = query.with_for_update()
+        watermark = query.first()
+        if watermark is None:
+            watermark = SyncWatermarkService._rebuild(user_id, stream)
+            if watermark is None:
+                # A concurrent first sync inserted it; read theirs (and wait
+                # for their lock when asked to)
+                watermark = query.first()
+        return watermark
+
+    @staticmethod
+    def _rebuild(user_id, stream):
+        watermark = SyncWatermark(user_id=user_id, stream=stream, record_count=0, checksum="0" * 16)
+        if stream == CALL_HISTORY:
+            rows = db.session.query(
+                CallHistory.timestamp, CallHistory.phone_number, CallHistory.call_type, CallHistory.duration
+            ).filter(CallHistory.user_id == user_id, CallHistory.timestamp.isnot(None))
+            records = ((r.timestamp, call_key(*r)) for r in rows)
+        else:
+            rows = db.session.query(Attendance.check_in).filter(Attendance.user_id == user_id)
+            days = {}
+            for (check_in,) in rows:
+                key = attendance_key(check_in)
+                days[key] = max(days.get(key, check_in), check_in)
+            records = ((check_in, key) for key, check_in in days.items())
+        SyncWatermarkService.advance(watermark, records)
+        return SyncWatermarkService._insert(watermark)
+
+    @staticmethod
+    def _insert(watermark):
+        """Insert unless a concurrent first sync got there first (then None)."""
+        dialects = {"postgresql": postgresql, "sqlite": sqlite}
+        dialect = dialects.get(db.engine.dialect.name)
+        if dialect is None:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(watermark)
+            except IntegrityError:
+                return None
+            return watermark
+
+        values = {
+            column.key: getattr(watermark, column.key)
+            for column in SyncWatermark.__table__.columns
+            if getattr(watermark, column.key) is not None
+        }
+        stmt = (
+            dialect.insert(SyncWatermark)
+            .values(**values)
+            .on_conflict_do_nothing()
+            .returning(SyncWatermark)
+        )
+        return db.session.scalars(stmt).first()
+
+    @staticmethod
+    def advance(watermark, records):
+        """Account for newly stored records: iterable of (timestamp, key)."""
+        checksum = int(watermark.checksum or "0", 16)
+        high_water = watermark.high_water
+        count = watermark.record_count or 0
+        for timestamp, key in records:
+            checksum ^= record_hash(key)
+            count += 1
+            if timestamp is not None and (high_water is None or timestamp > high_water):
+                high_water = timestamp
+        watermark.checksum = f"{checksum:016x}"
+        watermark.high_water = high_water
+        watermark.record_count = count
+
+    @staticmethod
+    def is_new(watermark, timestamp):
+        """True when nothing stored can be a duplicate of a record at `timestamp`."""
+        if watermark.high_water is None:
+            return True
+        if watermark.stream == ATTENDANCE:
+            # Attendance is matched per day
+            return timestamp.date() > watermark.high_water.date()
+        return timestamp > watermark.high_water
+
+    @staticmethod
+    def to_dict(watermark):
+        return {
+            "stream": watermark.stream,
+            "high_water": watermark.high_water.isoformat() + "Z" if watermark.high_water else None,
+            "count": watermark.record_count,
+            "checksum": watermark.checksum,
+        }
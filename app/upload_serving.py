@@ -0,0 +1,103 @@
+import mimetypes
+import os
+import re
+import threading
+
+from flask import current_app, send_file, abort, make_response
+from werkzeug.security import safe_join
+
+# Blob store file names are "<sha256>.<ext>" - the name itself is a strong validator
+CONTENT_ADDRESSED = re.compile(r"^([0-9a-f]{64})\.[A-Za-z0-9]+$")
+
+# filename -> root it was found in (only hits are cached; files never move)
+_index = {}
+_index_lock = threading.Lock()
+MAX_INDEX_SIZE = 50000
+
+
+def upload_roots():
+    """
+    (name, directory) pairs searched for /uploads/<path>, in order.
+    'static' holds recordings, 'legacy' the attendance images.
+    """
+    return (
+        ("static", os.path.join(current_app.root_path, "static", "uploads")),
+        ("legacy", os.path.join(os.getcwd(), "uploads")),
+    )
+
+
+def _resolve(filename):
+    """Return (root_name, absolute_path, stat) or None. Uses the cached index first."""
+    roots = dict(upload_roots())
+
+    cached = _index.get(filename)
+    if cached:
+        path = safe_join(roots[cached], filename)
+        try:
+            return cached, path, os.stat(path)
+        except OSError:
+            # Blob was released / file removed - forget it and search again
+            with _index_lock:
+                _index.pop(filename, None)
+
+    for name, root in upload_roots():
+        path = safe_join(root, filename)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if not os.path.isfile(path):
+            continue
+        with _index_lock:
+            if len(_index) >= MAX_INDEX_SIZE:
+                _index.clear()
+            _index[filename] = name
+        return name, path, st
+    return None
+
+
+def _etag(filename, st):
+    match = CONTENT_ADDRESSED.match(os.path.basename(filename))
+    if match:
+        return match.group(1)
+    # Legacy names are unique per upload; size + mtime is stable enough
+    return f"{int(st.st_mtime)}-{st.st_size}"
+
+
+def serve_upload(filename):
+    """
+    Serve an uploaded file with strong ETag, long-lived Cache-Control and
+    byte-range support (werkzeug handles Range / If-Range / If-None-Match).
+
+    UPLOADS_ACCEL_REDIRECT_PREFIX hands the transfer to nginx instead, e.g.
+
+        location /_protected_uploads/static/ { internal; alias /app/app/static/uploads/; }
+        location /_protected_uploads/legacy/ { internal; alias /app/uploads/; }
+
+    USE_X_SENDFILE (Flask built-in) does the same for Apache / lighttpd.
+    """
+    resolved = _resolve(filename)
+    if not resolved:
+        abort(404)
+    root_name, path, st = resolved
+
+    max_age = current_app.config.get("UPLOADS_CACHE_MAX_AGE", 31536000)
+    etag = _etag(filename, st)
+
+    accel_prefix = current_app.config.get("UPLOADS_ACCEL_REDIRECT_PREFIX")
+    if accel_prefix:
+        response = make_response("")
+        response.headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{root_name}/{filename}"
+        response.headers["Content-Type"] = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        response.set_etag(etag)
+    else:
+        response = send_file(path, etag=etag, max_age=max_age, conditional=True)
+        response.headers["Accept-Ranges"] = "bytes"
+
+    response.cache_control.max_age = max_age
+    response.cache_control.private = True
+    response.cache_control.public = False
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,412 @@
+"""
+Endpoint benchmark suite: latency percentiles and peak RSS of the hot paths.
+
+Generates a dataset with benchmarks/generate_data.py, then calls sync,
+listing, analytics and report endpoints repeatedly and reports p50 / p95 /
+p99 latency, SQL statements and peak RSS per case.
+
+Runs in-process through the Flask test client by default. With --url it
+drives a live server instead (e.g. gunicorn started with the same
+DATABASE_URL and JWT_SECRET_KEY); pass --server-pid with the gunicorn
+master pid to sample the workers' RSS.
+
+    python benchmarks/bench_endpoints.py --output before.json
+    python benchmarks/bench_endpoints.py --baseline before.json --output after.json
+    python benchmarks/bench_endpoints.py --compare before.json after.json
+
+    DATABASE_URL=postgresql://localhost/bench METRICS_DEBUG_HEADERS=1 \\
+        gunicorn wsgi:app --config gunicorn.conf.py &
+    python benchmarks/bench_endpoints.py --database-url postgresql://localhost/bench \\
+        --url http://127.0.0.1:8000 --server-pid $!
+
+Peak RSS is reset before every case through /proc/<pid>/clear_refs (Linux).
+Elsewhere the process-wide peak is reported and only grows between cases.
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import generate_data  # noqa: E402 - benchmarks/ is on sys.path when run as a script
+
+SYNC_BATCH_SIZES = (10, 100, 500)
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+# p99 of a few dozen samples is mostly noise: reported, not gated
+GATED_METRICS = ("p50_ms", "p95_ms", "peak_rss_mb")
+
+_sequence = itertools.count()
+
+
+class Bench:
+    """One benchmarked request. `body(ctx)` builds a fresh payload per call."""
+
+    def __init__(self, name, method, url, role, body=None):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.role = role
+        self.body = body
+
+
+def _call_batch(n):
+    def body(ctx):
+        # Unique timestamps per call so every batch is new data, like a phone syncing
+        base = datetime.utcnow().replace(microsecond=0) - timedelta(days=400)
+        offset = next(_sequence) * n
+        return {"call_history": [
+            {"phone_number": f"98{(offset + i) % 10 ** 8:08d}", "call_type": ("outgoing", "incoming", "missed")[i % 3],
+             "duration": 30 + i % 300, "timestamp": (base + timedelta(seconds=offset + i)).isoformat(),
+             "contact_name": f"Lead {i}"}
+            for i in range(n)
+        ]}
+    return body
+
+
+def _attendance(ctx):
+    # A month of catch-up: mostly updates of days the server already has
+    today = datetime.utcnow().replace(hour=9, minute=30, second=0, microsecond=0)
+    records = []
+    for d in range(30):
+        check_in = today - timedelta(days=d)
+        records.append({
+            "id": f"bench-{check_in:%Y%m%d}", "status": "on-time",
+            "check_in": int(check_in.timestamp() * 1000),
+            "check_out": int((check_in + timedelta(hours=9)).timestamp() * 1000),
+            "latitude": 12.9756, "longitude": 77.6066, "location": "MG Road, Bengaluru",
+        })
+    return {"records": records}
+
+
+CASES = [
+    *[Bench(f"call_history.sync[{n}]", "POST", "/api/call-history/sync", "user", _call_batch(n))
+      for n in SYNC_BATCH_SIZES],
+    Bench("attendance.sync[30]", "POST", "/api/attendance/sync", "user", _attendance),
+    Bench("admin.all_call_history", "GET", "/api/admin/all-call-history", "admin"),
+    Bench("admin.performance", "GET", "/api/admin/performance", "admin"),
+    Bench("admin.call_analytics", "GET", "/api/admin/call-analytics", "admin"),
+    Bench("admin.dashboard_stats", "GET", "/api/admin/dashboard-stats", "admin"),
+    Bench("pdf.attendance", "GET", "/api/admin/attendance/export_pdf", "admin"),
+    Bench("pdf.call_analytics", "GET", "/api/admin/call-analytics/download-report", "admin"),
+    Bench("pdf.user_history", "GET", "/api/admin/download-user-history?user_id={user_id}", "admin"),
+]
+
+
+# -------------------------
+# Transports
+# -------------------------
+class ClientTransport:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, url, headers, body):
+        started = time.perf_counter()
+        response = self.client.open(url, method=method, headers=headers, json=body)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, response.headers.get("X-Query-Count")
+
+
+class HttpTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, url, headers, body):
+        data = None
+        headers = dict(headers)
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        req = urllib.request.Request(self.base_url + url, data=data, headers=headers, method=method)
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req) as response:
+                response.read()
+                status, query_count = response.status, response.headers.get("X-Query-Count")
+        except urllib.error.HTTPError as e:
+            e.read()
+            status, query_count = e.code, e.headers.get("X-Query-Count")
+        return status, time.perf_counter() - started, query_count
+
+
+# -------------------------
+# Peak RSS
+# -------------------------
+def _worker_pids(master_pid):
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+            return [int(p) for p in f.read().split()] or [master_pid]
+    except OSError:
+        return [master_pid]
+
+
+class PeakRss:
+    """Peak resident set size of `pids` since the last reset(), in MB."""
+
+    def __init__(self, pids):
+        self.pids = pids
+        self.resettable = all(self._clear(pid) for pid in pids)
+
+    @staticmethod
+    def _clear(pid):
+        try:
+            with open(f"/proc/{pid}/clear_refs", "w") as f:
+                f.write("5")
+            return True
+        except OSError:
+            return False
+
+    def reset(self):
+        if self.resettable:
+            for pid in self.pids:
+                self._clear(pid)
+
+    def peak_mb(self):
+        peaks = []
+        for pid in self.pids:
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmHWM:"):
+                            peaks.append(int(line.split()[1]) / 1024)
+            except OSError:
+                pass
+        if peaks:
+            return round(max(peaks), 1)
+        if self.pids == [os.getpid()]:
+            import resource
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # kB on Linux, bytes on macOS
+            return round(maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+        return None
+
+
+# -------------------------
+# Measurement
+# -------------------------
+def percentile(samples, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def run_case(case, transport, ctx, rss, iterations, warmup):
+    statuses, latencies, query_counts = set(), [], set()
+    users = itertools.cycle(ctx["users"])
+
+    gc.collect()
+    rss.reset()
+    for i in range(warmup + iterations):
+        user_id, user_token = next(users)
+        token = user_token if case.role == "user" else ctx["tokens"][case.role]
+        url = case.url.format(user_id=user_id)
+        body = case.body(ctx) if case.body else None
+        status, elapsed, query_count = transport.request(
+            case.method, url, {"Authorization": f"Bearer {token}"}, body
+        )
+        statuses.add(status)
+        if i >= warmup:
+            latencies.append(elapsed * 1000)
+            if query_count is not None:
+                query_counts.add(int(query_count))
+
+    return {
+        "status": sorted(statuses),
+        "samples": len(latencies),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2),
+        "queries": max(query_counts) if query_counts else None,
+        "peak_rss_mb": rss.peak_mb(),
+    }
+
+
+def prepare(args):
+    """Create the app, generate (or locate) the dataset and mint tokens."""
+    workdir = tempfile.mkdtemp(prefix="bench-endpoints-")
+    database_url = args.database_url or os.environ.get("DATABASE_URL") or \
+        f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("METRICS_DEBUG_HEADERS", "1")
+    os.environ.setdefault("DB_SLOW_QUERY_MS", "0")
+    os.environ.setdefault("IMAGE_POOL_WORKERS", "0")
+    os.environ.setdefault("ADMISSION_ENABLED", "0")  # measure the endpoints, not the rate limiter
+    os.chdir(workdir)  # generated PDFs / uploads stay out of the repo
+
+    from app import create_app
+    from app.models import db, Admin, User
+    from flask_jwt_extended import create_access_token
+
+    app = create_app()
+    with app.app_context():
+        prefix = args.prefix or f"gen{args.seed}"
+        admin = Admin.query.filter_by(email=f"{prefix}-admin0@example.com").first()
+        if admin is None:
+            if args.no_generate:
+                sys.exit(f"❌ No generated dataset with prefix {prefix!r} in {database_url}")
+            t0 = time.perf_counter()
+            generated = generate_data.generate(
+                db, admins=args.admins, users=args.users, days=args.days, seed=args.seed, prefix=prefix
+            )
+            print(f"🧪 Generated {sum(generated['rows'].values()):,} rows in {time.perf_counter() - t0:.1f}s", flush=True)
+            admin = Admin.query.filter_by(email=f"{prefix}-admin0@example.com").first()
+
+        user_ids = [uid for (uid,) in db.session.query(User.id).filter_by(admin_id=admin.id, is_active=True)
+                    .order_by(User.id).limit(args.sync_users)]
+        ctx = {
+            "tokens": {"admin": create_access_token(identity=str(admin.id), additional_claims={"role": "admin"})},
+            "users": [(uid, create_access_token(identity=str(uid), additional_claims={"role": "user"}))
+                      for uid in user_ids],
+        }
+        dataset = {
+            "admins": Admin.query.count(),
+            "users": User.query.count(),
+            "tenant_users": User.query.filter_by(admin_id=admin.id).count(),
+            "days": args.days,
+            "seed": args.seed,
+            "database": db.engine.url.get_backend_name(),
+        }
+        db.session.remove()
+    return app, ctx, dataset
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# -------------------------
+# Baseline comparison
+# -------------------------
+def compare(baseline, current, threshold):
+    """Print per-metric deltas; returns the list of regressions."""
+    regressions = []
+    print(f"\n{'case':<30}" + "".join(f"{m:>28}" for m in COMPARED_METRICS))
+    for name, new in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name:<30}   (not in baseline)")
+            continue
+        cells = []
+        for metric in COMPARED_METRICS:
+            before, after = old.get(metric), new.get(metric)
+            if not before or after is None:
+                cells.append(f"{'-':>28}")
+                continue
+            change = (after - before) / before
+            flag = ""
+            if metric in GATED_METRICS and change > threshold:
+                flag = " ❌"
+                regressions.append(f"{name} {metric} {before} -> {after} ({change:+.0%})")
+            cells.append(f"{f'{before:.1f} -> {after:.1f} ({change:+.0%}){flag}':>28}")
+        print(f"{name:<30}" + "".join(cells))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Endpoint latency / RSS benchmark suite")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", default=None, help="only cases starting with this prefix")
+    parser.add_argument("--admins", type=int, default=2)
+    parser.add_argument("--users", type=int, default=25, help="users per admin")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default=None, help="dataset email prefix, defaults to gen<seed>")
+    parser.add_argument("--sync-users", type=int, default=10, help="users the sync calls rotate through")
+    parser.add_argument("--database-url", default=None, help="defaults to DATABASE_URL, else a temporary SQLite file")
+    parser.add_argument("--no-generate", action="store_true", help="fail instead of generating a missing dataset")
+    parser.add_argument("--url", default=None, help="benchmark a live server instead of the test client")
+    parser.add_argument("--server-pid", type=int, default=None, help="gunicorn master pid for worker RSS")
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    parser.add_argument("--baseline", default=None, help="compare against a saved results file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before failing")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "RESULTS"), help="only compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+        return
+
+    # prepare() changes directory, resolve paths first
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    cases = [c for c in CASES if not args.only or c.name.startswith(args.only)]
+    app, ctx, dataset = prepare(args)
+
+    if args.url:
+        transport = HttpTransport(args.url)
+        rss = PeakRss(_worker_pids(args.server_pid) if args.server_pid else [])
+    else:
+        transport = ClientTransport(app)
+        rss = PeakRss([os.getpid()])
+
+    print(f"{'case':<30}{'status':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak MB':>9}")
+    results = {}
+    for case in cases:
+        result = run_case(case, transport, ctx, rss, args.iterations, args.warmup)
+        results[case.name] = result
+        status = ",".join(str(s) for s in result["status"])
+        print(f"{case.name:<30}{status:>10}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+              f"{result['p99_ms']:>10.1f}{str(result['queries'] or '-'):>9}{str(result['peak_rss_mb'] or '-'):>9}",
+              flush=True)
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "target": args.url or "test-client",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "rss": ("per-case" if rss.resettable else "process-peak") if rss.pids else "unavailable",
+            "dataset": dataset,
+        },
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Results written to {args.output}")
+
+    failed = [name for name, r in results.items() if any(s >= 400 for s in r["status"])]
+    if failed:
+        print(f"\n❌ Error responses from: {', '.join(failed)}")
+
+    regressions = []
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) over {args.threshold:.0%}")
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
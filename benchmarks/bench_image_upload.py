@@ -0,0 +1,101 @@
+"""
+Check-in image compression benchmark.
+
+Compares the old inline path (LANCZOS resize, save q70 to disk, re-save q50
+when over 200KB) with ImageService (draft decode + single estimated encode,
+run in a bounded process pool) and reports check-ins per second.
+
+    python benchmarks/bench_image_upload.py --images 40 --concurrency 8 --workers 4
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask
+from PIL import Image
+
+from app.services.image_service import ImageService, compress_image
+
+
+def make_selfie(width=3024, height=4032, seed=0):
+    """Phone-camera sized JPEG with enough detail to be realistic to encode."""
+    noise = Image.effect_noise((width // 4, height // 4), 40 + seed % 20).resize((width, height))
+    gradient = Image.linear_gradient("L").resize((width, height))
+    img = Image.merge("RGB", (noise, gradient, Image.eval(noise, lambda p: 255 - p)))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=92)
+    return buf.getvalue()
+
+
+def legacy_compress(data, filepath):
+    """The previous upload_image implementation (kept here for comparison only)."""
+    img = Image.open(io.BytesIO(data))
+    if img.mode in ("RGBA", "P"):
+        img = img.convert("RGB")
+    max_width = 1024
+    if img.width > max_width:
+        ratio = max_width / img.width
+        img = img.resize((max_width, int(img.height * ratio)), Image.Resampling.LANCZOS)
+    img.save(filepath, "JPEG", quality=70, optimize=True)
+    if os.path.getsize(filepath) > 200 * 1024:
+        img.save(filepath, "JPEG", quality=50, optimize=True)
+
+
+def run(label, fn, images, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(fn, images))
+    elapsed = time.perf_counter() - start
+    rate = len(images) / elapsed
+    print(f"{label:<28} {len(images):>5} images  {elapsed:8.2f}s  {rate:8.2f} check-ins/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attendance image upload benchmark")
+    parser.add_argument("--images", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=8, help="simulated concurrent requests")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="image pool processes")
+    args = parser.parse_args()
+
+    print("Generating test images...")
+    samples = [make_selfie(seed=i) for i in range(4)]
+    images = [samples[i % len(samples)] for i in range(args.images)]
+    print(f"Input size: ~{len(samples[0]) // 1024} KB, concurrency {args.concurrency}, pool workers {args.workers}\n")
+
+    tmp = tempfile.mkdtemp()
+
+    def legacy(data):
+        legacy_compress(data, os.path.join(tmp, f"{time.perf_counter_ns()}.jpg"))
+
+    app = Flask(__name__)
+    app.config.update(
+        IMAGE_POOL_WORKERS=args.workers,
+        IMAGE_POOL_MAX_PENDING=args.concurrency,
+        IMAGE_POOL_WAIT_SECONDS=60,
+        IMAGE_POOL_TIMEOUT_SECONDS=60,
+    )
+
+    def pooled(data):
+        with app.app_context():
+            ImageService.process(data)
+
+    base = run("legacy (inline, 2-pass)", legacy, images, args.concurrency)
+    run("new (inline, 1-pass)", compress_image, images, args.concurrency)
+    with app.app_context():
+        ImageService.process(samples[0])  # warm the pool
+    new = run("new (process pool)", pooled, images, args.concurrency)
+    ImageService.shutdown()
+
+    out, quality = compress_image(samples[0])
+    print(f"\nOutput: {len(out) // 1024} KB at quality {quality}, speedup x{new / base:.2f}")
+
+
+if __name__ == "__main__":
+    main()
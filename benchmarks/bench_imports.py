@@ -0,0 +1,75 @@
+"""
+Import-time profile of a worker boot (python -X importtime).
+
+Prints the slowest top-level packages and the total import time of
+`from app import create_app; create_app()`, and fails if any of the
+deferred heavy modules got imported at boot again.
+
+    python benchmarks/bench_imports.py
+    python benchmarks/bench_imports.py --top 30 --json importtime.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Only needed by rare endpoints (PDF export, image upload, push) - must stay lazy
+DEFERRED = ("reportlab", "PIL", "requests")
+
+
+def profile(database_url):
+    env = dict(os.environ, DATABASE_URL=database_url, SCHEMA_BOOTSTRAP="off")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from app import create_app; create_app()"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+
+    # "import time: self [us] | cumulative | imported package"
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of create_app()")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", dest="json_path", default=None, help="write the per-package totals here")
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'imports.db')}"
+    modules = profile(database_url)
+
+    # Self time summed per top-level package
+    per_package = defaultdict(int)
+    for name, self_us, _ in modules:
+        per_package[name.split(".")[0]] += self_us
+    total_ms = sum(per_package.values()) / 1000
+
+    print(f"Total import time: {total_ms:.1f} ms ({len(modules)} modules)\n")
+    print(f"{'package':<32}{'ms':>10}{'share':>9}")
+    for package, us in sorted(per_package.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"{package:<32}{us / 1000:>10.1f}{us / 1000 / total_ms:>9.1%}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"total_ms": total_ms, "packages_ms": {k: v / 1000 for k, v in per_package.items()}}, f, indent=2)
+
+    leaked = sorted({name.split(".")[0] for name, _, _ in modules} & set(DEFERRED))
+    if leaked:
+        print(f"\n❌ Imported at boot but should be lazy: {', '.join(leaked)}")
+        sys.exit(1)
+    print(f"\n✅ Deferred at boot: {', '.join(DEFERRED)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+App startup benchmark: time (and SQL statements) spent in create_app().
+
+Each measurement runs in a fresh interpreter so imports are included, the
+same way a gunicorn worker boots. Compares SCHEMA_BOOTSTRAP=always (old
+behaviour: create_all + schema patch on every boot) with the default
+version-gated mode.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --database-url postgresql://localhost/callmanager_bench
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, "before_cursor_execute", lambda *a, **k: statements.append(1))
+t1 = time.perf_counter()
+from app import create_app
+t2 = time.perf_counter()
+create_app()
+t3 = time.perf_counter()
+print(json.dumps({"import": t2 - t1, "create_app": t3 - t2, "total": t3 - t0, "statements": len(statements)}))
+"""
+
+
+def boot(database_url, mode):
+    env = dict(os.environ, DATABASE_URL=database_url, SCHEMA_BOOTSTRAP=mode)
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def summarize(label, samples):
+    create = [s["create_app"] * 1000 for s in samples]
+    total = [s["total"] * 1000 for s in samples]
+    stmts = samples[-1]["statements"]
+    print(f"{label:<26} create_app p50 {statistics.median(create):8.1f} ms   "
+          f"process p50 {statistics.median(total):8.1f} ms   SQL statements {stmts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="create_app() startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+
+    first = boot(database_url, "auto")
+    print(f"{'first boot (bootstrap)':<26} create_app {first['create_app'] * 1000:8.1f} ms   SQL statements {first['statements']}")
+
+    summarize("SCHEMA_BOOTSTRAP=always", [boot(database_url, "always") for _ in range(args.runs)])
+    summarize("SCHEMA_BOOTSTRAP=auto", [boot(database_url, "auto") for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+Synthetic data generator: N admins x M users x K days of realistic history.
+
+Writes call history, attendance (check-in / check-out), follow-ups and
+activity logs through bulk INSERTs in batches. The output is driven by a
+single seed, so the same arguments always produce the same rows.
+
+    python benchmarks/generate_data.py --admins 10 --users 50 --days 90
+    python benchmarks/generate_data.py --admins 50 --users 100 --days 180 \\
+        --database-url postgresql://localhost/callmanager_bench
+
+Every generated account uses the password "Passw0rd!" (see --password).
+Emails are prefixed with --prefix so several runs can share one database.
+Timestamps are anchored to --end-date (default: today); pass it explicitly
+when the rows must be identical across days.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PASSWORD = "Passw0rd!"
+
+# Hour-of-day weights for calls: morning ramp-up, lunch gap (13:00-14:00),
+# afternoon peak, tail-off in the evening
+CALL_HOURS = (8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20)
+CALL_HOUR_WEIGHTS = (1, 5, 10, 12, 9, 2, 6, 11, 12, 10, 6, 3, 1)
+
+# Call-type mix of a field sales team: mostly outgoing
+CALL_TYPES = ("outgoing", "incoming", "missed", "rejected")
+CALL_TYPE_WEIGHTS = (55, 25, 15, 5)
+
+# Outgoing calls that were never picked up are logged with duration 0
+UNANSWERED_OUTGOING = 0.18
+
+WORKING_WEEKDAYS = (0, 1, 2, 3, 4, 5)  # Mon-Sat
+ATTENDANCE_RATE = 0.93
+FORGOT_CHECKOUT_RATE = 0.04
+ON_TIME_BEFORE = 9 * 60 + 45  # minutes after midnight
+
+CONTACT_BOOK_SIZE = 250
+NAMED_CONTACT_RATE = 0.6
+
+FIRST_NAMES = ("Aarav", "Vivaan", "Aditya", "Ishaan", "Rohan", "Priya", "Ananya", "Diya", "Kavya", "Meera",
+               "Rahul", "Sneha", "Arjun", "Neha", "Vikram", "Pooja", "Karan", "Riya", "Sanjay", "Nisha")
+LAST_NAMES = ("Sharma", "Verma", "Patel", "Reddy", "Iyer", "Nair", "Gupta", "Singh", "Mehta", "Das",
+              "Kulkarni", "Joshi", "Rao", "Shah", "Menon", "Bose")
+OFFICES = (
+    ("MG Road, Bengaluru", 12.9756, 77.6066),
+    ("Bandra Kurla Complex, Mumbai", 19.0660, 72.8650),
+    ("Connaught Place, New Delhi", 28.6315, 77.2167),
+    ("HITEC City, Hyderabad", 17.4435, 78.3772),
+    ("Anna Salai, Chennai", 13.0604, 80.2496),
+    ("Salt Lake, Kolkata", 22.5867, 88.4171),
+)
+FOLLOWUP_MESSAGES = ("Call back regarding quotation", "Share brochure on WhatsApp", "Demo scheduled",
+                     "Discuss pricing", "Payment reminder", "Confirm site visit", None)
+
+
+def _cumulative(weights):
+    total, out = 0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+
+CALL_HOUR_CUM = _cumulative(CALL_HOUR_WEIGHTS)
+CALL_TYPE_CUM = _cumulative(CALL_TYPE_WEIGHTS)
+# Zipf-like: a few customers are called again and again
+CONTACT_CUM = _cumulative([1.0 / (i + 1) for i in range(CONTACT_BOOK_SIZE)])
+
+
+def _poisson(rng, mean):
+    if mean <= 0:
+        return 0
+    if mean > 30:
+        return max(0, round(rng.gauss(mean, math.sqrt(mean))))
+    limit, k, p = math.exp(-mean), 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+def _uid(rng):
+    return "%032x" % rng.getrandbits(128)
+
+
+def _person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+class _Writer:
+    """Buffers rows per table and flushes them as executemany INSERTs."""
+
+    def __init__(self, db, batch_size):
+        self.db = db
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.counts = {}
+
+    def add(self, table, row):
+        buf = self.buffers.setdefault(table, [])
+        buf.append(row)
+        if len(buf) >= self.batch_size:
+            self.flush(table)
+
+    def flush(self, table=None):
+        from sqlalchemy import insert
+
+        tables = [table] if table is not None else list(self.buffers)
+        for t in tables:
+            rows = self.buffers.get(t)
+            if not rows:
+                continue
+            self.db.session.execute(insert(t), rows)
+            self.db.session.commit()
+            self.counts[t.name] = self.counts.get(t.name, 0) + len(rows)
+            self.buffers[t] = []
+
+
+def generate(db, admins=5, users=20, days=30, seed=42, calls_per_day=35, followups_per_day=2,
+             end_date=None, prefix=None, password=PASSWORD, batch_size=5000, progress=False):
+    """
+    Insert the synthetic tenant set into `db` (inside an app context).
+
+    Returns {"super_admin_id", "admin_ids", "user_ids", "rows": {table: count}}.
+    """
+    from app.models import bcrypt, SuperAdmin, Admin, User, Attendance, CallHistory, Followup, ActivityLog, UserRole
+    from sqlalchemy import bindparam, insert, select, update
+
+    rng = random.Random(seed)
+    prefix = prefix or f"gen{seed}"
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=days - 1)
+    now = datetime.combine(end_date, datetime.min.time()) + timedelta(hours=21)
+    password_hash = bcrypt.generate_password_hash(password).decode()
+    writer = _Writer(db, batch_size)
+
+    # -------------------------
+    # Accounts
+    # -------------------------
+    owner_id = db.session.execute(select(SuperAdmin.id).order_by(SuperAdmin.id).limit(1)).scalar()
+    if owner_id is None:
+        owner_id = db.session.execute(
+            insert(SuperAdmin).returning(SuperAdmin.id),
+            [{"name": "Owner", "email": f"{prefix}-owner@example.com", "password_hash": password_hash,
+              "created_at": now - timedelta(days=days + 30)}]
+        ).scalar_one()
+
+    onboarded = datetime.combine(start_date, datetime.min.time()) - timedelta(days=7)
+    admin_rows = []
+    for a in range(admins):
+        admin_rows.append({
+            "name": f"{_person(rng)} ({prefix} {a})",
+            "email": f"{prefix}-admin{a}@example.com",
+            "password_hash": password_hash,
+            "user_limit": max(users, 10),
+            "expiry_date": now + timedelta(days=365),
+            "created_by": owner_id,
+            "created_at": onboarded,
+            "last_login": now - timedelta(hours=rng.randint(1, 48)),
+            "is_active": True,
+        })
+    admin_ids = list(db.session.execute(
+        insert(Admin).returning(Admin.id, sort_by_parameter_order=True), admin_rows
+    ).scalars())
+
+    user_rows, user_meta = [], []
+    for a, admin_id in enumerate(admin_ids):
+        office = OFFICES[a % len(OFFICES)]
+        for u in range(users):
+            user_rows.append({
+                "name": _person(rng),
+                "email": f"{prefix}-user{u}.a{a}@example.com",
+                "password_hash": password_hash,
+                "phone": f"9{rng.randint(100000000, 999999999)}",
+                "admin_id": admin_id,
+                "is_active": rng.random() > 0.03,
+                "created_at": onboarded + timedelta(hours=rng.randint(1, 72)),
+            })
+            # Some people simply make more calls than others
+            user_meta.append({"admin_id": admin_id, "office": office,
+                              "productivity": rng.lognormvariate(0, 0.35),
+                              "book": [(f"9{rng.randint(100000000, 999999999)}",
+                                        _person(rng) if rng.random() < NAMED_CONTACT_RATE else None)
+                                       for _ in range(CONTACT_BOOK_SIZE)]})
+    user_ids = list(db.session.execute(
+        insert(User).returning(User.id, sort_by_parameter_order=True), user_rows
+    ).scalars())
+    db.session.commit()
+
+    for admin_id, row in zip(admin_ids, admin_rows):
+        writer.add(ActivityLog.__table__, {
+            "actor_role": UserRole.SUPER_ADMIN, "actor_id": owner_id, "action": f"Created Admin: {row['name']}",
+            "target_type": "admin", "target_id": admin_id, "timestamp": row["created_at"],
+        })
+    for user_id, row in zip(user_ids, user_rows):
+        writer.add(ActivityLog.__table__, {
+            "actor_role": UserRole.ADMIN, "actor_id": row["admin_id"], "action": f"Created user {row['email']}",
+            "target_type": "user", "target_id": user_id, "timestamp": row["created_at"],
+        })
+
+    # -------------------------
+    # Day by day history
+    # -------------------------
+    attendance_t, calls_t = Attendance.__table__, CallHistory.__table__
+    followups_t, logs_t = Followup.__table__, ActivityLog.__table__
+    last_seen = {}
+    started = time.perf_counter()
+
+    for d in range(days):
+        day = start_date + timedelta(days=d)
+        midnight = datetime.combine(day, datetime.min.time())
+        working = day.weekday() in WORKING_WEEKDAYS
+
+        if working:
+            for admin_id in admin_ids:
+                if rng.random() < 0.8:
+                    writer.add(logs_t, {
+                        "actor_role": UserRole.ADMIN, "actor_id": admin_id, "action": "Logged in",
+                        "target_type": "admin", "target_id": admin_id,
+                        "timestamp": midnight + timedelta(minutes=rng.randint(9 * 60, 11 * 60)),
+                    })
+
+        for user_id, meta in zip(user_ids, user_meta):
+            if not working or rng.random() > ATTENDANCE_RATE:
+                # The odd call still comes in on days off
+                if rng.random() > 0.15:
+                    continue
+                n_calls, check_in, check_out = rng.randint(1, 3), None, None
+            else:
+                address, lat, lng = meta["office"]
+                in_minutes = int(min(max(rng.gauss(9 * 60 + 35, 18), 8 * 60 + 30), 11 * 60 + 30))
+                out_minutes = int(min(max(rng.gauss(18 * 60 + 30, 40), in_minutes + 180), 22 * 60))
+                check_in = midnight + timedelta(minutes=in_minutes, seconds=rng.randint(0, 59))
+                check_out = midnight + timedelta(minutes=out_minutes, seconds=rng.randint(0, 59))
+                if day == end_date or rng.random() < FORGOT_CHECKOUT_RATE:
+                    check_out = None
+                # Check-ins land within ~200 m of the office
+                jitter = (rng.uniform(-0.002, 0.002) for _ in range(4))
+                writer.add(attendance_t, {
+                    "id": _uid(rng), "external_id": _uid(rng), "user_id": user_id,
+                    "check_in": check_in, "check_out": check_out,
+                    "latitude": lat + next(jitter), "longitude": lng + next(jitter), "address": address,
+                    "check_out_latitude": lat + next(jitter) if check_out else None,
+                    "check_out_longitude": lng + next(jitter) if check_out else None,
+                    "check_out_address": address if check_out else None,
+                    "status": "on-time" if in_minutes <= ON_TIME_BEFORE else "late",
+                    "synced": True, "sync_timestamp": check_out or check_in, "created_at": check_in,
+                })
+                n_calls = _poisson(rng, calls_per_day * meta["productivity"])
+
+            if not n_calls:
+                continue
+            hours = rng.choices(CALL_HOURS, cum_weights=CALL_HOUR_CUM, k=n_calls)
+            types = rng.choices(CALL_TYPES, cum_weights=CALL_TYPE_CUM, k=n_calls)
+            contacts = rng.choices(meta["book"], cum_weights=CONTACT_CUM, k=n_calls)
+            last_call = None
+            for hour, call_type, (number, name) in zip(hours, types, contacts):
+                ts = midnight + timedelta(hours=hour, minutes=rng.randint(0, 59), seconds=rng.randint(0, 59))
+                if call_type in ("missed", "rejected") or (call_type == "outgoing" and rng.random() < UNANSWERED_OUTGOING):
+                    duration = 0
+                else:
+                    # Log-normal talk time: median ~1.5 min, long tail
+                    duration = min(int(rng.lognormvariate(4.5, 0.9)), 3600)
+                writer.add(calls_t, {
+                    "user_id": user_id, "phone_number": number,
+                    "formatted_number": f"+91 {number[:5]} {number[5:]}",
+                    "call_type": call_type, "timestamp": ts, "duration": duration,
+                    "contact_name": name, "created_at": ts,
+                })
+                last_call = max(last_call, ts) if last_call else ts
+
+            for _ in range(_poisson(rng, followups_per_day * meta["productivity"]) if check_in else 0):
+                number, name = rng.choices(meta["book"], cum_weights=CONTACT_CUM)[0]
+                created = midnight + timedelta(hours=rng.choice(CALL_HOURS), minutes=rng.randint(0, 59))
+                due = datetime.combine(day + timedelta(days=rng.randint(1, 7)), datetime.min.time()) + \
+                    timedelta(hours=rng.choice(CALL_HOURS), minutes=rng.choice((0, 15, 30, 45)))
+                if due < now:
+                    status = rng.choices(("completed", "cancelled", "pending"), weights=(70, 10, 20))[0]
+                else:
+                    status = "pending"
+                writer.add(followups_t, {
+                    "id": _uid(rng), "user_id": user_id, "contact_name": name, "phone": number,
+                    "message": rng.choice(FOLLOWUP_MESSAGES), "date_time": due, "status": status,
+                    "created_at": created, "updated_at": due if status != "pending" else created,
+                })
+
+            synced_at = (check_out or last_call or midnight) + timedelta(minutes=rng.randint(1, 30))
+            last_seen[user_id] = (check_in or synced_at, synced_at)
+
+        if progress:
+            elapsed = time.perf_counter() - started
+            written = sum(writer.counts.values()) + sum(len(b) for b in writer.buffers.values())
+            print(f"\r  day {d + 1}/{days}  {written:,} rows  {elapsed:.1f}s",
+                  end="", flush=True)
+
+    writer.flush()
+    if progress:
+        print(flush=True)
+
+    # -------------------------
+    # last_login / last_sync from the generated activity
+    # -------------------------
+    if last_seen:
+        users_t = User.__table__
+        db.session.execute(
+            update(users_t).where(users_t.c.id == bindparam("uid"))
+            .values(last_login=bindparam("login"), last_sync=bindparam("sync")),
+            [{"uid": uid, "login": login, "sync": sync} for uid, (login, sync) in last_seen.items()]
+        )
+    db.session.commit()
+
+    rows = dict(writer.counts)
+    rows["admins"] = len(admin_ids)
+    rows["users"] = len(user_ids)
+    return {"super_admin_id": owner_id, "admin_ids": admin_ids, "user_ids": user_ids, "rows": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate realistic synthetic data")
+    parser.add_argument("--admins", type=int, default=5)
+    parser.add_argument("--users", type=int, default=20, help="users per admin")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--calls-per-day", type=float, default=35, help="average per user per working day")
+    parser.add_argument("--followups-per-day", type=float, default=2, help="average per user per working day")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None, help="YYYY-MM-DD, defaults to today")
+    parser.add_argument("--prefix", default=None, help="email prefix, defaults to gen<seed>")
+    parser.add_argument("--password", default=PASSWORD)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--database-url", default=None, help="defaults to DATABASE_URL / config.py")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    sys.path.insert(0, ROOT)
+
+    from app import create_app
+    from app.models import db
+
+    app = create_app()
+    with app.app_context():
+        print(f"🧪 Generating {args.admins} admins x {args.users} users x {args.days} days "
+              f"(seed {args.seed}) into {db.engine.url.render_as_string(hide_password=True)}", flush=True)
+        t0 = time.perf_counter()
+        result = generate(
+            db, admins=args.admins, users=args.users, days=args.days, seed=args.seed,
+            calls_per_day=args.calls_per_day, followups_per_day=args.followups_per_day,
+            end_date=args.end_date, prefix=args.prefix, password=args.password,
+            batch_size=args.batch_size, progress=True,
+        )
+        elapsed = time.perf_counter() - t0
+
+    total = sum(result["rows"].values())
+    for table, count in sorted(result["rows"].items()):
+        print(f"  {table:<16} {count:>12,}")
+    print(f"✅ {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)", flush=True)
+
+
+if __name__ == "__main__":
+    main()
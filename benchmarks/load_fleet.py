@@ -0,0 +1,289 @@
+"""
+Mobile fleet load simulator: the 9-10am check-in storm against a local server.
+
+Every simulated device logs in, uploads a check-in selfie, syncs its
+attendance record and pushes its overnight call log in batches, with
+jitter between steps. Device arrivals ramp up over --ramp seconds with a
+peak early in the window. Reports throughput, error rate and p50 / p95 /
+p99 latency per endpoint. Only the standard library is used on the wire,
+so it runs fully offline.
+
+Devices are the accounts created by benchmarks/generate_data.py
+(<prefix>-user<u>.a<a>@example.com, password Passw0rd!). With
+--database-url the dataset is generated when missing and only active
+users are used; the server must run against the same database.
+
+    DATABASE_URL=postgresql://localhost/bench gunicorn wsgi:app --config gunicorn.conf.py &
+    python benchmarks/load_fleet.py --database-url postgresql://localhost/bench \\
+        --url http://127.0.0.1:8000 --devices 2000 --concurrency 200 --ramp 60
+"""
+import argparse
+import io
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import generate_data  # noqa: E402 - benchmarks/ is on sys.path when run as a script
+from bench_endpoints import percentile  # noqa: E402
+
+ENDPOINTS = ("login", "upload_image", "attendance_sync", "call_history_sync")
+SELFIE_VARIANTS = 8
+
+
+class Stats:
+    """Thread-safe latency / status collection per endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {name: [] for name in ENDPOINTS}
+        self.statuses = {name: {} for name in ENDPOINTS}
+        self.devices = []  # seconds from first request to last sync, per completed device
+
+    def record(self, endpoint, status, elapsed):
+        with self._lock:
+            self.samples[endpoint].append(elapsed * 1000)
+            counts = self.statuses[endpoint]
+            counts[status] = counts.get(status, 0) + 1
+
+    def device_done(self, elapsed):
+        with self._lock:
+            self.devices.append(elapsed)
+
+
+def _request(stats, endpoint, url, data=None, headers=None, timeout=60):
+    req = urllib.request.Request(url, data=data, headers=headers or {}, method="POST")
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            body = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        body, status = e.read(), e.code
+    except (urllib.error.URLError, OSError) as e:
+        body, status = b"", f"conn:{type(e).__name__}"
+    stats.record(endpoint, status, time.perf_counter() - started)
+    return status, body
+
+
+def _post_json(stats, endpoint, url, payload, token=None):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    status, body = _request(stats, endpoint, url, json.dumps(payload).encode(), headers)
+    try:
+        return status, json.loads(body) if body else {}
+    except ValueError:
+        return status, {}
+
+
+def _multipart(field, filename, content, content_type):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def make_selfies(count, width, height):
+    """A few phone-camera JPEGs; each upload gets a unique tail so nothing dedups."""
+    from PIL import Image
+
+    selfies = []
+    for seed in range(count):
+        noise = Image.effect_noise((width // 4, height // 4), 40 + seed * 3).resize((width, height))
+        gradient = Image.linear_gradient("L").resize((width, height))
+        img = Image.merge("RGB", (noise, gradient, Image.eval(noise, lambda p: 255 - p)))
+        buf = io.BytesIO()
+        img.save(buf, "JPEG", quality=90)
+        selfies.append(buf.getvalue())
+    return selfies
+
+
+def _overnight_calls(rng, count, now):
+    # Yesterday's calls, still on the phone until this morning's sync
+    yesterday = datetime.combine(now.date() - timedelta(days=1), datetime.min.time())
+    calls = []
+    for _ in range(count):
+        hour = rng.choices(generate_data.CALL_HOURS, cum_weights=generate_data.CALL_HOUR_CUM)[0]
+        ts = yesterday + timedelta(hours=hour, minutes=rng.randint(0, 59), seconds=rng.randint(0, 59))
+        call_type = rng.choices(generate_data.CALL_TYPES, cum_weights=generate_data.CALL_TYPE_CUM)[0]
+        number = f"9{rng.randint(100000000, 999999999)}"
+        calls.append({
+            "phone_number": number, "formatted_number": f"+91 {number[:5]} {number[5:]}",
+            "call_type": call_type, "timestamp": ts.isoformat(), "contact_name": None,
+            "duration": 0 if call_type in ("missed", "rejected") else min(int(rng.lognormvariate(4.5, 0.9)), 3600),
+        })
+    return calls
+
+
+def run_device(device, args, stats, selfies, t0):
+    """One phone's morning: login, selfie, attendance, call log."""
+    email, seed, arrival = device
+    rng = random.Random(seed)
+    base = args.url.rstrip("/")
+
+    delay = t0 + arrival - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+    started = time.perf_counter()
+
+    status, body = _post_json(stats, "login", f"{base}/api/users/login", {"email": email, "password": args.password})
+    if status != 200:
+        return
+    token = body.get("access_token")
+    auth = {"Authorization": f"Bearer {token}"}
+
+    time.sleep(rng.uniform(0.2, args.think))
+    selfie = rng.choice(selfies) + uuid.UUID(int=rng.getrandbits(128)).bytes
+    data, content_type = _multipart("image", "selfie.jpg", selfie, "image/jpeg")
+    status, body = _request(stats, "upload_image", f"{base}/api/attendance/upload-image", data,
+                            dict(auth, **{"Content-Type": content_type}))
+    image_path = json.loads(body).get("image_path") if status == 200 and body else None
+
+    time.sleep(rng.uniform(0.1, args.think))
+    now = datetime.utcnow()
+    _post_json(stats, "attendance_sync", f"{base}/api/attendance/sync", {"records": [{
+        "id": uuid.UUID(int=rng.getrandbits(128)).hex, "check_in": int(time.time() * 1000),
+        "status": "on-time" if now.hour < 10 else "late", "image_path": image_path,
+        "latitude": 12.9756 + rng.uniform(-0.002, 0.002), "longitude": 77.6066 + rng.uniform(-0.002, 0.002),
+        "location": "MG Road, Bengaluru",
+    }]}, token)
+
+    # Overnight call log: log-normal size, pushed in app-sized batches
+    calls = _overnight_calls(rng, min(int(rng.lognormvariate(math.log(args.calls), 0.6)), 2000), now)
+    for i in range(0, len(calls), args.batch_size):
+        time.sleep(rng.uniform(0.05, args.think / 2))
+        _post_json(stats, "call_history_sync", f"{base}/api/call-history/sync",
+                   {"call_history": calls[i:i + args.batch_size]}, token)
+
+    stats.device_done(time.perf_counter() - started)
+
+
+def load_devices(args):
+    """Emails of the simulated devices, oldest accounts first."""
+    prefix = args.prefix or f"gen{args.seed}"
+    if not args.database_url:
+        admins = math.ceil(args.devices / args.users)
+        return [f"{prefix}-user{u}.a{a}@example.com" for a in range(admins) for u in range(args.users)][:args.devices]
+
+    os.environ["DATABASE_URL"] = args.database_url
+    from app import create_app
+    from app.models import db, User
+
+    app = create_app()
+    with app.app_context():
+        query = db.session.query(User.email).filter(User.email.like(f"{prefix}-user%"), User.is_active.is_(True))
+        if query.first() is None:
+            # Head-room for the few inactive accounts the generator creates
+            admins = math.ceil(args.devices * 1.05 / args.users)
+            print(f"🧪 Generating {admins} admins x {args.users} users ({prefix})", flush=True)
+            generate_data.generate(db, admins=admins, users=args.users, days=args.days, seed=args.seed, prefix=prefix)
+        emails = [email for (email,) in query.order_by(User.id).limit(args.devices)]
+        db.session.remove()
+
+    if len(emails) < args.devices:
+        print(f"⚠️ Only {len(emails)} active accounts with prefix {prefix!r}", flush=True)
+    return emails
+
+
+def report(stats, elapsed, devices):
+    results = {}
+    total = sum(len(s) for s in stats.samples.values())
+    print(f"\n{'endpoint':<20}{'requests':>9}{'req/s':>9}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses")
+    for name in ENDPOINTS:
+        samples, statuses = stats.samples[name], stats.statuses[name]
+        if not samples:
+            continue
+        errors = sum(n for s, n in statuses.items() if not isinstance(s, int) or s >= 400)
+        results[name] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "error_rate": round(errors / len(samples), 4),
+            "p50_ms": round(percentile(samples, 50), 1),
+            "p95_ms": round(percentile(samples, 95), 1),
+            "p99_ms": round(percentile(samples, 99), 1),
+            "statuses": {str(s): n for s, n in sorted(statuses.items(), key=str)},
+        }
+        r = results[name]
+        print(f"{name:<20}{r['requests']:>9}{r['throughput_rps']:>9.1f}{r['error_rate']:>9.1%}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}  "
+              + " ".join(f"{s}x{n}" for s, n in r["statuses"].items()))
+
+    completed = len(stats.devices)
+    print(f"\n{completed}/{devices} devices completed, {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+    if stats.devices:
+        print(f"Device morning p50 {percentile(stats.devices, 50):.1f}s  p95 {percentile(stats.devices, 95):.1f}s")
+    return {
+        "devices": devices,
+        "completed": completed,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 2),
+        "device_p50_s": round(percentile(stats.devices, 50), 2) if stats.devices else None,
+        "device_p95_s": round(percentile(stats.devices, 95), 2) if stats.devices else None,
+        "endpoints": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a fleet of devices checking in")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100, help="devices in flight at once")
+    parser.add_argument("--ramp", type=float, default=30, help="seconds over which devices arrive")
+    parser.add_argument("--calls", type=int, default=40, help="median overnight call log size")
+    parser.add_argument("--batch-size", type=int, default=50, help="calls per sync request")
+    parser.add_argument("--think", type=float, default=1.5, help="max seconds between a device's steps")
+    parser.add_argument("--selfie-size", default="1512x2016", help="WxH of the uploaded JPEGs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default=None, help="dataset email prefix, defaults to gen<seed>")
+    parser.add_argument("--users", type=int, default=100, help="users per admin in the dataset")
+    parser.add_argument("--days", type=int, default=7, help="history to generate for a missing dataset")
+    parser.add_argument("--password", default=generate_data.PASSWORD)
+    parser.add_argument("--database-url", default=None, help="read / generate the device accounts here")
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    emails = load_devices(args)
+    rng = random.Random(args.seed)
+    # Peak a third of the way into the window, like a 9:20 rush
+    devices = sorted(((email, rng.getrandbits(32), rng.triangular(0, args.ramp, args.ramp / 3)) for email in emails),
+                     key=lambda d: d[2])
+    width, height = (int(v) for v in args.selfie_size.lower().split("x"))
+    selfies = make_selfies(SELFIE_VARIANTS, width, height)
+
+    print(f"📱 {len(devices)} devices -> {args.url} (concurrency {args.concurrency}, ramp {args.ramp:.0f}s)", flush=True)
+    stats = Stats()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for future in [pool.submit(run_device, d, args, stats, selfies, t0) for d in devices]:
+            future.result()
+    elapsed = time.perf_counter() - t0
+
+    summary = report(stats, elapsed, len(devices))
+    if args.output:
+        summary["meta"] = {"url": args.url, "concurrency": args.concurrency, "ramp_s": args.ramp,
+                           "calls_median": args.calls, "batch_size": args.batch_size,
+                           "created_at": datetime.utcnow().isoformat(timespec="seconds")}
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"📄 Results written to {args.output}")
+
+    failed = sum(r["error_rate"] * r["requests"] for r in summary["endpoints"].values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
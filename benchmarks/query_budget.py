@@ -0,0 +1,341 @@
+"""
+Query budget harness: catches N+1 queries before they ship.
+
+Seeds a realistic tenant twice (small and large), calls every API endpoint
+against both and fails when
+
+  * an endpoint runs more SQL statements than its declared budget, or
+  * its statement count grows with the amount of data (N+1), unless the
+    endpoint declares a per-item budget (bulk sync writes), or
+  * an endpoint returns an error status, or
+  * a registered endpoint has no budget below (new routes must declare one).
+
+Statement counts come from the X-Query-Count header (app/request_metrics.py).
+
+    python benchmarks/query_budget.py
+    python benchmarks/query_budget.py --only admin. --verbose
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+# Tenant sizes: (users per admin, rows of each kind per user, extra admins)
+SMALL = (3, 3, 2)
+LARGE = (12, 12, 8)
+
+PASSWORD = "Passw0rd!"
+
+
+class Case:
+    """
+    One endpoint call and its budget.
+
+    budget   - max statements for the request
+    per_item - extra statements allowed per item in the request body
+               (bulk writes); 0 means the count must not grow with data
+    """
+
+    def __init__(self, endpoint, method, url, role, budget, per_item=0, body=None, expect=(200, 201)):
+        self.endpoint = endpoint
+        self.method = method
+        self.url = url
+        self.role = role
+        self.budget = budget
+        self.per_item = per_item
+        self.body = body
+        self.expect = expect
+
+
+def _calls(n):
+    base = datetime.utcnow().replace(microsecond=0)
+    return {"call_history": [
+        {"phone_number": f"+9198{i:08d}", "call_type": "outgoing", "duration": 30 + i,
+         "timestamp": (base - timedelta(minutes=i)).isoformat(), "contact_name": f"Lead {i}"}
+        for i in range(n)
+    ]}
+
+
+def _attendance(n):
+    base = datetime.utcnow().replace(microsecond=0)
+    return {"records": [
+        {"id": f"att-new-{i}", "check_in": int((base - timedelta(days=100 + i)).timestamp() * 1000),
+         "status": "present", "latitude": 12.9, "longitude": 77.6, "location": "Office"}
+        for i in range(n)
+    ]}
+
+
+# Every API endpoint. {admin_id}, {user_id}, {other_admin_id}, {other_user_id}
+# and {items} are filled in per tenant size. Destructive calls run last.
+CASES = [
+    # ---- super admin ----
+    Case("super_admin.login", "POST", "/api/superadmin/login", None, 3,
+         body=lambda t: {"email": "owner@example.com", "password": PASSWORD}),
+    Case("super_admin.get_admins", "GET", "/api/superadmin/admins", "super_admin", 4),
+    Case("super_admin.get_admins", "GET", "/api/superadmin/admins?page=1&per_page=20&search=admin", "super_admin", 5),
+    Case("super_admin.get_admin_users", "GET", "/api/superadmin/admin/{admin_id}/users", "super_admin", 4),
+    Case("super_admin.dashboard_stats", "GET", "/api/superadmin/dashboard-stats", "super_admin", 6),
+    Case("super_admin.activity_logs", "GET", "/api/superadmin/logs", "super_admin", 4),
+    Case("super_admin.create_admin", "POST", "/api/superadmin/create-admin", "super_admin", 6,
+         body=lambda t: {"name": "New Admin", "email": "new-admin@example.com", "password": PASSWORD,
+                         "user_limit": 5, "expiry_date": (datetime.utcnow() + timedelta(days=30)).strftime("%Y-%m-%d")}),
+    Case("super_admin.update_admin", "PUT", "/api/superadmin/admin/{other_admin_id}", "super_admin", 5,
+         body=lambda t: {"user_limit": 50}),
+    Case("super_admin.toggle_admin_status", "PUT", "/api/superadmin/admin/{other_admin_id}/status", "super_admin", 6),
+
+    # ---- admin ----
+    Case("admin.login", "POST", "/api/admin/login", None, 5,
+         body=lambda t: {"email": "admin0@example.com", "password": PASSWORD}),
+    Case("admin.get_users", "GET", "/api/admin/users", "admin", 8),
+    Case("admin.dashboard_stats", "GET", "/api/admin/dashboard-stats", "admin", 10),
+    Case("admin.recent_sync", "GET", "/api/admin/recent-sync", "admin", 4),
+    Case("admin.user_logs", "GET", "/api/admin/user-logs", "admin", 5),
+    Case("admin.presence", "GET", "/api/admin/presence", "admin", 5),
+    Case("admin.user_attendance", "GET", "/api/admin/user-attendance/{user_id}", "admin", 5),
+    Case("admin.user_call_history", "GET", "/api/admin/user-call-history/{user_id}", "admin", 5),
+    Case("admin.user_analytics", "GET", "/api/admin/user-analytics/{user_id}", "admin", 8),
+    Case("admin.create_user", "POST", "/api/admin/create-user", "admin", 10,
+         body=lambda t: {"name": "New User", "email": "new-user@example.com", "password": PASSWORD, "phone": "9000000001"}),
+    Case("admin.update_user", "PUT", "/api/admin/user/{other_user_id}", "admin", 7,
+         body=lambda t: {"password": PASSWORD}),
+    Case("admin_user.toggle_user_status", "PUT", "/api/admin/user/{other_user_id}/status", "admin", 8),
+    Case("admin_user.admin_get_user_data", "GET", "/api/admin/user-data/{user_id}", "admin", 7),
+    Case("admin_all_call_history.all_call_history", "GET", "/api/admin/all-call-history", "admin", 5),
+    Case("admin_all_call_history.download_user_history", "GET", "/api/admin/download-user-history?user_id={user_id}", "admin", 4),
+    Case("admin_attendance.get_admin_attendance", "GET", "/api/admin/attendance", "admin", 4),
+    Case("admin_attendance.export_attendance_pdf", "GET", "/api/admin/attendance/export_pdf", "admin", 4),
+    Case("admin_call_analytics.admin_analytics_all_users", "GET", "/api/admin/call-analytics", "admin", 8),
+    Case("admin_call_analytics.admin_analytics_single_user", "GET", "/api/admin/call-analytics/{user_id}", "admin", 8),
+    Case("admin_call_analytics.download_analytics_report", "GET", "/api/admin/call-analytics/download-report", "admin", 8),
+    Case("admin_performance.performance", "GET", "/api/admin/performance", "admin", 8),
+    Case("admin_sync.sync_summary", "GET", "/api/admin/sync-summary", "admin", 5),
+    Case("followup.get_admin_followups", "GET", "/api/admin/followups", "admin", 5),
+    Case("call_history.admin_user_call_history", "GET", "/api/call-history/admin/{user_id}", "admin", 5),
+    Case("users.register", "POST", "/api/users/register", "admin", 8,
+         body=lambda t: {"name": "Registered", "email": "registered@example.com", "password": PASSWORD, "phone": "9000000002"}),
+
+    # ---- mobile user ----
+    Case("users.get_me", "GET", "/api/users/me", "user", 5),
+    Case("users.update_profile", "PUT", "/api/users/update", "user", 6, body=lambda t: {"name": "Renamed"}),
+    Case("users.sync_data", "POST", "/api/users/sync", "user", 5),
+    Case("users.sync_status", "GET", "/api/users/sync-status", "user", 5),
+    Case("call_history.my_call_history", "GET", "/api/call-history/my", "user", 6),
+    # One executemany INSERT for the whole batch, so constant in its size.
+    # The first sync also builds the user's watermark from the stored calls.
+    Case("call_history.sync_call_history", "POST", "/api/call-history/sync", "user", 15,
+         body=lambda t: _calls(t["items"])),
+    # Two lookups + one INSERT per record at or before the watermark (built on first sync)
+    Case("attendance.sync_attendance", "POST", "/api/attendance/sync", "user", 9, per_item=3,
+         body=lambda t: _attendance(t["items"])),
+    Case("call_history.call_history_watermark", "GET", "/api/call-history/watermark", "user", 5),
+    Case("attendance.attendance_watermark", "GET", "/api/attendance/watermark", "user", 5),
+    # Fixed 7-day trend: two queries per day
+    Case("call_analytics.get_analytics", "GET", "/api/call-analytics", "user", 28),
+    Case("call_analytics.sync_analytics", "POST", "/api/call-analytics/sync", "user", 10),
+    Case("followup.create_followup", "POST", "/api/followup/create", "user", 7,
+         body=lambda t: {"reminder_id": "rem-new", "user_id": t["user_id"], "phone": "9000000003",
+                         "date_time": (datetime.utcnow() + timedelta(days=1)).isoformat()}),
+    Case("call_history.init_recording_upload", "POST", "/api/call-history/recording-uploads", "user", 8,
+         body=lambda t: {"filename": "call.m4a", "size": 4, "phone_number": "+919800000000",
+                         "timestamp": datetime.utcnow().replace(microsecond=0).isoformat()}),
+    # Last: logging in rotates the session id, invalidating the token above
+    Case("users.login", "POST", "/api/users/login", None, 6,
+         body=lambda t: {"email": "user0@example.com", "password": PASSWORD}),
+
+    # ---- misc ----
+    Case("health", "GET", "/api/health", None, 0),
+    Case("metrics.metrics", "GET", "/api/metrics", "super_admin", 2),
+
+    # ---- destructive (last) ----
+    Case("admin.delete_user", "DELETE", "/api/admin/user/{other_user_id}", "admin", 12),
+    Case("super_admin.delete_activity_logs", "DELETE", "/api/superadmin/logs", "super_admin", 4),
+    # ORM cascade deletes the admin's users one by one
+    Case("super_admin.delete_admin", "DELETE", "/api/superadmin/admin/{other_admin_id}", "super_admin", 12, per_item=2),
+]
+
+# Endpoints deliberately not budgeted, with the reason
+SKIPPED = {
+    "admin.debug_email": "sends a real e-mail",
+    "auth_pwd.forgot_password": "sends a real e-mail",
+    "auth_pwd.reset_password": "needs a mailed token",
+    "admin_user.delete_user": "same handler shape as admin.delete_user",
+    "attendance.upload_image": "file upload - see bench_image_upload.py",
+    "call_history.upload_recording": "file upload",
+    "call_history.recording_upload_status": "needs an upload session id",
+    "call_history.append_recording_chunk": "needs an upload session id",
+    "call_history.complete_recording_upload": "needs an upload session id",
+    "call_history.sync_batch_status": "needs a batch id (SYNC_INGEST_MODE=deferred)",
+    "uploaded_files": "static file serving, no SQL",
+}
+SKIPPED_PREFIXES = ("fix.",)  # one-off schema repair endpoints
+
+
+# -------------------------
+# Tenant
+# -------------------------
+def seed_tenant(db, models, users, rows, extra_admins):
+    """One admin with `users` users, each with `rows` calls / attendance / follow-ups."""
+    from app.models import bcrypt
+
+    SuperAdmin, Admin, User, Attendance, CallHistory, Followup, ActivityLog, UserRole = models
+    password_hash = bcrypt.generate_password_hash(PASSWORD).decode()
+    now = datetime.utcnow().replace(microsecond=0)
+
+    owner = SuperAdmin(name="Owner", email="owner@example.com", password_hash=password_hash)
+    db.session.add(owner)
+    db.session.flush()
+
+    admins = []
+    for a in range(1 + extra_admins):
+        admin = Admin(name=f"Admin {a}", email=f"admin{a}@example.com", password_hash=password_hash,
+                      created_by=owner.id, user_limit=1000, expiry_date=now + timedelta(days=365), is_active=True)
+        db.session.add(admin)
+        admins.append(admin)
+    db.session.flush()
+
+    call_types = ("incoming", "outgoing", "missed", "rejected")
+    tenant_users = []
+    for admin in admins:
+        for u in range(users):
+            email = f"user{u}@example.com" if admin is admins[0] else f"user{u}.{admin.id}@example.com"
+            user = User(name=f"User {u}", email=email, password_hash=password_hash, admin_id=admin.id,
+                        phone=f"98{admin.id:03d}{u:05d}", last_sync=now - timedelta(hours=u), last_login=now)
+            db.session.add(user)
+            if admin is admins[0]:
+                tenant_users.append(user)
+    db.session.flush()
+
+    for user in tenant_users:
+        for r in range(rows):
+            day = now - timedelta(days=r)
+            db.session.add(Attendance(external_id=f"att-{user.id}-{r}", user_id=user.id, check_in=day,
+                                      check_out=day + timedelta(hours=8), status="present", address="Office"))
+            db.session.add(CallHistory(user_id=user.id, phone_number=f"+9197{r:08d}", call_type=call_types[r % 4],
+                                       duration=60 + r, timestamp=day - timedelta(minutes=r), contact_name=f"Lead {r}"))
+            db.session.add(Followup(id=f"fu-{user.id}-{r}", user_id=user.id, phone=f"97{r:08d}",
+                                    date_time=day + timedelta(days=1), status="pending"))
+            db.session.add(ActivityLog(actor_role=UserRole.USER, actor_id=user.id, action="Synced",
+                                       target_type="user", target_id=user.id, timestamp=day))
+    db.session.commit()
+
+    return {
+        "super_admin_id": owner.id,
+        "admin_id": admins[0].id,
+        "other_admin_id": admins[-1].id,
+        "user_id": tenant_users[0].id,
+        "other_user_id": tenant_users[-1].id,
+        "items": rows,
+    }
+
+
+def measure(size, cases):
+    """Run every case against a fresh database of the given size."""
+    users, rows, extra_admins = size
+    workdir = tempfile.mkdtemp(prefix="query-budget-")
+    os.chdir(workdir)  # uploads / generated files stay out of the repo
+
+    from config import Config
+    from app import create_app
+    from app.models import db, SuperAdmin, Admin, User, Attendance, CallHistory, Followup, ActivityLog, UserRole
+    from flask_jwt_extended import create_access_token
+
+    class BudgetConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'budget.db')}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        SQLALCHEMY_BINDS = {}
+        METRICS_DEBUG_HEADERS = True
+        IMAGE_POOL_WORKERS = 0
+        DB_SLOW_QUERY_MS = 0
+
+    app = create_app(BudgetConfig)
+    client = app.test_client()
+
+    with app.app_context():
+        tenant = seed_tenant(db, (SuperAdmin, Admin, User, Attendance, CallHistory, Followup, ActivityLog, UserRole),
+                             users, rows, extra_admins)
+        identities = {"super_admin": tenant["super_admin_id"], "admin": tenant["admin_id"], "user": tenant["user_id"]}
+        tokens = {
+            role: create_access_token(identity=str(identity), additional_claims={"role": role})
+            for role, identity in identities.items()
+        }
+
+    results = []
+    for case in cases:
+        headers = {"Authorization": f"Bearer {tokens[case.role]}"} if case.role else {}
+        kwargs = {"headers": headers}
+        if case.body:
+            kwargs["json"] = case.body(tenant)
+        response = client.open(case.url.format(**tenant), method=case.method, **kwargs)
+        results.append((response.status_code, int(response.headers.get("X-Query-Count", -1))))
+
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    os.chdir(ROOT)
+    return results, tenant["items"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-endpoint SQL query budgets / N+1 check")
+    parser.add_argument("--only", default=None, help="only endpoints starting with this prefix")
+    parser.add_argument("--verbose", action="store_true", help="print every endpoint, not only failures")
+    args = parser.parse_args()
+
+    cases = [c for c in CASES if not args.only or c.endpoint.startswith(args.only)]
+
+    small, small_items = measure(SMALL, cases)
+    large, large_items = measure(LARGE, cases)
+
+    failures = []
+    print(f"{'endpoint':<52}{'method':<8}{'small':>7}{'large':>7}{'budget':>8}")
+    for case, (s_status, s_count), (l_status, l_count) in zip(cases, small, large):
+        problems = []
+        if s_status not in case.expect or l_status not in case.expect:
+            problems.append(f"status {s_status}/{l_status}")
+        allowed_growth = case.per_item * (large_items - small_items)
+        if l_count > s_count + allowed_growth:
+            problems.append(f"grows with data ({s_count} -> {l_count})")
+        budget = case.budget + case.per_item * large_items
+        if l_count > budget:
+            problems.append(f"over budget ({l_count} > {budget})")
+
+        if problems or args.verbose:
+            budget_label = f"{case.budget}+{case.per_item}n" if case.per_item else str(case.budget)
+            marker = "❌" if problems else "  "
+            print(f"{marker}{case.endpoint:<50}{case.method:<8}{s_count:>7}{l_count:>7}{budget_label:>8}"
+                  + (f"   {'; '.join(problems)}" if problems else ""))
+        if problems:
+            failures.append(case.endpoint)
+
+    if not args.only:
+        # Every registered API endpoint must be budgeted or explicitly skipped
+        from app import create_app
+        from config import Config
+
+        class ProbeConfig(Config):
+            SQLALCHEMY_DATABASE_URI = "sqlite://"
+            SQLALCHEMY_ENGINE_OPTIONS = {}
+            SQLALCHEMY_BINDS = {}
+            SCHEMA_BOOTSTRAP = "off"
+
+        covered = {c.endpoint for c in CASES} | set(SKIPPED)
+        for rule in create_app(ProbeConfig).url_map.iter_rules():
+            if not rule.rule.startswith(("/api/", "/uploads/")) or rule.endpoint.startswith(SKIPPED_PREFIXES):
+                continue
+            if rule.endpoint not in covered:
+                print(f"❌ {rule.endpoint} ({rule.rule}) has no query budget - add a Case to benchmarks/query_budget.py")
+                failures.append(rule.endpoint)
+
+    if failures:
+        print(f"\n❌ {len(failures)} query budget failure(s)")
+        sys.exit(1)
+    print(f"\n✅ {len(cases)} endpoint calls within budget")
+
+
+if __name__ == "__main__":
+    main()
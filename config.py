@@ -1,11 +1,184 @@
 import os
+import tempfile
+
+from sqlalchemy.engine import make_url
+
+
+def _env_flag(name, default=False):
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes")
+
+
+def _env_rate(name, default):
+    """Token bucket "rate/burst" (tokens per second / bucket size), e.g. "0.2/20"."""
+    rate, _, burst = os.environ.get(name, default).partition("/")
+    return float(rate), int(burst or 1)
+
+
+def _env_choice(name, default, choices):
+    value = os.environ.get(name, default).strip().lower()
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(sorted(choices))}, not {value!r}")
+    return value
+
+
+def _engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS built from DB_* environment variables."""
+    options = {
+        "pool_pre_ping": _env_flag("DB_POOL_PRE_PING", True),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+    }
+    if uri.startswith("postgresql"):
+        # Per process; gunicorn threads share it (see gunicorn.conf.py)
+        options["pool_size"] = int(os.environ.get("DB_POOL_SIZE", 5))
+        options["max_overflow"] = int(os.environ.get("DB_MAX_OVERFLOW", 5))
+        options["pool_timeout"] = int(os.environ.get("DB_POOL_TIMEOUT", 10))
+        connect_args = {"connect_timeout": int(os.environ.get("DB_CONNECT_TIMEOUT", 10))}
+        if _env_flag("DB_PGBOUNCER") and make_url(uri).get_dialect().driver == "psycopg":
+            # psycopg 3 prepares repeated statements server-side; PgBouncer
+            # (transaction pooling) can't route them. psycopg2 never does.
+            connect_args["prepare_threshold"] = None
+        options["connect_args"] = connect_args
+    return options
+
 
 class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "").replace("postgres://", "postgresql://")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Optional read replica for heavy read-only endpoints (app/db_routing.py)
+    DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL", "").replace("postgres://", "postgresql://")
+    SQLALCHEMY_BINDS = (
+        {"replica": {"url": DATABASE_REPLICA_URL, **_engine_options(DATABASE_REPLICA_URL)}}
+        if DATABASE_REPLICA_URL else {}
+    )
+    DB_REPLICA_BLUEPRINTS = tuple(
+        b.strip() for b in os.environ.get("DB_REPLICA_BLUEPRINTS", "admin_call_analytics,admin_performance").split(",")
+        if b.strip()
+    )
+    DB_REPLICA_MAX_LAG_SECONDS = float(os.environ.get("DB_REPLICA_MAX_LAG_SECONDS", 5))
+    DB_REPLICA_LAG_CHECK_SECONDS = float(os.environ.get("DB_REPLICA_LAG_CHECK_SECONDS", 5))
+    DB_REPLICA_READ_YOUR_WRITES_SECONDS = float(os.environ.get("DB_REPLICA_READ_YOUR_WRITES_SECONDS", 10))
+
+    # Connecting through PgBouncer in transaction pooling mode: no
+    # server-side prepared statements and no session-level locks / SETs
+    DB_PGBOUNCER = _env_flag("DB_PGBOUNCER")
+
+    # Statement timeouts per endpoint class (ms, 0 = server default),
+    # see app/db_timeouts.py
+    DB_TIMEOUT_INTERACTIVE_MS = int(os.environ.get("DB_TIMEOUT_INTERACTIVE_MS", 5000))
+    DB_TIMEOUT_REPORT_MS = int(os.environ.get("DB_TIMEOUT_REPORT_MS", 120000))
+    DB_TIMEOUT_EXPORT_MS = int(os.environ.get("DB_TIMEOUT_EXPORT_MS", 300000))
     SECRET_KEY = os.environ.get("SECRET_KEY", "super-secret-key")
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "jwt-secret-key")
     
     # Notification Config
     ZEPTOMAIL_USER = os.environ.get("ZEPTOMAIL_USER", "")
     ZEPTOMAIL_API_TOKEN = os.environ.get("ZEPTOMAIL_API_TOKEN", "")
+
+    # Attendance image compression (process pool)
+    IMAGE_POOL_WORKERS = int(os.environ.get("IMAGE_POOL_WORKERS", 2))  # 0 = inline
+    IMAGE_POOL_MAX_PENDING = int(os.environ.get("IMAGE_POOL_MAX_PENDING", 8))
+    IMAGE_POOL_WAIT_SECONDS = float(os.environ.get("IMAGE_POOL_WAIT_SECONDS", 5))
+    IMAGE_POOL_TIMEOUT_SECONDS = float(os.environ.get("IMAGE_POOL_TIMEOUT_SECONDS", 30))
+
+    # Resumable recording uploads
+    RECORDING_CHUNK_SIZE = int(os.environ.get("RECORDING_CHUNK_SIZE", 1024 * 1024))
+    RECORDING_MAX_CHUNK_SIZE = int(os.environ.get("RECORDING_MAX_CHUNK_SIZE", 8 * 1024 * 1024))
+    RECORDING_MAX_SIZE = int(os.environ.get("RECORDING_MAX_SIZE", 200 * 1024 * 1024))
+    RECORDING_UPLOAD_TTL_HOURS = int(os.environ.get("RECORDING_UPLOAD_TTL_HOURS", 24))  # since the last accepted chunk
+    BLOB_ORPHAN_TTL_HOURS = int(os.environ.get("BLOB_ORPHAN_TTL_HOURS", 72))  # uploaded files no row ever pointed at
+
+    # /uploads serving (files are immutable once written)
+    UPLOADS_CACHE_MAX_AGE = int(os.environ.get("UPLOADS_CACHE_MAX_AGE", 31536000))
+    UPLOADS_ACCEL_REDIRECT_PREFIX = os.environ.get("UPLOADS_ACCEL_REDIRECT_PREFIX", "")  # nginx internal location
+    USE_X_SENDFILE = _env_flag("USE_X_SENDFILE")
+
+    # Request / query metrics (served on /api/metrics)
+    METRICS_ENABLED = _env_flag("METRICS_ENABLED", True)
+    METRICS_DEBUG_HEADERS = _env_flag("METRICS_DEBUG_HEADERS")  # X-Query-Count / Server-Timing (always on in debug)
+    # Workers write their totals here and a scrape sums them ("" = this process only)
+    METRICS_DIR = os.environ.get(
+        "METRICS_DIR", os.path.join(tempfile.gettempdir(), f"app-metrics-{os.environ.get('PORT', '10000')}")
+    )
+    METRICS_FLUSH_SECONDS = int(os.environ.get("METRICS_FLUSH_SECONDS", 10))
+    DB_SLOW_QUERY_MS = int(os.environ.get("DB_SLOW_QUERY_MS", 1000))  # log statements slower than this, 0 = off
+
+    # JSON responses through orjson (when installed)
+    ORJSON_ENABLED = _env_flag("ORJSON_ENABLED", True)
+
+    # MessagePack / CBOR (when installed) bodies on the mobile sync endpoints
+    BINARY_PAYLOADS_ENABLED = _env_flag("BINARY_PAYLOADS_ENABLED", True)
+
+    # Call-history sync: inline (merge while the phone waits) or deferred
+    # (202 + batch id, merged by background workers from sync_batches)
+    SYNC_INGEST_MODE = _env_choice("SYNC_INGEST_MODE", "inline", {"inline", "deferred"})
+    SYNC_INGEST_WORKERS = int(os.environ.get("SYNC_INGEST_WORKERS", 2))  # threads per web process, 0 = ingest_worker.py only
+    SYNC_INGEST_POLL_SECONDS = float(os.environ.get("SYNC_INGEST_POLL_SECONDS", 2))
+    SYNC_INGEST_LOCK_SECONDS = int(os.environ.get("SYNC_INGEST_LOCK_SECONDS", 300))  # batch of a dead worker retried after
+    SYNC_INGEST_MAX_ATTEMPTS = int(os.environ.get("SYNC_INGEST_MAX_ATTEMPTS", 3))
+    SYNC_INGEST_RETENTION_HOURS = int(os.environ.get("SYNC_INGEST_RETENTION_HOURS", 24))  # merged batches kept this long
+
+    # ASGI front (asgi.py under uvicorn): bodies are received on the event loop,
+    # complete requests run in ASGI_THREADS threads (keep within the DB pool)
+    ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 4))
+    ASGI_SPOOL_MEMORY = int(os.environ.get("ASGI_SPOOL_MEMORY", 1024 * 1024))  # larger bodies spill to a temp file
+    ASGI_MAX_BODY_SIZE = int(os.environ.get("ASGI_MAX_BODY_SIZE", RECORDING_MAX_SIZE + 1024 * 1024))  # 413 past this
+    ASGI_BODY_TIMEOUT = float(os.environ.get("ASGI_BODY_TIMEOUT", 60))  # seconds without a byte before 408
+
+    # users.last_sync / last_login and admins.last_login are buffered per process
+    # and written in one UPDATE this often (app/services/last_seen.py), 0 = on every request.
+    # With DATABASE_REPLICA_URL set, users.last_sync is always written on the request.
+    LAST_SEEN_FLUSH_SECONDS = float(os.environ.get("LAST_SEEN_FLUSH_SECONDS", 5))
+
+    # Presence registry (app/services/presence.py): "online" = a sync or login within
+    # PRESENCE_ONLINE_SECONDS; per-process tenants are reloaded from the DB after PRESENCE_REFRESH_SECONDS.
+    # Without PRESENCE_REDIS_URL only /api/admin/presence reads it (each worker's own view);
+    # the users list keeps its exact DB query.
+    PRESENCE_ONLINE_SECONDS = int(os.environ.get("PRESENCE_ONLINE_SECONDS", 300))
+    PRESENCE_REFRESH_SECONDS = float(os.environ.get("PRESENCE_REFRESH_SECONDS", 30))
+    PRESENCE_REDIS_URL = os.environ.get("PRESENCE_REDIS_URL", "")  # shared across workers / nodes (needs redis)
+
+    # Admission control on the mobile sync / upload endpoints (app/admission.py):
+    # token buckets per user and per admin (tenant), per endpoint class
+    ADMISSION_ENABLED = _env_flag("ADMISSION_ENABLED", True)
+    ADMISSION_LIMITS = {
+        "sync": {
+            "user": _env_rate("ADMISSION_SYNC_USER_RATE", "0.2/20"),
+            "tenant": _env_rate("ADMISSION_SYNC_TENANT_RATE", "5/100"),
+        },
+        "upload": {
+            "user": _env_rate("ADMISSION_UPLOAD_USER_RATE", "2/60"),
+            "tenant": _env_rate("ADMISSION_UPLOAD_TENANT_RATE", "20/300"),
+        },
+    }
+    ADMISSION_REDIS_URL = os.environ.get("ADMISSION_REDIS_URL", "")  # shared buckets across nodes (needs redis)
+    # Shed sync / upload (503) when this share of the DB pool is checked out ...
+    ADMISSION_POOL_SHED_RATIO = float(os.environ.get("ADMISSION_POOL_SHED_RATIO", 0.9))
+    # ... or this many of them already run in the process (0 = no cap); keeps a thread for everything else
+    ADMISSION_MAX_INFLIGHT = int(os.environ.get(
+        "ADMISSION_MAX_INFLIGHT", max(1, int(os.environ.get("GUNICORN_THREADS", 4)) - 1)
+    ))
+    ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", 5))  # seconds, sent with 503
+
+    # Idempotency-Key replay on the mobile sync / upload endpoints
+    IDEMPOTENCY_ENABLED = _env_flag("IDEMPOTENCY_ENABLED", True)
+    IDEMPOTENCY_TTL_HOURS = int(os.environ.get("IDEMPOTENCY_TTL_HOURS", 24))  # stored responses kept this long
+    IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", 120))  # unfinished key taken over after
+
+    # gzip / brotli (when installed) response compression, per blueprint
+    COMPRESSION_ENABLED = _env_flag("COMPRESSION_ENABLED", True)
+    COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))  # bytes, smaller bodies go out as-is
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 5))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+    COMPRESSION_BLUEPRINTS = tuple(
+        b.strip() for b in os.environ.get(
+            "COMPRESSION_BLUEPRINTS",
+            "admin,admin_all_call_history,admin_attendance,admin_call_analytics,admin_dashboard,"
+            "admin_performance,admin_sync,admin_user,call_analytics,call_history,followup,metrics,"
+            "super_admin,users"
+        ).split(",") if b.strip()
+    )
+
+    # Startup schema bootstrap: auto (version-gated) / always / off
+    SCHEMA_BOOTSTRAP = os.environ.get("SCHEMA_BOOTSTRAP", "auto")
@@ -0,0 +1,73 @@
+"""
+Gunicorn settings (loaded automatically from the working directory).
+
+The app is preloaded in the master and workers are forked from it, so a
+new worker starts in milliseconds and shares the imported code and
+SQLAlchemy metadata copy-on-write. app.lifecycle drops the inherited DB
+connections / locks after each fork.
+
+Worker profile
+--------------
+gthread (default): most traffic is mobile sync and small JSON writes that
+    spend their time waiting on PostgreSQL, so a few threads per worker
+    overlap that I/O on a free-tier instance with little RAM.
+    WEB_CONCURRENCY=2, GUNICORN_THREADS=4.
+sync: use when CPU-heavy requests dominate (PDF exports, large reports) -
+    threads don't help a GIL-bound request and one slow PDF can't delay
+    another request in the same worker. Raise WEB_CONCURRENCY instead.
+uvicorn.workers.UvicornWorker: serve asgi:app instead of wsgi:app when
+    many phones upload over slow networks at once. Bodies are received on
+    the event loop and only complete requests take one of ASGI_THREADS
+    threads (app/asgi.py), so thousands of open uploads cost no threads.
+
+Every thread can hold one DB connection, so keep
+WEB_CONCURRENCY * GUNICORN_THREADS within the database connection limit.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "4")) if worker_class == "gthread" else 1
+
+# PDF exports can take a while on the free tier
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to cap slow memory growth
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = 100
+
+
+def _app(server):
+    # With preload_app the application is already loaded in the master.
+    # Under UvicornWorker it is the AsyncIngress wrapping the Flask app.
+    app = server.app.wsgi()
+    return getattr(app, "flask_app", app)
+
+
+def on_starting(server):
+    # Metrics are summed from files the workers write; start from zero
+    from app.request_metrics import clear_metrics_dir
+    from config import Config
+    clear_metrics_dir(Config.METRICS_DIR)
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        from app.lifecycle import before_fork
+        before_fork(_app(server))
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from app.lifecycle import after_fork
+        after_fork(_app(server))
+
+        reset = getattr(server.app.wsgi(), "reset_after_fork", None)
+        if reset is not None:
+            reset()
@@ -0,0 +1,44 @@
+"""
+Standalone drain process for deferred call-history sync.
+
+Runs the same workers as the web processes (SYNC_INGEST_WORKERS threads)
+against the shared sync_batches table, so ingestion can be moved to its own
+instance: set SYNC_INGEST_MODE=deferred everywhere and SYNC_INGEST_WORKERS=0
+on the web service.
+
+    SYNC_INGEST_MODE=deferred python ingest_worker.py --threads 4
+"""
+import argparse
+import os
+import signal
+import threading
+
+from app import create_app
+from app.services.sync_ingest import SyncIngestWorkers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drain deferred call-history sync batches")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("SYNC_INGEST_WORKERS", 2)) or 2)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config["SYNC_INGEST_MODE"] = "deferred"
+    app.config["SYNC_INGEST_WORKERS"] = args.threads
+
+    done = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: done.set())
+
+    SyncIngestWorkers.ensure_started(app)
+    print(f"🔄 Sync ingest worker running ({args.threads} threads)", flush=True)
+    done.wait()
+
+    SyncIngestWorkers.stop()
+    for thread in SyncIngestWorkers._threads:
+        thread.join(timeout=30)
+    print("Sync ingest worker stopped", flush=True)
+
+
+if __name__ == "__main__":
+    main()